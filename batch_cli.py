@@ -0,0 +1,362 @@
+"""
+Command-line batch processor for report backlogs.
+
+Walks a directory (or reads a manifest) of PDF, image and text reports,
+extracts and analyzes them across a process pool and writes one JSON line
+per report. Each worker is warmed once (range table, retrieval index, LLM
+client) and keeps its own extraction/analysis caches, so duplicate reports
+in a backlog are only extracted once per worker.
+
+Progress is checkpointed next to the output (<output>.ckpt): the set of
+finished files plus the output size at that point, replaced atomically.
+Re-running the same command after an interruption truncates any lines
+written after the last checkpoint and skips finished files; a file whose
+size or mtime changed since is processed again. With --retry-failed, the
+retried file gets a second line; the last line for a source wins. An
+existing output without a checkpoint is never touched unless --overwrite
+is given. A report with no extracted values is recorded as failed, without
+any LLM calls. If a worker process dies, the pool can't continue: the run
+stops with a checkpoint, and the reports that were in flight or still queued
+are left unfinished (not failed), so re-running the command retries them.
+
+Run: python batch_cli.py reports/ -o results.jsonl [--workers 8] [--no-llm]
+     python batch_cli.py --manifest manifest.jsonl -o results.jsonl
+
+Manifest lines are either a path or a JSON object
+{"path", "patient_id", "age", "sex"} (all but "path" optional); relative
+paths are resolved against the manifest's directory.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+REPORT_EXTENSIONS = (".pdf", ".txt", ".text", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp")
+
+CHECKPOINT_EVERY = 200      # Reports between checkpoint writes
+IN_FLIGHT_PER_WORKER = 4    # Submitted-but-unfinished tasks per worker
+
+
+# ── Inputs ───────────────────────────────────────────────────────────────────
+
+def discover_reports(directory: str) -> list:
+    """Report files under a directory, recursively, in a stable order."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(REPORT_EXTENSIONS):
+                found.append({"path": os.path.join(dirpath, filename)})
+    return found
+
+
+def read_manifest(manifest: str) -> list:
+    """Report entries from a manifest file (see module docstring)."""
+    base = os.path.dirname(os.path.abspath(manifest))
+    entries = []
+    with open(manifest, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line) if line.startswith("{") else {"path": line}
+            entry["path"] = os.path.join(base, entry["path"])
+            entries.append(entry)
+    return entries
+
+
+def file_key(path: str) -> str:
+    """Checkpoint key: absolute path plus size and mtime, so edited files are redone."""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+# ── Checkpoint ───────────────────────────────────────────────────────────────
+
+def load_checkpoint(path: str) -> dict:
+    """{"done": {key: status}, "output_bytes": int}, empty if there is none."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        return {"done": checkpoint.get("done", {}), "output_bytes": checkpoint.get("output_bytes", 0)}
+    except FileNotFoundError:
+        return {"done": {}, "output_bytes": 0}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    """Write the checkpoint atomically (readers see the old or the new one, never half)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# ── Worker side ──────────────────────────────────────────────────────────────
+
+def default_workers() -> int:
+    """Cores this process may run on (respects container CPU affinity)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _init_worker(api_key, no_llm: bool, verbose: bool):
+    """
+    Per-process warm-up, run once when each worker starts: one OCR thread
+    per process (the pool already uses every core), LLM configuration, and
+    the range table, retrieval index and LLM client built before the first
+    report instead of inside it. Nothing here sends an LLM request. Per-report
+    prints are silenced unless verbose, so progress lines stay readable.
+    """
+    os.environ["DIAGNOVA_OCR_WORKERS"] = "1"
+    sys.path.insert(0, ROOT)
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+
+    from utils.llm_client import configure, get_client, llm_available
+    from utils.log import configure_logging
+    from utils.range_table import assess_all
+    from utils.retrieval import get_index
+
+    configure_logging()
+    configure(api_key="" if no_llm else api_key)
+    assess_all(["hemoglobin"], [14.0])   # Compiles the range table and its lookups
+    get_index()
+    if llm_available():
+        get_client()
+
+
+def _read_report_text(path: str) -> str:
+    lower = path.lower()
+    if lower.endswith(".pdf"):
+        from utils.ocr import extract_pdf_text
+        with open(path, "rb") as f:
+            return extract_pdf_text(f.read())
+    if lower.endswith(IMAGE_EXTENSIONS):
+        from utils.ocr import is_ocr_available, ocr_image_bytes
+        if not is_ocr_available():
+            raise RuntimeError("OCR is not available (install Tesseract)")
+        with open(path, "rb") as f:
+            return ocr_image_bytes(f.read())
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def process_report(entry: dict, key: str, profile: dict) -> dict:
+    """
+    Extract and analyze one report (runs in a worker).
+
+    Returns:
+        dict: Output record; "error" is set instead of the analysis on failure
+    """
+    from utils.analysis_cache import (
+        analysis_key, content_hash, get_analysis, get_extraction, store_analysis, store_extraction,
+    )
+    from utils.analyzer import process_lab_results
+    from utils.extractor import process_lab_report
+    from utils.log import request_context
+
+    started = time.perf_counter()
+    profile = dict(profile, **{k: entry[k] for k in ("age", "sex") if entry.get(k) is not None})
+    record = {
+        "source": entry["path"],
+        "key": key,
+        "patient_id": entry.get("patient_id") or os.path.splitext(os.path.basename(entry["path"]))[0],
+    }
+    try:
+        with request_context(source=entry["path"]) as request_id:
+            record["request_id"] = request_id
+            text = _read_report_text(entry["path"])
+            report_hash = content_hash(text)
+            cache_key = analysis_key(report_hash, None, profile)
+            analysis = get_analysis(cache_key)
+            if analysis is None:
+                extraction = get_extraction(report_hash)
+                if extraction is None:
+                    extraction = process_lab_report(text)
+                    store_extraction(report_hash, extraction)
+                if not extraction.get("data"):
+                    raise ValueError("No lab values extracted")
+                analysis = process_lab_results(extraction, user_profile=profile)
+                analysis["extraction_method"] = extraction["metadata"]["extraction_method"]
+                store_analysis(cache_key, analysis)
+        record["report_hash"] = report_hash
+        record.update(analysis)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {str(e)}"
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+# ── Driver ───────────────────────────────────────────────────────────────────
+
+def run(entries: list, output: str, profile: dict, workers: int, no_llm: bool = False,
+        retry_failed: bool = False, checkpoint_every: int = CHECKPOINT_EVERY,
+        verbose: bool = False, overwrite: bool = False) -> dict:
+    """
+    Process report entries into a JSONL file, resuming from its checkpoint.
+
+    Returns:
+        dict: {"total", "skipped", "ok", "failed", "unfinished", "seconds"};
+              "unfinished" counts reports left for a re-run after the worker
+              pool broke
+
+    Raises:
+        FileExistsError: If the output exists without a checkpoint and
+                         overwrite is not set
+    """
+    checkpoint_path = f"{output}.ckpt"
+    has_checkpoint = os.path.exists(checkpoint_path)
+    checkpoint = load_checkpoint(checkpoint_path)
+    done = checkpoint["done"]
+
+    if os.path.exists(output):
+        if not has_checkpoint and not overwrite:
+            raise FileExistsError(f"{output} exists and has no checkpoint; pass --overwrite to replace it")
+        # Drop output written after the last checkpoint (those files are redone)
+        with open(output, "r+b") as f:
+            f.truncate(checkpoint["output_bytes"] if has_checkpoint else 0)
+    elif done:
+        done.clear()
+
+    pending = []
+    for entry in entries:
+        try:
+            key = file_key(entry["path"])
+        except OSError as e:
+            print(f"⚠️ Skipping {entry['path']}: {str(e)}")
+            continue
+        status = done.get(key)
+        if status == "ok" or (status == "failed" and not retry_failed):
+            continue
+        pending.append((entry, key))
+
+    stats = {"total": len(entries), "skipped": len(entries) - len(pending), "ok": 0, "failed": 0, "unfinished": 0}
+    print(f"📂 {len(pending)} report(s) to process, {stats['skipped']} already done, {workers} worker(s)")
+    started = time.perf_counter()
+
+    with open(output, "ab") as out, ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(os.environ.get("GROQ_API_KEY"), no_llm, verbose)) as pool:
+
+        def write_checkpoint():
+            out.flush()
+            os.fsync(out.fileno())
+            save_checkpoint(checkpoint_path, {"done": done, "output_bytes": out.tell()})
+
+        queue = iter(pending)
+        in_flight = {}   # future -> (entry, key)
+        since_checkpoint = 0
+        try:
+            while True:
+                while len(in_flight) < workers * IN_FLIGHT_PER_WORKER:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    in_flight[pool.submit(process_report, item[0], item[1], profile)] = item
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                broken = None
+                for future in finished:
+                    entry, key = in_flight.pop(future)
+                    try:
+                        record = future.result()
+                    except BrokenProcessPool as e:
+                        # A worker died (e.g. out of memory on a huge scan): not this report's
+                        # failure, so it isn't recorded and a re-run retries it
+                        broken = e
+                        continue
+                    except Exception as e:   # The task failed outside process_report
+                        record = {"source": entry["path"], "key": key, "error": f"{type(e).__name__}: {str(e)}"}
+                    out.write((json.dumps(record, default=str) + "\n").encode("utf-8"))
+                    status = "failed" if "error" in record else "ok"
+                    done[record["key"]] = status
+                    stats[status] += 1
+                    if status == "failed":
+                        print(f"❌ {record['source']}: {record['error']}")
+                if broken is not None:
+                    raise broken
+                since_checkpoint += len(finished)
+                if since_checkpoint >= checkpoint_every:
+                    write_checkpoint()
+                    since_checkpoint = 0
+                    processed = stats["ok"] + stats["failed"]
+                    rate = processed / (time.perf_counter() - started)
+                    print(f"   {processed}/{len(pending)} ({rate:.1f} reports/s)")
+        except KeyboardInterrupt:
+            for future in in_flight:
+                future.cancel()
+            write_checkpoint()
+            print("\n⏸️ Interrupted - checkpoint saved, re-run the same command to resume")
+            raise
+        except BrokenProcessPool as e:
+            write_checkpoint()
+            stats["unfinished"] = len(pending) - stats["ok"] - stats["failed"]
+            print(f"\n💥 Worker pool stopped ({str(e)}) - checkpoint saved, re-run the same command "
+                  f"to retry the {stats['unfinished']} unfinished report(s)")
+        else:
+            write_checkpoint()
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnova batch processor")
+    parser.add_argument("directory", nargs="?", help="Directory of reports (searched recursively)")
+    parser.add_argument("--manifest", help="File listing reports, one path or JSON object per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output (checkpoint: <output>.ckpt)")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Worker processes")
+    parser.add_argument("--age", type=int, help="Default patient age for range selection")
+    parser.add_argument("--sex", help="Default patient sex for range selection")
+    parser.add_argument("--language", default="English", help="Summary language")
+    parser.add_argument("--no-llm", action="store_true", help="Regex extraction and template text only")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry reports that failed last time")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Replace an existing output that has no checkpoint")
+    parser.add_argument("--verbose", action="store_true", help="Show the workers' per-report output")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY,
+                        help="Reports between checkpoints")
+    args = parser.parse_args()
+
+    if bool(args.directory) == bool(args.manifest):
+        parser.error("give either a directory or --manifest")
+    entries = read_manifest(args.manifest) if args.manifest else discover_reports(args.directory)
+
+    profile = {"language": args.language}
+    if args.age is not None:
+        profile["age"] = args.age
+    if args.sex:
+        profile["sex"] = args.sex
+
+    try:
+        stats = run(entries, args.output, profile, max(1, args.workers), no_llm=args.no_llm,
+                    retry_failed=args.retry_failed, checkpoint_every=max(1, args.checkpoint_every),
+                    verbose=args.verbose, overwrite=args.overwrite)
+    except FileExistsError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    print("=" * 60)
+    unfinished = f", ⏸️ {stats['unfinished']} unfinished" if stats["unfinished"] else ""
+    print(f"✅ {stats['ok']} analyzed, ❌ {stats['failed']} failed{unfinished}, ⏭️ {stats['skipped']} skipped "
+          f"in {stats['seconds']}s")
+    print("=" * 60)
+    sys.exit(1 if stats["failed"] or stats["unfinished"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Cold-start benchmark and import-time profile for the Streamlit app.
+
+Replays, in a fresh interpreter started with `python -X importtime`, what a
+new pod does before first paint: import Streamlit and the app's components,
+then render the landing page once through AppTest. Prints per-module import
+times and exits 1 when a phase exceeds its budget or a heavy dependency is
+loaded before the user asks for an analysis.
+
+Run: python benchmarks/cold_start.py [--runs 3] [--top 20] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets (ms). App imports exclude Streamlit itself, which every page pays for.
+APP_IMPORT_BUDGET_MS = 150
+COLD_START_BUDGET_MS = 2500     # Streamlit import + app imports + first render
+
+# Must only load once a report is analyzed (PDF, OCR, array math, LLM SDK)
+LANDING_FORBIDDEN = ("fitz", "pymupdf", "PIL", "numpy", "groq", "pytesseract")
+
+APP_MODULES = ("app", "components", "utils")
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import streamlit
+t1 = time.perf_counter()
+import components.upload_section, components.sidebar, components.result_dashboard
+import utils.llm_client
+t2 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=60)
+t3 = time.perf_counter()
+at.run()
+t4 = time.perf_counter()
+print(json.dumps({{
+    "streamlit_import_ms": (t1 - t0) * 1000,
+    "app_import_ms": (t2 - t1) * 1000,
+    "first_render_ms": (t4 - t3) * 1000,
+    "render_errors": [str(e.value) for e in at.exception],
+    "loaded": sorted(m for m in {forbidden!r} if m in sys.modules),
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parse `python -X importtime` output.
+
+    Returns:
+        list: {"module", "self_ms", "cumulative_ms", "depth"} per import
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    return rows
+
+
+def run_probe() -> tuple:
+    """One cold start in a fresh interpreter: (phase timings, import profile)."""
+    code = PROBE.format(root=ROOT, forbidden=LANDING_FORBIDDEN)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, timeout=300,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Cold-start probe failed:\n{proc.stderr[-2000:]}")
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    return timings, parse_importtime(proc.stderr)
+
+
+def print_profile(profile: list, top: int):
+    """Slowest modules by self time, then the app's own modules."""
+    print(f"\n{'self ms':>9} {'cum ms':>9}  module (top {top} by self time)")
+    for row in sorted(profile, key=lambda r: r["self_ms"], reverse=True)[:top]:
+        print(f"{row['self_ms']:9.1f} {row['cumulative_ms']:9.1f}  {row['module']}")
+
+    print(f"\n{'self ms':>9} {'cum ms':>9}  app module")
+    for row in profile:
+        if row["module"].split(".")[0] in APP_MODULES:
+            print(f"{row['self_ms']:9.1f} {row['cumulative_ms']:9.1f}  {row['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnova cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to time (median is reported)")
+    parser.add_argument("--top", type=int, default=20, help="Modules to list in the import profile")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    runs = [run_probe() for _ in range(args.runs)]
+    profile = runs[0][1]
+    phases = ("streamlit_import_ms", "app_import_ms", "first_render_ms")
+    median = {p: statistics.median(r[0][p] for r in runs) for p in phases}
+    median["cold_start_ms"] = sum(median[p] for p in phases)
+    loaded = sorted({m for timings, _ in runs for m in timings["loaded"]})
+    errors = runs[0][0]["render_errors"]
+
+    print("=" * 60)
+    print(f"Cold start (median of {args.runs} fresh interpreters)")
+    print("=" * 60)
+    for name, value in median.items():
+        print(f"   {name:<22} {value:8.1f}")
+
+    print_profile(profile, args.top)
+
+    problems = []
+    if median["app_import_ms"] > APP_IMPORT_BUDGET_MS:
+        problems.append(f"app imports {median['app_import_ms']:.0f} ms > {APP_IMPORT_BUDGET_MS} ms budget")
+    if median["cold_start_ms"] > COLD_START_BUDGET_MS:
+        problems.append(f"cold start {median['cold_start_ms']:.0f} ms > {COLD_START_BUDGET_MS} ms budget")
+    if loaded:
+        problems.append(f"landing page loaded {', '.join(loaded)}")
+    if errors:
+        problems.append(f"landing page raised: {errors}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "timings_ms": median,
+                "budgets_ms": {"app_import": APP_IMPORT_BUDGET_MS, "cold_start": COLD_START_BUDGET_MS},
+                "landing_loaded": loaded,
+                "profile": profile,
+                "problems": problems,
+            }, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print("✅ WITHIN BUDGET" if not problems else "❌ " + "\n❌ ".join(problems))
+    print("=" * 60)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
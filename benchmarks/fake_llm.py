@@ -0,0 +1,79 @@
+"""
+Offline stand-in for the Groq client, for benchmarks and load tests.
+
+make_fake_client() returns an object with the same chat.completions.create
+surface as groq.Groq, to be injected with utils.llm_client.configure(client=...).
+Extraction prompts are answered with the JSON a model would return for the
+report rows it can read; every other prompt gets a canned paragraph of a
+typical length. Latency is simulated as a fixed cost plus a per-token cost,
+so benchmarks can model a remote model without a network or an API key.
+"""
+
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+# "Name: 11.2 g/dL (Ref: 12.0 - 16.0)" or fixed-width "Name   11.2  g/dL   12.0 - 16.0"
+_ROW_RE = re.compile(
+    r"^\s*(?P<name>[A-Za-z][\w ()/.%-]*?)\s*(?::\s*|\s{2,})(?P<value>-?\d[\d,]*\.?\d*)\s+"
+    r"(?P<unit>\S+)\s+(?:\(Ref:\s*)?(?P<range>[^)]*?)\)?\s*$"
+)
+
+CANNED_TEXT = (
+    "Your result is outside the typical reference interval. Values like this can reflect diet, "
+    "hydration, recent illness or medication, and a single reading rarely tells the whole story. "
+    "Please review it with your physician, who can interpret it alongside your history."
+)
+
+
+def fake_extraction(prompt: str) -> str:
+    """JSON rows for the report embedded in an extraction prompt."""
+    report = prompt.split("Lab Report Text:", 1)[-1].rsplit("JSON Output:", 1)[0]
+    rows = {}
+    for line in report.splitlines():
+        match = _ROW_RE.match(line)
+        if match and match.group("name").strip().lower() != "test":
+            rows[match.group("name").strip()] = {
+                "value": float(match.group("value").replace(",", "")),
+                "unit": match.group("unit"),
+                "reference_range": match.group("range").strip(),
+            }
+    return json.dumps(rows)
+
+
+def make_fake_client(latency_ms: float = 0.0, ms_per_token: float = 0.0):
+    """
+    Build a fake LLM client.
+
+    Args:
+        latency_ms: Fixed delay per call (time to first token)
+        ms_per_token: Extra delay per completion token (~4 characters)
+
+    Returns:
+        SimpleNamespace: client.chat.completions.create(...) like groq.Groq, plus
+                         client.stats = {"calls", "extraction_calls", "completion_tokens"}
+    """
+    stats = {"calls": 0, "extraction_calls": 0, "completion_tokens": 0}
+    lock = threading.Lock()
+
+    def create(model=None, messages=None, temperature=None, max_tokens=None, **kwargs):
+        prompt = (messages or [{}])[-1].get("content", "")
+        is_extraction = "Lab Report Text:" in prompt
+        content = fake_extraction(prompt) if is_extraction else CANNED_TEXT
+        tokens = len(content) // 4
+        with lock:
+            stats["calls"] += 1
+            stats["extraction_calls"] += is_extraction
+            stats["completion_tokens"] += tokens
+        delay = latency_ms + tokens * ms_per_token
+        if delay:
+            time.sleep(delay / 1000)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(completion_tokens=tokens),
+        )
+
+    completions = SimpleNamespace(create=create)
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions), stats=stats)
@@ -0,0 +1,144 @@
+"""
+Local Redis-protocol stand-in, for tests and multi-replica benchmarks.
+
+start_fake_redis() serves the subset of RESP2 the cache backend uses (PING,
+AUTH, SELECT, GET, SET with EX/PX, DEL, EXISTS, SCAN, DBSIZE, FLUSHDB) from
+a dict in a background thread, so a redis:// cache URL can be exercised
+without a Redis server. Several app processes pointed at the same stand-in
+share its entries like replicas sharing a real Redis.
+
+Run: python benchmarks/fake_redis.py [--port 6379]
+"""
+
+import argparse
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class _Store:
+    def __init__(self):
+        self.data = {}   # key -> (value, expires_at or None)
+        self.lock = threading.Lock()
+
+    def live(self, key: bytes):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+
+def _encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return b"-ERR %s\r\n" % str(reply).encode("utf-8")
+    if isinstance(reply, bool):
+        return b"+OK\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(_encode(item) for item in reply)
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode("utf-8")
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+def _execute(store: _Store, args: list):
+    command = args[0].upper()
+    with store.lock:
+        if command == b"PING":
+            return "PONG"
+        if command in (b"AUTH", b"SELECT"):
+            return True
+        if command == b"GET":
+            entry = store.live(args[1])
+            return None if entry is None else entry[0]
+        if command == b"SET":
+            expires_at = None
+            options = [arg.upper() for arg in args[3::2]]
+            for option, value in zip(options, args[4::2]):
+                if option == b"EX":
+                    expires_at = time.time() + int(value)
+                elif option == b"PX":
+                    expires_at = time.time() + int(value) / 1000
+            store.data[args[1]] = (args[2], expires_at)
+            return True
+        if command == b"DEL":
+            return sum(store.data.pop(key, None) is not None for key in args[1:])
+        if command == b"EXISTS":
+            return sum(store.live(key) is not None for key in args[1:])
+        if command == b"SCAN":
+            pattern = b"*"
+            for option, value in zip(args[2::2], args[3::2]):
+                if option.upper() == b"MATCH":
+                    pattern = value
+            keys = [key for key in list(store.data) if store.live(key) is not None
+                    and fnmatch.fnmatchcase(key.decode("utf-8", "replace"), pattern.decode("utf-8"))]
+            return [b"0", keys]   # Everything in one page
+        if command == b"DBSIZE":
+            return len(store.data)
+        if command == b"FLUSHDB":
+            store.data.clear()
+            return True
+    return ValueError(f"unknown command '{command.decode('utf-8', 'replace')}'")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()   # Inline command, e.g. from telnet
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            if args:
+                self.wfile.write(_encode(_execute(self.server.store, args)))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_fake_redis(host: str = "127.0.0.1", port: int = 0):
+    """
+    Serve the stand-in from a background thread.
+
+    Returns:
+        tuple: (server, url) — call server.shutdown() to stop; url is redis://host:port/0
+    """
+    server = _Server((host, port), _Handler)
+    server.store = _Store()
+    threading.Thread(target=server.serve_forever, name="fake-redis", daemon=True).start()
+    return server, f"redis://{host}:{server.server_address[1]}/0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Redis-protocol stand-in for the cache backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    server, url = start_fake_redis(args.host, args.port)
+    print(f"Serving {url} — set DIAGNOVA_CACHE_URL={url} on each replica (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Concurrent-session load test for the Streamlit app.
+
+Drives N simulated users at once through app.py with Streamlit's AppTest,
+in one process like one server replica: each user uploads a synthetic
+report (PDF, or pasted text with --input text), analyzes it, switches tabs,
+asks the chat a question and changes the display language. LLM calls go to
+the offline stand-in (benchmarks/fake_llm.py) with a configurable latency.
+
+Runs each concurrency level in turn (--users 1,2,4,8), then prints per-action
+latency percentiles, journeys per second, process memory and the memory
+each session holds (session state plus its payloads in the shared session
+store, utils/session_store.py) per level, and
+the saturation point: the first level where adding users no longer raises
+throughput by --min-gain (or the journey p90 breaks --slo-ms). The level
+before it is the number of concurrent users one replica sustains.
+
+--cache-url runs against a shared cache backend (sqlite:///..., redis://...,
+see utils/cache_backend.py) and each level reports its cache hit rates.
+
+Run: python benchmarks/load_test.py [--users 1,2,4,8] [--journeys 2] [--input pdf]
+                                    [--llm-latency-ms 300] [--think-ms 0] [--cache-url URL]
+                                    [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_llm import make_fake_client
+from benchmarks.pipeline import summarize
+from benchmarks.synthetic import generate_report
+from utils.llm_client import configure
+from utils.session_store import session_footprint, store_stats, clear_store
+
+ACTIONS = ("load", "upload", "analyze", "tab", "chat", "language")
+CHAT_PROMPTS = ("Which of my results should I worry about?", "What does a high LDL mean?",
+                "How can I improve my iron levels?", "Should I repeat any of these tests?")
+LANGUAGES = ("Spanish", "French", "German", "Urdu")
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process (MB); falls back to the peak off Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+@contextmanager
+def shared_runtime():
+    """
+    Let AppTest sessions run concurrently in one process.
+
+    AppTest installs a mock Runtime singleton and patches the config for
+    every run and undoes both at the end, so one session finishing would
+    pull them out from under the others. Inside this block every session
+    shares one mock runtime (as sessions share the real one on a server) and
+    one config patch, and AppTest's per-run install/clear only touches a
+    private subclass.
+    """
+    from contextlib import nullcontext
+    from unittest.mock import MagicMock
+
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.util import patch_config_options
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.bidi_component_registry = BidiComponentManager()
+    saved_instance = Runtime._instance
+    Runtime._instance = runtime
+    app_test.Runtime = type("SessionRuntime", (Runtime,), {})
+    app_test.patch_config_options = lambda overrides: nullcontext()
+    try:
+        with patch_config_options({"global.appTest": True}):
+            yield runtime
+    finally:
+        app_test.patch_config_options = patch_config_options
+        app_test.Runtime = Runtime
+        Runtime._instance = saved_instance
+
+
+def _widget(widgets, label: str):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No widget labelled {label!r} on the page")
+
+
+def wait_for_analysis(at, poll_s: float = 0.05, timeout_s: float = 600):
+    """Rerun the page, as the progress fragment would, until the analysis job is collected."""
+    deadline = time.perf_counter() + timeout_s
+    while "analysis_job" in at.session_state and at.session_state["analysis_job"] and not at.exception:
+        if time.perf_counter() > deadline:
+            raise TimeoutError("analysis job did not finish")
+        time.sleep(poll_s)
+        at.run()
+    return at
+
+
+def run_journey(user: int, journey: int, report: dict, input_mode: str, think_s: float) -> dict:
+    """
+    One user's visit: load, upload/paste, analyze, switch tabs, chat, change language.
+
+    Returns:
+        dict: {"latencies": {action: seconds}, "session_bytes": memory the
+               session holds at the end, "error": str or None}
+    """
+    from streamlit.testing.v1 import AppTest
+
+    latencies = {}
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300)
+
+    def act(name, step):
+        started = time.perf_counter()
+        step()
+        latencies[name] = time.perf_counter() - started
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+        if think_s:
+            time.sleep(think_s)
+
+    try:
+        act("load", at.run)
+        if input_mode == "pdf":
+            act("upload", lambda: at.get("file_uploader")[0]
+                .upload(f"report-{user}-{journey}.pdf", report["pdf"], "application/pdf").run())
+        else:
+            at.radio[0].set_value("✏️ Paste Text").run()
+            act("upload", lambda: at.text_area[0].input(report["text"]).run())
+        act("analyze", lambda: wait_for_analysis(_widget(at.button, "🔍 Analyze Report").click().run()))
+        if not at.session_state["analysis_ref"]:
+            raise RuntimeError("analyze: no analysis produced")
+        act("tab", lambda: _widget(at.radio, "Navigation").set_value("🥗 Plan").run())
+        _widget(at.radio, "Navigation").set_value("💬 Chat").run()
+        act("chat", lambda: at.chat_input[0].set_value(CHAT_PROMPTS[journey % len(CHAT_PROMPTS)]).run())
+        act("language", lambda: _widget(at.selectbox, "Display Language")
+            .set_value(LANGUAGES[user % len(LANGUAGES)]).run())
+        footprint = session_footprint(at.session_state.to_dict())
+        return {"latencies": latencies, "session_bytes": footprint["total_bytes"], "error": None}
+    except Exception as e:
+        return {"latencies": latencies, "session_bytes": None, "error": f"{type(e).__name__}: {str(e)}"}
+
+
+def _cache_hit_rates() -> dict:
+    from utils.analysis_cache import cache_stats
+
+    stats = cache_stats()
+    return {"backend": stats.pop("backend"),
+            **{namespace: counts["hit_rate"] for namespace, counts in stats.items()}}
+
+
+def run_level(users: int, args, seed: int) -> dict:
+    """Run `users` concurrent users, each doing args.journeys journeys with their own reports."""
+    layout = "pdf" if args.input == "pdf" else "text"
+    reports = [[generate_report(seed + u * args.journeys + j, analytes=args.analytes, layout=layout)
+                for j in range(args.journeys)] for u in range(users)]
+    outcomes = [[] for _ in range(users)]
+    barrier = threading.Barrier(users)
+
+    def user_loop(u):
+        barrier.wait()
+        for j in range(args.journeys):
+            started = time.perf_counter()
+            outcome = run_journey(u, j, reports[u][j], args.input, args.think_ms / 1000)
+            outcome["journey_s"] = time.perf_counter() - started
+            outcomes[u].append(outcome)
+
+    rss_before = rss_mb()
+    threads = [threading.Thread(target=user_loop, args=(u,), name=f"user-{u}") for u in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    done = [o for per_user in outcomes for o in per_user]
+    ok = [o for o in done if o["error"] is None]
+    actions = {name: summarize([o["latencies"][name] for o in ok])
+               for name in ACTIONS if any(name in o["latencies"] for o in ok)}
+    session_kb = [o["session_bytes"] / 1024 for o in ok]
+    return {
+        "users": users,
+        "journeys": len(done),
+        "errors": [o["error"] for o in done if o["error"]],
+        "wall_s": round(wall, 3),
+        "journeys_per_s": round(len(ok) / wall, 3) if wall else None,
+        "journey": summarize([o["journey_s"] for o in ok]) if ok else None,
+        "actions": actions,
+        "rss_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "session_kb": {"mean": round(sum(session_kb) / len(session_kb), 1),
+                       "max": round(max(session_kb), 1)} if session_kb else None,
+        "store": store_stats(),
+        "cache": _cache_hit_rates(),
+    }
+
+
+def find_saturation(levels: list, min_gain: float, slo_ms: float = None) -> dict:
+    """
+    First level where throughput stops scaling or the journey p90 breaks the SLO.
+
+    Returns:
+        dict: {"saturated_at": users or None, "sustainable_users": users, "reason": str}
+    """
+    previous = None
+    for level in levels:
+        p90 = level["journey"] and level["journey"]["p90_ms"]
+        reason = None
+        if level["errors"]:
+            reason = f"{len(level['errors'])} failed journeys"
+        elif slo_ms and p90 and p90 > slo_ms:
+            reason = f"journey p90 {p90:.0f} ms > SLO {slo_ms:.0f} ms"
+        elif previous and previous["journeys_per_s"]:
+            gain = level["journeys_per_s"] / previous["journeys_per_s"] - 1
+            if gain < min_gain:
+                reason = f"throughput {gain:+.0%} going from {previous['users']} to {level['users']} users"
+        if reason:
+            return {"saturated_at": level["users"],
+                    "sustainable_users": previous["users"] if previous else 0, "reason": reason}
+        previous = level
+    return {"saturated_at": None, "sustainable_users": previous["users"] if previous else 0,
+            "reason": "throughput still scaling at the highest level tested"}
+
+
+def run_load_test(args) -> dict:
+    from utils.analysis_cache import clear_cache
+    from utils.cache_backend import configure_cache
+
+    client = make_fake_client(args.llm_latency_ms, args.llm_ms_per_token)
+    configure(client=client)
+    if args.cache_url:
+        configure_cache(url=args.cache_url)
+
+    levels = []
+    with shared_runtime():
+        run_journey(0, 0, generate_report(10 ** 6, analytes=5, layout="pdf" if args.input == "pdf" else "text"),
+                    args.input, 0)   # Warm imports, indexes and the script cache
+        seed = 0
+        for users in args.users:
+            clear_cache()   # Every level analyzes unseen reports
+            clear_store()
+            level = run_level(users, args, seed)
+            seed += users * args.journeys
+            levels.append(level)
+            j = level["journey"] or {}
+            print(f"   {users:>3} users: {level['journeys_per_s'] or 0:6.2f} journeys/s, "
+                  f"journey p50 {j.get('p50_ms', 0):8.0f} ms, RSS {level['rss_mb']:7.1f} MB"
+                  f"{', ' + str(len(level['errors'])) + ' errors' if level['errors'] else ''}")
+
+    return {
+        "benchmark": "load_test",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "llm": dict(client.stats),
+        "levels": levels,
+        "saturation": find_saturation(levels, args.min_gain, args.slo_ms),
+    }
+
+
+def print_report(report: dict):
+    print("=" * 78)
+    print(f"Load test: {report['config']['journeys']} journeys per user, input {report['config']['input']}, "
+          f"LLM latency {report['config']['llm_latency_ms']:.0f} ms")
+    print("=" * 78)
+    for level in report["levels"]:
+        print(f"\n{level['users']} concurrent users — {level['journeys_per_s'] or 0:.2f} journeys/s, "
+              f"RSS {level['rss_mb']} MB (+{level['rss_growth_mb']}), peak {level['peak_rss_mb']} MB")
+        if level["session_kb"]:
+            store = level["store"]
+            print(f"   per session {level['session_kb']['mean']:.1f} KB (max {level['session_kb']['max']:.1f}), "
+                  f"shared store {store['bytes'] / 2**20:.1f} MB in {store['entries']} entries, "
+                  f"{store['evictions']} evicted, {store['spilled_entries']} spilled")
+        rates = ", ".join(f"{namespace} {rate:.0%}" for namespace, rate in level["cache"].items()
+                          if namespace != "backend" and rate is not None)
+        print(f"   cache ({level['cache']['backend']}) hit rate: {rates or 'no lookups'}")
+        print(f"   {'action':<10} {'n':>4} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, s in level["actions"].items():
+            print(f"   {name:<10} {s['count']:>4} {s['p50_ms']:>9.1f} {s['p90_ms']:>9.1f} "
+                  f"{s['p99_ms']:>9.1f} {s['max_ms']:>9.1f}")
+        for error in level["errors"][:3]:
+            print(f"   ❌ {error}")
+
+    saturation = report["saturation"]
+    print()
+    if saturation["saturated_at"]:
+        print(f"🚦 Saturates at {saturation['saturated_at']} users ({saturation['reason']})")
+    else:
+        print(f"🚦 No saturation up to {saturation['sustainable_users']} users ({saturation['reason']})")
+    print(f"   Sustainable concurrent users per replica: {saturation['sustainable_users']}")
+    print("=" * 78)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnova concurrent-session load test")
+    parser.add_argument("--users", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--journeys", type=int, default=2, help="Journeys per user per level")
+    parser.add_argument("--input", choices=("pdf", "text"), default="pdf", help="Upload a PDF or paste text")
+    parser.add_argument("--analytes", type=int, default=20, help="Result rows per report")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Simulated fixed latency per LLM call")
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0, help="Simulated latency per output token")
+    parser.add_argument("--cache-url", default=None,
+                        help="Cache backend URL (default: DIAGNOVA_CACHE_URL, else memory://)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between a user's actions")
+    parser.add_argument("--min-gain", type=float, default=0.1,
+                        help="Throughput gain per level below which the replica counts as saturated")
+    parser.add_argument("--slo-ms", type=float, help="Journey p90 above which the replica counts as saturated")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+    try:
+        args.users = sorted({int(n) for n in args.users.split(",")})
+    except ValueError:
+        parser.error("--users must be comma-separated integers")
+
+    report = run_load_test(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
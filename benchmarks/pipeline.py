@@ -0,0 +1,230 @@
+"""
+End-to-end pipeline benchmark on synthetic reports.
+
+Generates reports with benchmarks/synthetic.py and times each stage per
+report against the offline fake LLM (benchmarks/fake_llm.py):
+
+    pdf_text    PDF text layer extraction (pdf layout only)
+    extraction  process_lab_report (LLM JSON extraction + cleaning)
+    risk        vectorized range assessment (assess_all + build_results)
+    patterns    multi-parameter pattern detection
+    analysis    full process_lab_results (explanations, summary, health plan)
+    render      full dashboard render through Streamlit's AppTest
+
+Prints throughput and latency percentiles per stage and writes them as
+JSON (--json) so runs can be compared (--compare baseline.json).
+
+Run: python benchmarks/pipeline.py [--reports 200] [--analytes 25] [--layouts text,table,pdf]
+                                   [--llm-latency-ms 0] [--json out.json] [--compare base.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from benchmarks.fake_llm import make_fake_client
+from benchmarks.synthetic import LAYOUTS, UNIT_MODES, generate_reports
+from utils.llm_client import configure
+
+STAGES = ("pdf_text", "extraction", "risk", "patterns", "analysis", "render")
+
+
+def summarize(latencies: list, values: int = 0) -> dict:
+    """Throughput and latency percentiles (ms) for one stage."""
+    ms = np.array(latencies) * 1000
+    total = float(ms.sum()) / 1000
+    return {
+        "count": len(ms),
+        "total_s": round(total, 4),
+        "reports_per_s": round(len(ms) / total, 2) if total else None,
+        "values_per_s": round(values / total, 1) if total and values else None,
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _timed(latencies: list, fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    latencies.append(time.perf_counter() - started)
+    return result
+
+
+def extraction_recall(truth: list, extraction: dict) -> tuple:
+    """(rows whose value was extracted, rows) for one report."""
+    remaining = list(extraction.get("data", {}).values())
+    found = 0
+    for row in truth:
+        for i, value in enumerate(remaining):
+            if abs(value - row["value"]) < 1e-9:
+                found += 1
+                del remaining[i]
+                break
+    return found, len(truth)
+
+
+def render_dashboards(analyses: list) -> list:
+    """Render the dashboard once per analysis in one AppTest session; returns latencies."""
+    from streamlit.testing.v1 import AppTest
+    from utils.session_store import store_payload
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.run()
+    profile = at.session_state["user_profile"] if "user_profile" in at.session_state else {}
+    latencies = []
+    for analysis in analyses:
+        at.session_state["show_results"] = True
+        at.session_state["analysis_ref"] = store_payload("analysis:benchmark", dict(analysis, profile=profile))
+        at.session_state["report_hash"] = None
+        _timed(latencies, at.run)
+        if at.exception:
+            raise RuntimeError(f"Dashboard render failed: {at.exception[0].value}")
+    return latencies
+
+
+def run_benchmark(args) -> dict:
+    from utils.analyzer import build_patient_context, build_results, detect_clinical_patterns, process_lab_results
+    from utils.analysis_cache import clear_cache
+    from utils.extractor import process_lab_report
+    from utils.ocr import extract_pdf_text
+    from utils.range_table import assess_all
+
+    client = make_fake_client(args.llm_latency_ms, args.llm_ms_per_token)
+    configure(client=client)
+    clear_cache()
+
+    layouts = tuple(args.layouts.split(","))
+    reports = generate_reports(args.reports, seed=args.seed, layouts=layouts, analytes=args.analytes,
+                               pages=args.pages, noise=args.noise, units=args.units,
+                               abnormal_rate=args.abnormal_rate)
+
+    latencies = {stage: [] for stage in STAGES}
+    values = {stage: 0 for stage in STAGES}
+    found = rows = 0
+    context = build_patient_context({})
+    to_render = []
+
+    started = time.perf_counter()
+    for report in reports:
+        text = report["text"]
+        if "pdf" in report:
+            text = _timed(latencies["pdf_text"], extract_pdf_text, report["pdf"])
+
+        extraction = _timed(latencies["extraction"], process_lab_report, text)
+        hit, total = extraction_recall(report["truth"], extraction)
+        found, rows = found + hit, rows + total
+
+        data, units = extraction["data"], extraction["units"]
+        names = list(data)
+        column_values = [data[n] for n in names]
+        column_units = [units.get(n, "") for n in names]
+
+        def risk():
+            scored = assess_all(names, column_values, column_units,
+                                [extraction["reference_ranges"].get(n) for n in names],
+                                context["gender"], context["age_group"], context["age"])
+            return build_results(names, column_values, column_units, scored)
+
+        results = _timed(latencies["risk"], risk)
+        _timed(latencies["patterns"], detect_clinical_patterns, results)
+        analysis = _timed(latencies["analysis"], process_lab_results, extraction)
+        for stage in ("extraction", "risk", "patterns", "analysis"):
+            values[stage] += len(names)
+        if "pdf" in report:
+            values["pdf_text"] += len(report["truth"])
+        if len(to_render) < args.render:
+            to_render.append(analysis)
+    wall = time.perf_counter() - started
+
+    if to_render:
+        latencies["render"] = render_dashboards(to_render)
+        values["render"] = sum(len(a["results"]) for a in to_render)
+
+    return {
+        "benchmark": "pipeline",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+        },
+        "wall_s": round(wall, 3),
+        "extraction_recall": round(found / rows, 4) if rows else None,
+        "llm": dict(client.stats),
+        "stages": {stage: summarize(latencies[stage], values[stage])
+                   for stage in STAGES if latencies[stage]},
+    }
+
+
+def print_report(report: dict, baseline: dict = None):
+    print("=" * 78)
+    print(f"Pipeline benchmark: {report['config']['reports']} reports, "
+          f"{report['config']['analytes']} analytes, layouts {report['config']['layouts']}")
+    print("=" * 78)
+    print(f"{'stage':<11} {'n':>5} {'reports/s':>10} {'values/s':>10} {'p50 ms':>9} {'p90 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    for stage, s in report["stages"].items():
+        print(f"{stage:<11} {s['count']:>5} {s['reports_per_s'] or 0:>10.1f} {s['values_per_s'] or 0:>10.0f} "
+              f"{s['p50_ms']:>9.2f} {s['p90_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    print(f"\n   Extraction recall: {report['extraction_recall']:.1%}   "
+          f"LLM calls: {report['llm']['calls']}   Wall: {report['wall_s']}s")
+
+    if baseline:
+        print(f"\n{'stage':<11} {'p50 vs baseline':>16} {'p99 vs baseline':>16}")
+        for stage, s in report["stages"].items():
+            base = baseline.get("stages", {}).get(stage)
+            if base and base["p50_ms"] and base["p99_ms"]:
+                print(f"{stage:<11} {s['p50_ms'] / base['p50_ms'] - 1:>+16.1%} {s['p99_ms'] / base['p99_ms'] - 1:>+16.1%}")
+    print("=" * 78)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnova end-to-end pipeline benchmark")
+    parser.add_argument("--reports", type=int, default=200, help="Synthetic reports to process")
+    parser.add_argument("--analytes", type=int, default=25, help="Result rows per report")
+    parser.add_argument("--pages", type=int, default=1, help="Pages per report")
+    parser.add_argument("--noise", type=float, default=0.1, help="0-1 junk line / OCR damage rate")
+    parser.add_argument("--units", choices=UNIT_MODES, default="mixed")
+    parser.add_argument("--abnormal-rate", type=float, default=0.2)
+    parser.add_argument("--layouts", default=",".join(LAYOUTS), help=f"Comma-separated, from {LAYOUTS}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated fixed latency per LLM call")
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0, help="Simulated latency per output token")
+    parser.add_argument("--render", type=int, default=5, help="Analyses to render through AppTest (0 = skip)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Earlier --json output to compare against")
+    args = parser.parse_args()
+
+    unknown = set(args.layouts.split(",")) - set(LAYOUTS)
+    if unknown:
+        parser.error(f"unknown layouts: {', '.join(sorted(unknown))}")
+
+    report = run_benchmark(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
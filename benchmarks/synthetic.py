@@ -0,0 +1,230 @@
+"""
+Synthetic lab report generator for benchmarks.
+
+Builds realistic reports from the reference table plus a list of common
+panel tests that have no built-in range (so report-printed ranges are
+exercised too), with controllable analyte count, page count, noise, unit
+mix and abnormal rate. Every report carries its ground truth, so
+extraction accuracy can be measured alongside speed.
+
+Layouts:
+    "text"  - "Hemoglobin: 11.2 g/dL (Ref: 12.0 - 16.0)" rows
+    "table" - fixed-width Test / Result / Unit / Reference columns
+    "pdf"   - the table layout rendered to PDF with PyMuPDF (report["pdf"])
+
+Run: python benchmarks/synthetic.py [--analytes 25] [--layout table] [--pdf out.pdf]
+"""
+
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.reference_ranges import REFERENCE_RANGES
+
+LAYOUTS = ("text", "table", "pdf")
+UNIT_MODES = ("reference", "mixed")
+
+# Common tests without a built-in range: (name, unit, min, max)
+EXTRA_TESTS = [
+    ("RBC Count", "million/μL", 4.2, 5.9), ("Hematocrit", "%", 36, 50),
+    ("MCH", "pg", 27, 33), ("MCHC", "g/dL", 32, 36), ("RDW", "%", 11.5, 14.5),
+    ("Neutrophils", "%", 40, 75), ("Lymphocytes", "%", 20, 45), ("ESR", "mm/hr", 0, 20),
+    ("HbA1c", "%", 4.0, 5.6), ("Sodium", "mmol/L", 135, 145), ("Potassium", "mmol/L", 3.5, 5.1),
+    ("Chloride", "mmol/L", 98, 107), ("Calcium", "mg/dL", 8.5, 10.5), ("Magnesium", "mg/dL", 1.7, 2.2),
+    ("Phosphorus", "mg/dL", 2.5, 4.5), ("Uric Acid", "mg/dL", 3.5, 7.2), ("Total Protein", "g/dL", 6.0, 8.3),
+    ("Albumin", "g/dL", 3.5, 5.0), ("Total Bilirubin", "mg/dL", 0.1, 1.2), ("Alkaline Phosphatase", "U/L", 44, 147),
+    ("GGT", "U/L", 9, 48), ("HDL Cholesterol", "mg/dL", 40, 60), ("LDL Cholesterol", "mg/dL", 0, 100),
+    ("Triglycerides", "mg/dL", 0, 150), ("Free T4", "ng/dL", 0.8, 1.8), ("Ferritin", "ng/mL", 20, 250),
+    ("Serum Iron", "μg/dL", 60, 170), ("Vitamin D", "ng/mL", 30, 100), ("Vitamin B12", "pg/mL", 200, 900),
+    ("CRP", "mg/L", 0, 5),
+]
+
+NOISE_LINES = [
+    "Sample collected: {d:02d}/{m:02d}/2026 08:{mi:02d}", "Specimen: Serum", "Method: Automated analyzer",
+    "*** End of section ***", "Verified by: Dr. A. Rahman, MD (Pathology)", "Lab ID: {n}",
+    "Results relate only to the sample tested", "Fasting: Yes",
+]
+
+_UNIT_DISPLAY = {"g/l": "g/L", "mmol/l": "mmol/L", "umol/l": "μmol/L", "10^3/ul": "10^3/μL",
+                 "x10^3/ul": "x10^3/μL", "k/ul": "K/μL", "10^9/l": "10^9/L", "lakh/cumm": "lakh/cumm",
+                 "/cumm": "/cumm", "/mm3": "/mm3", "cells/ul": "cells/μL", "iu/l": "IU/L",
+                 "uiu/ml": "μIU/mL", "miu/ml": "mIU/mL"}
+
+
+def _catalog() -> list:
+    """(display names, reference unit, min, max, conversions) per known analyte, then the extras."""
+    tests = []
+    for key, info in REFERENCE_RANGES.items():
+        ranges = info["ranges"]
+        bounds = ranges.get("default") or ranges.get("desirable") or next(iter(ranges.values()))
+        names = [info["name"]] + [alias.upper() if len(alias) <= 4 else alias.title() for alias in info.get("aliases", [])]
+        tests.append({"analyte": key, "names": names, "unit": info["unit"],
+                      "min": bounds["min"], "max": bounds["max"], "conversions": info.get("conversions", {})})
+    for name, unit, low, high in EXTRA_TESTS:
+        tests.append({"analyte": None, "names": [name], "unit": unit, "min": low, "max": high, "conversions": {}})
+    return tests
+
+
+CATALOG = _catalog()
+
+
+def _round(value: float) -> float:
+    """Round like a lab printout: more decimals for small magnitudes."""
+    magnitude = abs(value)
+    digits = 0 if magnitude >= 100 else 1 if magnitude >= 10 else 2 if magnitude >= 0.1 else 3
+    return round(value, digits)
+
+
+def _sample_value(rng: random.Random, low: float, high: float, abnormal: bool) -> float:
+    if not abnormal:
+        low = low or high * 0.3   # "< 200"-style ranges: keep normal values plausible
+        return rng.uniform(low + (high - low) * 0.05, high - (high - low) * 0.05)
+    if low > 0 and rng.random() < 0.5:
+        return low * rng.uniform(0.55, 0.95)
+    return high * rng.uniform(1.05, 1.6)
+
+
+def _noisy(rng: random.Random, line: str, noise: float) -> str:
+    """OCR-style damage: stray spacing and case changes in the test name."""
+    if rng.random() >= noise:
+        return line
+    choice = rng.random()
+    if choice < 0.4:
+        return line.replace(" ", "  ", 1)
+    if choice < 0.7:
+        head, _, tail = line.partition(" ")
+        return head.upper() + " " + tail
+    return " " + line.rstrip() + "  "
+
+
+def generate_report(seed: int = 0, analytes: int = 20, pages: int = 1, noise: float = 0.1,
+                    units: str = "reference", abnormal_rate: float = 0.2, layout: str = "text") -> dict:
+    """
+    Generate one synthetic lab report.
+
+    Args:
+        seed: Random seed (same arguments + seed = same report)
+        analytes: Number of result rows (beyond the catalog, numbered markers are added)
+        pages: Pages the rows are spread over (each with its own header/footer)
+        noise: 0-1 rate of junk lines and OCR-style damage per row
+        units: "reference" (built-in units) or "mixed" (alternative units at random)
+        abnormal_rate: 0-1 share of values outside their range
+        layout: "text", "table" or "pdf"
+
+    Returns:
+        dict: {
+            "text": report text (the PDF's text layer for "pdf"),
+            "pdf": PDF bytes (layout "pdf" only),
+            "layout", "pages",
+            "truth": [{"name", "analyte", "value", "unit", "reference", "abnormal"}],
+        }
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout}, expected one of {LAYOUTS}")
+    rng = random.Random(seed)
+
+    tests = rng.sample(CATALOG, min(analytes, len(CATALOG)))
+    for i in range(len(tests), analytes):
+        low = _round(rng.uniform(1, 50))
+        tests.append({"analyte": None, "names": [f"Marker {i + 1}"], "unit": "U/L",
+                      "min": low, "max": _round(low * rng.uniform(1.5, 4)), "conversions": {}})
+
+    truth = []
+    for test in tests:
+        unit, factor = test["unit"], 1.0
+        if units == "mixed" and test["conversions"] and rng.random() < 0.5:
+            alt_unit, factor = rng.choice(list(test["conversions"].items()))
+            unit = _UNIT_DISPLAY.get(alt_unit, alt_unit)
+        abnormal = rng.random() < abnormal_rate
+        low, high = test["min"] / factor, test["max"] / factor
+        value = _round(_sample_value(rng, test["min"], test["max"], abnormal) / factor)
+        truth.append({
+            "name": rng.choice(test["names"]),
+            "analyte": test["analyte"],
+            "value": value,
+            "unit": unit,
+            "reference": f"{_round(low)} - {_round(high)}",
+            "abnormal": abnormal,
+        })
+
+    pages = max(1, pages)
+    per_page = -(-len(truth) // pages)
+    page_texts = []
+    for page in range(pages):
+        lines = ["CITY DIAGNOSTIC LABORATORY", f"Patient: Test Patient {seed}    Report No: {100000 + seed}",
+                 f"Page {page + 1} of {pages}", ""]
+        if layout != "text":
+            lines.append(f"{'Test':<28}{'Result':>10}  {'Unit':<12}Reference Range")
+        for row in truth[page * per_page:(page + 1) * per_page]:
+            if layout == "text":
+                line = f"{row['name']}: {row['value']} {row['unit']} (Ref: {row['reference']})"
+            else:
+                line = f"{row['name']:<28}{row['value']:>10}  {row['unit']:<12}{row['reference']}"
+            lines.append(_noisy(rng, line, noise))
+            if rng.random() < noise / 2:
+                lines.append(rng.choice(NOISE_LINES).format(d=rng.randint(1, 28), m=rng.randint(1, 12),
+                                                            mi=rng.randint(0, 59), n=rng.randint(1000, 9999)))
+        lines += ["", "This is a computer generated report."]
+        page_texts.append("\n".join(lines))
+
+    report = {"text": "\n\n".join(page_texts), "layout": layout, "pages": pages, "truth": truth}
+    if layout == "pdf":
+        report["pdf"] = render_pdf(page_texts)
+    return report
+
+
+def render_pdf(page_texts: list, font_size: float = 9.0) -> bytes:
+    """
+    Render report pages to a PDF with a real text layer (monospaced, A4).
+    Pages too long for one sheet continue on the next.
+    """
+    import fitz  # PyMuPDF
+
+    document = fitz.open()
+    line_height = font_size * 1.35
+    try:
+        for text in page_texts:
+            page, y = None, 0.0
+            for line in text.splitlines():
+                if page is None or y > page.rect.height - 50:
+                    page, y = document.new_page(width=595, height=842), 50.0
+                page.insert_text((40, y), line, fontsize=font_size, fontname="cour")
+                y += line_height
+        return document.tobytes()
+    finally:
+        document.close()
+
+
+def generate_reports(count: int, seed: int = 0, layouts: tuple = ("text",), **options):
+    """Yield `count` reports, cycling through `layouts` (options as generate_report)."""
+    for i in range(count):
+        yield generate_report(seed=seed + i, layout=layouts[i % len(layouts)], **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print (or save) one synthetic lab report")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--analytes", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--units", choices=UNIT_MODES, default="reference")
+    parser.add_argument("--abnormal-rate", type=float, default=0.2)
+    parser.add_argument("--layout", choices=LAYOUTS, default="text")
+    parser.add_argument("--pdf", help="Also write the report as a PDF to this path")
+    args = parser.parse_args()
+
+    report = generate_report(args.seed, args.analytes, args.pages, args.noise, args.units,
+                             args.abnormal_rate, "pdf" if args.pdf else args.layout)
+    print(report["text"])
+    if args.pdf:
+        with open(args.pdf, "wb") as f:
+            f.write(report["pdf"])
+        print(f"\n📄 Wrote {args.pdf}")
+
+
+if __name__ == "__main__":
+    main()
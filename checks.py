@@ -0,0 +1,27 @@
+"""
+Shared helpers for Diagnova's check scripts (test_*.py)
+check() prints one result and counts failures; finish() prints the
+pass/fail footer and exits non-zero if any check failed
+"""
+
+import sys
+
+failures = 0
+
+
+def check(label, actual, expected):
+    """Print one check result and count failures"""
+    global failures
+    ok = actual == expected
+    if not ok:
+        failures += 1
+    print(f"   {'✅' if ok else '❌'} {label}: {actual!r}" + ("" if ok else f" (expected {expected!r})"))
+
+
+def finish():
+    """Print the pass/fail footer; exit with status 1 if any check failed"""
+    print("\n" + "=" * 60)
+    print("✅ ALL CHECKS PASSED" if not failures else f"❌ {failures} CHECK(S) FAILED")
+    print("=" * 60)
+    if failures:
+        sys.exit(1)
@@ -1,11 +1,24 @@
+import html
+import os
+
 import streamlit as st
-import time
-import fitz  # PyMuPDF
-from PIL import Image
-import io
-from utils.extractor import process_lab_report
-from utils.analyzer import process_lab_results
-from utils.chat_handler import get_chat_response
+# Extraction, analysis, OCR and the LLM client (PyMuPDF, Pillow, NumPy, groq)
+# are imported where first used, so the landing page doesn't pay for them
+from utils.analysis_cache import (
+    content_hash, analysis_key, get_upload_text, store_upload_text,
+    get_extraction, store_extraction, get_analysis, store_analysis,
+)
+from utils.tracing import trace, traced, flatten_trace, format_trace
+from utils.log import request_context, new_request_id
+from utils.jobs import (
+    FINISHED, submit_job, get_job, cancel_job, forget_job, job_progress,
+)
+from utils.session_store import (
+    store_payload, get_payload, drop_payload, store_stats, session_footprint,
+)
+
+JOB_POLL_SECONDS = 1.0   # How often a running analysis refreshes its progress
+MAX_CHAT_MESSAGES = 40   # Chat turns kept per session (and sent to the LLM)
 
 # ── Sample Data for Demo ──────────────────────────────────────────────────────
 SAMPLE_ANALYSIS = {
@@ -15,6 +28,8 @@ SAMPLE_ANALYSIS = {
             "value": 11.2,
             "unit": "g/dL",
             "reference": "13.5 – 17.5",
+            "range_min": 13.5,
+            "range_max": 17.5,
             "status": "red",
             "bar_pct": 55,
             "explanation": "Your hemoglobin is below the normal range, suggesting anemia. This can cause fatigue and weakness. Please consult your physician for clinical interpretation.",
@@ -24,6 +39,8 @@ SAMPLE_ANALYSIS = {
             "value": 78,
             "unit": "fL",
             "reference": "80 – 100",
+            "range_min": 80.0,
+            "range_max": 100.0,
             "status": "red",
             "bar_pct": 30,
             "explanation": "MCV is slightly low, meaning red blood cells are smaller than average. Please consult your physician for clinical interpretation.",
@@ -33,6 +50,8 @@ SAMPLE_ANALYSIS = {
             "value": 9800,
             "unit": "/μL",
             "reference": "4,500 – 11,000",
+            "range_min": 4500.0,
+            "range_max": 11000.0,
             "status": "green",
             "bar_pct": 65,
             "explanation": "Your WBC Count is within the normal range. Please consult your physician for clinical interpretation.",
@@ -67,100 +86,509 @@ SAMPLE_ANALYSIS = {
 }
 
 
+def _session_id() -> str:
+    """Correlation id shared by every request of this browser session."""
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = new_request_id()
+    return st.session_state["session_id"]
+
+
+def _keep_analysis(analysis: dict):
+    """Put the session's analysis in the shared store; session state keeps only the key."""
+    if analysis is None:
+        drop_payload(st.session_state.get("analysis_ref"))
+        st.session_state["analysis_ref"] = None
+    else:
+        st.session_state["analysis_ref"] = store_payload(f"analysis:{_session_id()}", analysis)
+
+
+def _load_analysis():
+    """The session's analysis, or None (never analyzed, or evicted from the store)."""
+    ref = st.session_state.get("analysis_ref")
+    analysis = get_payload(ref)
+    if ref and analysis is None:
+        st.session_state["analysis_ref"] = None
+        st.info("These results were cleared to free server memory. Please analyze the report again.")
+    return analysis
+
+
+def _reset_chat():
+    drop_payload(st.session_state.get("chat_ref"))
+    st.session_state["chat_ref"] = None
+
+
 def _status_label(status: str) -> str:
     return {"green": "Normal", "yellow": "Borderline", "red": "Abnormal"}.get(status, "")
 
 
+@st.fragment
 def _render_chat_assistant(context: dict):
-    """RENDER FEATURE 1: AI Chat Assistant"""
+    """RENDER FEATURE 1: AI Chat Assistant (a fragment: a message reruns only the chat)"""
     st.markdown('<div class="section-label" style="margin-top:1.5rem;">💬 Ask Diagnova AI</div>', unsafe_allow_html=True)
     
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
+    history = get_payload(st.session_state.get("chat_ref"), [])
 
     # Display chat history
     chat_container = st.container(height=350)
     with chat_container:
-        for message in st.session_state.chat_history:
+        for message in history:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
 
-    # Chat input
+    # Chat input: the new turn is drawn in place, so no rerun is needed to show it
     if prompt := st.chat_input("Ask about your results..."):
-        # Make sure we stay on the chat tab
-        st.session_state.active_tab = "💬 Chat"
-        
         with chat_container:
             with st.chat_message("user"):
                 st.markdown(prompt)
         
-        st.session_state.chat_history.append({"role": "user", "content": prompt})
+        history = (history + [{"role": "user", "content": prompt}])[-MAX_CHAT_MESSAGES:]
         
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = get_chat_response(st.session_state.chat_history, context)
+        with chat_container, st.chat_message("assistant"):
+            with st.spinner("Thinking..."), request_context(session=_session_id(), kind="chat"):
+                from utils.chat_handler import get_chat_response
+                response = get_chat_response(history, context)
                 st.markdown(response)
         
-        st.session_state.chat_history.append({"role": "assistant", "content": response})
-        st.rerun()
+        history = (history + [{"role": "assistant", "content": response}])[-MAX_CHAT_MESSAGES:]
+        st.session_state["chat_ref"] = store_payload(f"chat:{_session_id()}", history)
 
 
-def _render_single_card(r: dict):
+def _card_html(r: dict) -> str:
+    """One result card as HTML, without indentation or blank lines (a blank
+    line would end the HTML block inside st.markdown). Report and LLM text is
+    escaped, so stray markup can't break the cards around it."""
     s   = r["status"]
     lbl = _status_label(s)
     val = f"{r['value']:,}" if isinstance(r["value"], int) else str(r["value"])
-    st.markdown(f"""
-    <div class="result-card {s}">
-        <div class="rc-header">
-            <span class="rc-name">{r['name']}</span>
-            <span class="rc-badge badge-{s}">{lbl}</span>
-        </div>
-        <div class="rc-value {s}">{val}</div>
-        <div class="rc-unit">{r['unit']}</div>
-        <div class="rc-range">Reference: {r['reference']}</div>
-        <div class="rc-bar-track">
-            <div class="rc-bar-fill {s}" style="width:{r['bar_pct']}%;"></div>
-        </div>
-        <div class="rc-explanation">{r['explanation']}</div>
-    </div>
-    """, unsafe_allow_html=True)
+    explanation = "<br>".join(html.escape(line) for line in str(r["explanation"] or "").splitlines()
+                              if line.strip())
+    return (
+        f'<div class="result-card {s}">'
+        f'<div class="rc-header"><span class="rc-name">{html.escape(str(r["name"]))}</span>'
+        f'<span class="rc-badge badge-{s}">{lbl}</span></div>'
+        f'<div class="rc-value {s}">{html.escape(val)}</div>'
+        f'<div class="rc-unit">{html.escape(str(r["unit"]))}</div>'
+        f'<div class="rc-range">Reference: {html.escape(str(r["reference"]))}</div>'
+        f'<div class="rc-bar-track"><div class="rc-bar-fill {s}" style="width:{r["bar_pct"]}%;"></div></div>'
+        f'<div class="rc-explanation">{explanation}</div>'
+        f'</div>'
+    )
 
 
-def _render_cards(results: list):
-    if not results:
+def _status_index(results: list) -> dict:
+    """Result positions per status, in one pass: {"all": [...], "red": [...], ...}."""
+    index = {"all": list(range(len(results))), "green": [], "yellow": [], "red": []}
+    for i, r in enumerate(results):
+        index.setdefault(r["status"], []).append(i)
+    return index
+
+
+CARD_FILTERS = {"All": "all", "🚨 Abnormal": "red", "⚠️ Borderline": "yellow", "✅ Normal": "green"}
+CARDS_PER_PAGE = 24
+
+
+def _set_card_page(page: int):
+    st.session_state["card_page"] = page
+
+
+@st.fragment
+def _render_card_grid(results: list, index: dict):
+    """
+    Result cards as one HTML element per page, with a status filter and
+    paging; filtering or paging reruns only the grid. `index` is the
+    _status_index of `results`, built once per analysis render.
+    """
+    choice = st.radio("Show", list(CARD_FILTERS), horizontal=True, key="card_filter",
+                      label_visibility="collapsed", on_change=_set_card_page, args=(0,))
+    selected = index.get(CARD_FILTERS.get(choice, "all"), [])
+    if not selected:
         st.markdown(
             "<p style='color:var(--text-light);font-size:0.83rem;padding:0.8rem 0;'>"
             "No parameters in this category.</p>",
             unsafe_allow_html=True,
         )
         return
-    pairs = [results[i:i+2] for i in range(0, len(results), 2)]
-    for pair in pairs:
-        cols = st.columns(len(pair))
-        for col, r in zip(cols, pair):
-            with col:
-                _render_single_card(r)
+
+    pages = -(-len(selected) // CARDS_PER_PAGE)
+    page = min(st.session_state.get("card_page", 0), pages - 1)
+    first = page * CARDS_PER_PAGE
+    shown = selected[first:first + CARDS_PER_PAGE]
+    st.markdown('<div class="card-grid">' + "".join(_card_html(results[i]) for i in shown) + "</div>",
+                unsafe_allow_html=True)
+
+    if pages > 1:
+        c1, c2, c3 = st.columns([1, 2, 1])
+        with c1:
+            st.button("‹ Previous", key="card_prev", disabled=page == 0,
+                      on_click=_set_card_page, args=(page - 1,), use_container_width=True)
+        with c2:
+            st.markdown(f"<p style='text-align:center;font-size:0.78rem;color:var(--text-muted);margin-top:0.6rem;'>"
+                        f"{first + 1}–{first + len(shown)} of {len(selected)} · page {page + 1} of {pages}</p>",
+                        unsafe_allow_html=True)
+        with c3:
+            st.button("Next ›", key="card_next", disabled=page == pages - 1,
+                      on_click=_set_card_page, args=(page + 1,), use_container_width=True)
+
+
+def _history_owner() -> str:
+    """
+    Whose history this session may read and write: the signed-in user
+    (st.login), else only this browser session. Never shared between visitors.
+    """
+    try:
+        identity = (st.user.get("email") or st.user.get("sub")) if st.user.get("is_logged_in") else None
+    except Exception:
+        identity = None
+    return f"user:{identity}" if identity else f"session:{_session_id()}"
+
+
+def _patient_label() -> str:
+    return (st.session_state.get("patient_label") or "").strip() or "me"
+
+
+def _history_patient_id() -> str:
+    """History key: the patient label, scoped to the owner."""
+    return f"{_history_owner()}/{_patient_label()}"
+
+
+def _render_history_controls(analysis: dict):
+    """Save this analysis to the local history for trends, when asked to."""
+    persist = st.toggle("💾 Save to history", key="persist_history",
+                        help="Keep these results on this server to track trends across reports. "
+                             "Only you can see them: your account when signed in, otherwise this browser session.")
+    if not persist:
+        return
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.text_input("Patient", key="patient_label", placeholder="me")
+    with c2:
+        taken_at = st.date_input("Report date", key="report_date")
+
+    patient_id = _history_patient_id()
+    saved_key = (patient_id, st.session_state.get("report_hash"), str(taken_at), str(analysis.get("profile")))
+    if st.session_state.get("saved_history") == saved_key:
+        st.caption("✅ Saved to history")
+    elif st.button("Save this report", key="save_history"):
+        from utils.history import save_analysis
+        try:
+            save_analysis(patient_id, analysis, taken_at, st.session_state.get("report_hash"))
+            st.session_state["saved_history"] = saved_key
+            st.caption("✅ Saved to history")
+        except Exception as e:
+            st.warning(f"⚠️ Could not save to history: {str(e)}")
+
+
+def _render_trends(results: list):
+    """RENDER: per-analyte trends for this report's parameters from this owner's history."""
+    from utils.history import get_trends
+    from utils.reference_ranges import analyte_key
+
+    st.markdown(f'<div class="section-label">📈 Trends · {html.escape(_patient_label())}</div>', unsafe_allow_html=True)
+    analytes = {r.get("analyte") or analyte_key(r["name"]): r["name"] for r in results}
+    try:
+        trends = get_trends(_history_patient_id(), list(analytes))
+    except Exception as e:
+        st.warning(f"⚠️ History unavailable: {str(e)}")
+        return
+    trends = {a: t for a, t in trends.items() if t["count"] >= 2}
+    if not trends:
+        st.info("Save two or more reports with 💾 Save to history to see trends.")
+        return
+
+    rows = []
+    for analyte, t in trends.items():
+        arrow = "▲" if t["delta"] > 0 else ("▼" if t["delta"] < 0 else "▬")
+        slope = f"{t['slope_per_30d']:+.2f}/mo" if t["slope_per_30d"] is not None else "–"
+        tir = f"{t['time_in_range'] * 100:.0f}%" if t["time_in_range"] is not None else "–"
+        rows.append(
+            f'<tr><td style="padding:6px 8px;font-weight:600;">{html.escape(analytes.get(analyte, analyte))}</td>'
+            f'<td style="padding:6px 8px;font-weight:700;color:var(--{t["status"]});">{t["latest"]:g} {html.escape(str(t["unit"]))}</td>'
+            f'<td style="padding:6px 8px;">{arrow} {t["delta"]:+g}</td>'
+            f'<td style="padding:6px 8px;">{slope}</td>'
+            f'<td style="padding:6px 8px;">{tir}</td>'
+            f'<td style="padding:6px 8px;color:var(--text-muted);">{t["count"]} · since {t["first"]}</td></tr>'
+        )
+    st.markdown(f"""
+    <table style="width:100%;font-size:0.8rem;border-collapse:collapse;background:white;border-radius:14px;">
+        <tr style="color:var(--text-muted);font-size:0.65rem;text-transform:uppercase;letter-spacing:0.08em;text-align:left;">
+            <th style="padding:6px 8px;">Parameter</th><th style="padding:6px 8px;">Latest</th>
+            <th style="padding:6px 8px;">Δ since last</th><th style="padding:6px 8px;">Slope</th>
+            <th style="padding:6px 8px;">Time in range</th><th style="padding:6px 8px;">Results</th>
+        </tr>
+        {"".join(rows)}
+    </table>
+    """, unsafe_allow_html=True)
 
 
-def extract_text_from_pdf(uploaded_file):
-    """Extract text from uploaded PDF file."""
+def _debug_enabled() -> bool:
+    """
+    Debug panel on with DIAGNOVA_DEBUG=1 on the server. Never from the URL: the
+    panel exposes process-wide stats and a cProfile switch to every visitor.
+    """
+    return os.environ.get("DIAGNOVA_DEBUG", "").lower() in ("1", "true", "yes")
+
+
+def _render_session_memory():
+    """Approximate memory this session holds, and the shared store's occupancy (whole process)."""
+    footprint = session_footprint(st.session_state.to_dict())
+    stats = store_stats()
+    spilled = f", {footprint['spilled_bytes'] / 1024:.1f} KB spilled" if footprint["spilled_bytes"] else ""
+    st.markdown(f"**Session memory** · {footprint['total_bytes'] / 1024:.1f} KB "
+                f"({footprint['state_bytes'] / 1024:.1f} KB state, {footprint['stored_bytes'] / 1024:.1f} KB stored"
+                f"{spilled}) · shared store, all sessions of this process: {stats['bytes'] / 2**20:.1f} / {stats['capacity_bytes'] / 2**20:.0f} MB, "
+                f"{stats['entries']} entries, {stats['evictions']} evicted")
+    rows = [{"key": key, "KB": round(size / 1024, 1), "where": "session state"}
+            for key, size in footprint["state"].items()]
+    rows += [{"key": key, "KB": round(size / 1024, 1), "where": "shared store"}
+             for key, size in footprint["stored"].items()]
+    st.table(sorted(rows, key=lambda row: -row["KB"])[:10])
+
+
+def _render_debug_panel(analysis: dict):
+    """Span tree (and cProfile summary) of the request that produced this analysis."""
+    with st.expander("🛠️ Debug · pipeline trace"):
+        st.checkbox("Capture a cProfile dump for the next analysis", key="profile_next_analysis")
+        _render_session_memory()
+        request_trace = analysis.get("trace")
+        if not request_trace:
+            st.caption("No trace for this analysis (sample data, or analyzed before tracing was on).")
+            return
+
+        totals = {}
+        for row in flatten_trace(request_trace)[1:]:
+            calls, total, self_ms = totals.get(row["name"], (0, 0.0, 0.0))
+            totals[row["name"]] = (calls + 1, total + row["duration_ms"], self_ms + row["self_ms"])
+        st.markdown(f"**{request_trace['name']}** · {request_trace['duration_ms']:.0f} ms · "
+                    f"{request_trace['started_at']}")
+        st.table([{"stage": name, "calls": calls, "total ms": round(total, 1), "self ms": round(self_ms, 1)}
+                  for name, (calls, total, self_ms) in sorted(totals.items(), key=lambda t: -t[1][1])])
+        st.code(format_trace(request_trace), language=None)
+
+        profile = request_trace.get("profile")
+        if profile:
+            st.code(profile["top"], language=None)
+            if profile.get("path") and os.path.exists(profile["path"]):
+                with open(profile["path"], "rb") as f:
+                    st.download_button("⬇️ Download .prof", f.read(), file_name=os.path.basename(profile["path"]))
+
+
+@traced("extract_text_from_pdf")
+def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+    """Extract text from uploaded PDF file, OCR-ing scanned pages."""
+    from utils.ocr import extract_pdf_text
     try:
-        pdf_bytes = uploaded_file.read()
-        uploaded_file.seek(0)
-        pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
-        text = ""
-        for page_num in range(pdf_document.page_count):
-            text += pdf_document[page_num].get_text()
-        pdf_document.close()
-        return text.strip()
+        return extract_pdf_text(pdf_bytes).strip()
     except:
         return ""
 
 
-def extract_text_from_image(uploaded_file):
-    """Placeholder for OCR."""
-    st.warning("⚠️ Image OCR not yet implemented. Please use PDF or paste text.")
-    return ""
+@traced("extract_text_from_image")
+def extract_text_from_image(image_bytes: bytes) -> tuple:
+    """
+    Extract text from an uploaded photo or scan using local OCR.
+
+    Returns:
+        tuple: (text, warning shown to the user or None)
+    """
+    from utils.ocr import ocr_image_bytes, is_ocr_available
+    if not is_ocr_available():
+        return "", "⚠️ Image OCR is unavailable on this server (Tesseract not installed). Please use PDF or paste text."
+    text = ocr_image_bytes(image_bytes)
+    if not text:
+        return "", "⚠️ No readable text found in the image. Try a sharper, well-lit photo."
+    return text, None
+
+
+def _run_analysis(upload: dict, pasted_text: str, user_profile: dict, session_id: str,
+                  profile_run: bool) -> dict:
+    """
+    Analysis job (runs on the shared job pool, not the script thread): read
+    the upload, extract, analyze, cache.
+
+    Args:
+        upload: {"type", "bytes"} of the uploaded file, or None
+        pasted_text: Text to analyze when there is no upload
+        user_profile: Profile the analysis is for
+        session_id: Streamlit session, for log correlation
+        profile_run: Capture a cProfile dump for this request
+
+    Returns:
+        dict: {"analysis", "report_hash", "warning"}; analysis is None if
+              there was no text to analyze
+    """
+    with request_context(session=session_id, kind="analysis") as request_id, \
+            trace("analysis", profile=profile_run, request_id=request_id) as request_trace:
+        text, warning = "", None
+        if upload:
+            # Same file bytes as an earlier upload: skip PDF parsing / OCR
+            job_progress("Reading your report")
+            file_hash = content_hash(upload["bytes"])
+            text = get_upload_text(file_hash)
+            request_trace["attrs"]["upload_cache"] = "miss" if text is None else "hit"
+            if text is None:
+                if upload["type"] == "application/pdf":
+                    text = extract_text_from_pdf(upload["bytes"])
+                else:
+                    text, warning = extract_text_from_image(upload["bytes"])
+                store_upload_text(file_hash, text)
+
+        if not text:
+            text = pasted_text or ""
+        if not text:
+            return {"analysis": None, "report_hash": None, "warning": warning or "⚠️ No text to analyze."}
+
+        # Same report content + profile as any earlier session: reuse the whole analysis
+        report_hash = content_hash(text)
+        cache_key = analysis_key(report_hash, None, user_profile)
+        analysis_package = get_analysis(cache_key)
+        request_trace["attrs"]["analysis_cache"] = "miss" if analysis_package is None else "hit"
+        if analysis_package is None:
+            from utils.extractor import process_lab_report
+            from utils.analyzer import process_lab_results
+            extraction_package = get_extraction(report_hash)
+            if extraction_package is None:
+                job_progress("Extracting lab values")
+                extraction_package = process_lab_report(text)
+                store_extraction(report_hash, extraction_package)
+            analysis_package = process_lab_results(extraction_package, user_profile=user_profile)
+            store_analysis(cache_key, analysis_package)
+        # Per-request: attached after caching, complete once the trace block exits
+        analysis_package["trace"] = request_trace
+    return {"analysis": analysis_package, "report_hash": report_hash, "warning": None}
+
+
+def _submit_analysis():
+    """Queue an analysis of the current upload / pasted text for this session."""
+    # The input widgets' own values: Streamlit drops them once the widget is gone
+    uploaded_file = st.session_state.get("report_upload")
+    upload = {"type": uploaded_file.type, "bytes": uploaded_file.getvalue()} if uploaded_file else None
+    pasted_text = "" if uploaded_file else st.session_state.get("report_text", "")
+    previous = st.session_state.get("analysis_job")
+    if previous:
+        cancel_job(previous)
+        forget_job(previous)
+    st.session_state["analysis_job"] = submit_job(
+        _run_analysis, upload, pasted_text,
+        dict(st.session_state.get("user_profile", {})), _session_id(),
+        st.session_state.get("profile_next_analysis", False))
+
+
+def _collect_analysis_job() -> bool:
+    """
+    Take a finished analysis job's outcome into session state.
+
+    Returns:
+        bool: True while the session's job is still queued or running
+    """
+    job_id = st.session_state.get("analysis_job")
+    if not job_id:
+        return False
+    job = get_job(job_id)
+    if job is not None and job["status"] not in FINISHED:
+        return True
+
+    st.session_state["analysis_job"] = None
+    forget_job(job_id)
+    if job is None:
+        st.warning("⚠️ The analysis was interrupted. Please try again.")
+    elif job["status"] == "cancelled":
+        st.info("Analysis cancelled.")
+    elif job["status"] == "failed":
+        st.error(f"❌ Analysis failed: {job['error']}")
+        _keep_analysis(None)
+    elif job["result"]["analysis"] is None:
+        st.warning(job["result"]["warning"])
+    else:
+        _keep_analysis(job["result"]["analysis"])
+        st.session_state["report_hash"] = job["result"]["report_hash"]
+        _reset_chat()
+    return False
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _render_job_status():
+    """Progress of the running analysis; reruns only itself until the job finishes."""
+    job_id = st.session_state.get("analysis_job")
+    job = get_job(job_id) if job_id else None
+    if job is None or job["status"] in FINISHED:
+        st.rerun()   # Whole app: show the result
+
+    if job["status"] == "queued":
+        ahead = job["queue_position"]
+        st.progress(0.0, text=f"⏳ Waiting for a free worker{f' ({ahead} ahead)' if ahead else ''}...")
+    else:
+        st.progress(job["progress"], text=f"🧬 {job['stage']}...")
+    if st.button("✖ Cancel analysis", key="cancel_analysis"):
+        cancel_job(job_id)
+        st.rerun()
+
+
+TAB_OPTIONS = ["📋 Analysis", "🥗 Plan", "💬 Chat", "📈 Trends"]
+
+
+@st.fragment
+def _render_tab_body(analysis: dict, index: dict):
+    """Tab bar and the active tab; switching tabs reruns only this fragment."""
+    results = analysis["results"]
+    patterns = analysis["patterns"]
+    summary = analysis["summary"]
+
+    # Persistent Tab Management: the radio's own key holds the active tab
+    if st.session_state.get("active_tab") not in TAB_OPTIONS:
+        st.session_state.active_tab = TAB_OPTIONS[0]
+
+    st.radio(
+        "Navigation",
+        TAB_OPTIONS,
+        key="active_tab",
+        horizontal=True,
+        label_visibility="collapsed"
+    )
+
+    st.markdown("<div style='height:1.5rem'></div>", unsafe_allow_html=True)
+
+    if st.session_state.active_tab == "📋 Analysis":
+        # Stats
+        c1, c2, c3 = st.columns(3)
+        with c1: st.markdown(f'<div class="stat-chip green"><span class="stat-chip-num">{len(index["green"])}</span><span class="stat-chip-lbl">✅ Normal</span></div>', unsafe_allow_html=True)
+        with c2: st.markdown(f'<div class="stat-chip yellow"><span class="stat-chip-num">{len(index["yellow"])}</span><span class="stat-chip-lbl">⚠️ Borderline</span></div>', unsafe_allow_html=True)
+        with c3: st.markdown(f'<div class="stat-chip red"><span class="stat-chip-num">{len(index["red"])}</span><span class="stat-chip-lbl">🚨 Abnormal</span></div>', unsafe_allow_html=True)
+
+        if patterns:
+            st.markdown('<div class="section-label" style="margin-top:1.5rem;">🔍 Clinical Patterns</div>', unsafe_allow_html=True)
+            for p in patterns:
+                bg = {"high": "#fdecea", "medium": "#fff4e0"}.get(p["severity"], "#eef6ff")
+                st.markdown(f"""
+                <div style="padding:1rem;background:{bg};border-radius:14px;margin-bottom:0.8rem;border:1px solid rgba(0,0,0,0.05);">
+                    <div style="font-weight:700;font-size:0.9rem;color:#0a2472;">{html.escape(p['title'])}</div>
+                    <div style="font-size:0.75rem;color:#6b8dae;margin-top:2px;">{html.escape(p['evidence'])}</div>
+                    <div style="font-size:0.85rem;margin-top:8px;line-height:1.4;">{html.escape(p['insight'])}</div>
+                </div>
+                """, unsafe_allow_html=True)
+
+        st.markdown('<div class="section-label" style="margin-top:1.5rem;">🔬 Parameter Breakdown</div>', unsafe_allow_html=True)
+        _render_card_grid(results, index)
+
+        st.markdown(f"""
+        <div class="summary-panel" style="margin-top:2rem;">
+            <div class="summary-title">🤖 AI Patient Summary</div>
+            <div class="summary-text">{html.escape(str(summary))}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    elif st.session_state.active_tab == "🥗 Plan":
+        st.markdown('<div class="section-label">🥗 Personalized Health Coach</div>', unsafe_allow_html=True)
+        if "health_plan" in analysis:
+            st.markdown(analysis["health_plan"])
+        else:
+            st.info("Complete analysis to see your plan.")
+
+    elif st.session_state.active_tab == "💬 Chat":
+        _render_chat_assistant(analysis)
+
+    elif st.session_state.active_tab == "📈 Trends":
+        _render_trends(results)
 
 
 def render_result_dashboard():
@@ -186,52 +614,45 @@ def render_result_dashboard():
 
     # Handle Sample Data
     if sampling:
-        st.session_state["full_analysis"] = SAMPLE_ANALYSIS
+        _keep_analysis(dict(SAMPLE_ANALYSIS, profile=st.session_state.get("user_profile", {})))
+        st.session_state["report_hash"] = None
         st.session_state["sample_clicked"] = False
+        if st.session_state.get("analysis_job"):
+            cancel_job(st.session_state["analysis_job"])
+            forget_job(st.session_state["analysis_job"])
+            st.session_state["analysis_job"] = None
         st.success("✅ Loaded sample report for demonstration.")
 
     if analyzing:
-        with st.spinner("Analyzing with Medical Intelligence..."):
-            text = ""
-            uploaded_file = st.session_state.get("uploaded_file", None)
-            if uploaded_file:
-                if uploaded_file.type == "application/pdf":
-                    text = extract_text_from_pdf(uploaded_file)
-                else:
-                    text = extract_text_from_image(uploaded_file)
-            
-            if not text:
-                text = st.session_state.get("pasted_text", "")
-            
-            if text:
-                try:
-                    extraction_package = process_lab_report(text)
-                    analysis_package = process_lab_results(extraction_package)
-                    st.session_state["full_analysis"] = analysis_package
-                    st.session_state["chat_history"] = []
-                except Exception as e:
-                    st.error(f"❌ Analysis failed: {str(e)}")
-                    st.session_state["full_analysis"] = None
-            else:
-                st.warning("⚠️ No text to analyze.")
+        _submit_analysis()
         st.session_state["analyze_clicked"] = False
+        st.session_state["profile_next_analysis"] = False
+
+    if _collect_analysis_job():
+        _render_job_status()
+        return
 
-    analysis = st.session_state.get("full_analysis")
+    analysis = _load_analysis()
     
-    # Language Change Trigger: If language changes in sidebar, re-run summary AI
+    # Profile change (age, sex, activity, goal, language): only re-evaluate
+    # results, patterns and texts that depend on the changed fields
     user_profile = st.session_state.get("user_profile", {})
-    current_lang = user_profile.get("language", "English")
-    last_lang = st.session_state.get("last_language", "English")
-
-    if analysis and current_lang != last_lang:
-        with st.spinner(f"Translating summary to {current_lang}..."):
-            from utils.analyzer import generate_summary_ai
-            new_summary = generate_summary_ai(analysis["results"], analysis["patterns"], current_lang)
-            analysis["summary"] = new_summary
-            st.session_state["full_analysis"] = analysis
-            st.session_state["last_language"] = current_lang
-    elif not analysis:
-        st.session_state["last_language"] = current_lang
+    if analysis and analysis.get("profile", {}) != user_profile:
+        report_hash = st.session_state.get("report_hash")
+        cache_key = analysis_key(report_hash, None, user_profile) if report_hash else None
+        updated = get_analysis(cache_key) if cache_key else None
+        if updated is None:
+            with st.spinner("Updating analysis for your profile..."), \
+                    request_context(session=_session_id(), kind="reanalysis") as request_id, \
+                    trace("reanalysis", request_id=request_id) as request_trace:
+                from utils.analyzer import reanalyze_for_context
+                updated = reanalyze_for_context(analysis, user_profile)
+                updated.pop("trace", None)
+                if cache_key:
+                    store_analysis(cache_key, updated)
+            updated["trace"] = request_trace
+        analysis = updated
+        _keep_analysis(analysis)
 
     if not analysis:
         st.info("No data available.")
@@ -242,9 +663,8 @@ def render_result_dashboard():
     summary = analysis["summary"]
     confidence = analysis["confidence"]
 
-    counts = {"green": 0, "yellow": 0, "red": 0}
-    for r in results:
-        counts[r["status"]] += 1
+    index = _status_index(results)
+    counts = {status: len(index[status]) for status in ("green", "yellow", "red")}
 
     # Header with toggle for Persistence
     conf_color = {"High": "#00a67e", "Medium": "#c97800", "Low": "#d93025"}.get(confidence, "#6b8dae")
@@ -259,76 +679,9 @@ def render_result_dashboard():
     </div>
     """, unsafe_allow_html=True)
 
-    # Persistent Tab Management
-    if "active_tab" not in st.session_state:
-        st.session_state.active_tab = "📋 Analysis"
-
-    # Style the radio to look like tabs
-    st.markdown("""
-    <style>
-    div[data-testid="stHorizontalBlock"] div[data-testid="stVerticalBlock"] > div:has(div.stRadio) {
-        margin-bottom: -1rem;
-    }
-    div.stRadio > div {
-        background: white;
-        padding: 0.5rem;
-        border-radius: 12px;
-        border: 1px solid #d0e4f7;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    tab_options = ["📋 Analysis", "🥗 Plan", "💬 Chat"]
-    active_index = tab_options.index(st.session_state.active_tab) if st.session_state.active_tab in tab_options else 0
-    
-    st.session_state.active_tab = st.radio(
-        "Navigation",
-        tab_options,
-        index=active_index,
-        horizontal=True,
-        label_visibility="collapsed"
-    )
-
-    st.markdown("<div style='height:1.5rem'></div>", unsafe_allow_html=True)
+    _render_history_controls(analysis)
 
-    if st.session_state.active_tab == "📋 Analysis":
-        # Stats
-        c1, c2, c3 = st.columns(3)
-        with c1: st.markdown(f'<div class="stat-chip green"><span class="stat-chip-num">{counts["green"]}</span><span class="stat-chip-lbl">✅ Normal</span></div>', unsafe_allow_html=True)
-        with c2: st.markdown(f'<div class="stat-chip yellow"><span class="stat-chip-num">{counts["yellow"]}</span><span class="stat-chip-lbl">⚠️ Borderline</span></div>', unsafe_allow_html=True)
-        with c3: st.markdown(f'<div class="stat-chip red"><span class="stat-chip-num">{counts["red"]}</span><span class="stat-chip-lbl">🚨 Abnormal</span></div>', unsafe_allow_html=True)
-
-        if patterns:
-            st.markdown('<div class="section-label" style="margin-top:1.5rem;">🔍 Clinical Patterns</div>', unsafe_allow_html=True)
-            for p in patterns:
-                bg = {"high": "#fdecea", "medium": "#fff4e0"}.get(p["severity"], "#eef6ff")
-                st.markdown(f"""
-                <div style="padding:1rem;background:{bg};border-radius:14px;margin-bottom:0.8rem;border:1px solid rgba(0,0,0,0.05);">
-                    <div style="font-weight:700;font-size:0.9rem;color:#0a2472;">{p['title']}</div>
-                    <div style="font-size:0.75rem;color:#6b8dae;margin-top:2px;">{p['evidence']}</div>
-                    <div style="font-size:0.85rem;margin-top:8px;line-height:1.4;">{p['insight']}</div>
-                </div>
-                """, unsafe_allow_html=True)
-
-        st.markdown('<div class="section-label" style="margin-top:1.5rem;">🔬 Parameter Breakdown</div>', unsafe_allow_html=True)
-        _render_cards(results)
-
-        st.markdown(f"""
-        <div class="summary-panel" style="margin-top:2rem;">
-            <div class="summary-title">🤖 AI Patient Summary</div>
-            <div class="summary-text">{summary}</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-    elif st.session_state.active_tab == "🥗 Plan":
-        st.markdown('<div class="section-label">🥗 Personalized Health Coach</div>', unsafe_allow_html=True)
-        if "health_plan" in analysis:
-            st.markdown(analysis["health_plan"])
-        else:
-            st.info("Complete analysis to see your plan.")
-
-    elif st.session_state.active_tab == "💬 Chat":
-        _render_chat_assistant(analysis)
+    _render_tab_body(analysis, index)
 
     # Footer Actions
     st.markdown("<hr style='margin:2rem 0;opacity:0.1;'>", unsafe_allow_html=True)
@@ -355,3 +708,6 @@ def render_result_dashboard():
             mime="text/plain",
             use_container_width=True,
         )
+
+    if _debug_enabled():
+        _render_debug_panel(analysis)
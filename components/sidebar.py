@@ -31,7 +31,7 @@ def render_sidebar():
                                 background:var(--blue-700);
                                 display:flex;align-items:center;justify-content:center;
                                 font-size:0.55rem;font-weight:700;color:#fff;
-                                font-family:'JetBrains Mono',monospace;flex-shrink:0;">
+                                font-family:var(--font-mono);flex-shrink:0;">
                         {num}
                     </div>
                     <div>
@@ -80,13 +80,21 @@ def render_sidebar():
             </div>
             """, unsafe_allow_html=True)
             
-            age = st.number_input("Age", min_value=1, max_value=120, value=30)
+            age = st.number_input("Age", min_value=0, max_value=120, value=30,
+                                  help="Used to pick age-appropriate reference ranges (0 for infants).")
+            if age == 0:
+                # Neonatal and infant ranges change within weeks; ask for days
+                age_days = st.number_input("Age (days)", min_value=0, max_value=365, value=30)
+                age = round(age_days / 365.25, 4)
+            sex = st.selectbox("Sex", ["Not specified", "Female", "Male"],
+                               help="Some reference ranges differ by sex.")
             activity = st.selectbox("Activity Level", ["Sedentary", "Moderate", "Active", "Athlete"])
             goal = st.selectbox("Health Goal", ["General Wellness", "Weight Loss", "Muscle Gain", "Energy Boost"])
             language = st.selectbox("Display Language", ["English", "Spanish", "Urdu", "Hindi", "Arabic", "French", "German"])
             
             st.session_state["user_profile"] = {
                 "age": age,
+                "sex": sex,
                 "activity": activity,
                 "goal": goal,
                 "language": language
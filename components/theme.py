@@ -0,0 +1,59 @@
+import hashlib
+import os
+
+import streamlit as st
+
+from utils.log import get_logger
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+THEME_FILE = "theme.css"
+FONTS_FILE = "fonts.css"
+# WOFF2 files fonts.css points at; `python fetch_fonts.py` (repo root) downloads them at build time
+FONT_FILES = ("plus-jakarta-sans-latin.woff2", "jetbrains-mono-latin.woff2")
+
+log = get_logger(__name__)
+
+_theme = {}
+
+
+def _version(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def _load_theme() -> dict:
+    """Theme CSS and the content hashes of it and the font stylesheet, worked out once per process."""
+    if not _theme:
+        with open(os.path.join(STATIC_DIR, THEME_FILE), encoding="utf-8") as f:
+            css = f.read()
+        missing = [name for name in FONT_FILES if not os.path.isfile(os.path.join(STATIC_DIR, "fonts", name))]
+        if missing:
+            # No CDN fallback: the app stays offline and uses the system font stack in theme.css
+            log.warning("Theme fonts not bundled (missing static/fonts/%s); run `python fetch_fonts.py` "
+                        "as a build step. Using system fonts until then.", ", ".join(missing))
+        _theme.update(
+            css=css,
+            version=hashlib.sha256(css.encode("utf-8")).hexdigest()[:12],
+            fonts_version=_version(os.path.join(STATIC_DIR, FONTS_FILE)),
+        )
+    return _theme
+
+
+def render_theme():
+    """
+    Load the app theme.
+
+    With static serving on (.streamlit/config.toml), each rerun sends only
+    one-line @imports of app/static/fonts.css and app/static/theme.css under
+    content-hashed URLs, so the browser fetches the stylesheets and the
+    bundled fonts once and caches them until the files change. Otherwise the
+    CSS is inlined as before, with system fonts (bundled font files need
+    static serving).
+    """
+    theme = _load_theme()
+    if st.get_option("server.enableStaticServing"):
+        st.markdown(f'<style>@import url("app/static/{FONTS_FILE}?v={theme["fonts_version"]}");'
+                    f'@import url("app/static/{THEME_FILE}?v={theme["version"]}");</style>',
+                    unsafe_allow_html=True)
+    else:
+        st.markdown(f"<style>\n{theme['css']}</style>", unsafe_allow_html=True)
@@ -30,14 +30,13 @@ def render_upload_section():
         uploaded_file = st.file_uploader(
             "lab_report",
             type=["pdf", "png", "jpg", "jpeg"],
+            key="report_upload",
             label_visibility="collapsed",
         )
 
+        # The analysis reads the file from the widget's key; no copy is kept
         if uploaded_file:
-            st.session_state["uploaded_file"] = uploaded_file
             st.session_state["input_ready"]   = True
-            # Clear pasted text when file is uploaded
-            st.session_state["pasted_text"] = ""
             st.markdown(f"""
             <div style="display:flex;align-items:center;gap:8px;margin-top:0.7rem;
                         background:var(--green-light);border:1.5px solid var(--green-border);
@@ -50,7 +49,6 @@ def render_upload_section():
             """, unsafe_allow_html=True)
         else:
             st.session_state["input_ready"] = False
-            st.session_state["uploaded_file"] = None
 
     else:
         pasted_text = st.text_area(
@@ -62,13 +60,11 @@ def render_upload_section():
                 "WBC Count: 9,800 /μL\n"
                 "Fasting Glucose: 108 mg/dL"
             ),
+            key="report_text",
             label_visibility="collapsed",
         )
         if pasted_text.strip():
-            st.session_state["pasted_text"] = pasted_text
             st.session_state["input_ready"] = True
-            # Clear uploaded file when text is pasted
-            st.session_state["uploaded_file"] = None
         else:
             st.session_state["input_ready"] = False
 
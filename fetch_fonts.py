@@ -0,0 +1,83 @@
+"""
+Download the theme fonts into static/fonts so the app needs no font CDN.
+
+Fetches the Latin subset of Plus Jakarta Sans and JetBrains Mono (both SIL
+Open Font License) as variable-weight WOFF2 files from Google Fonts once, at
+build time; static/fonts.css serves them from app/static/fonts, and the app
+never contacts a font CDN. Run it when building a deployment (it needs
+network access and exits non-zero if any font could not be fetched); until
+the files are present the app logs a warning and uses system fonts.
+
+Run: python fetch_fonts.py [--force]
+"""
+
+import argparse
+import os
+import re
+import sys
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FONTS_DIR = os.path.join(ROOT, "static", "fonts")
+
+# File name (as referenced by static/theme.css) -> Google Fonts css2 family spec
+FONTS = {
+    "plus-jakarta-sans-latin.woff2": "Plus+Jakarta+Sans:wght@200..800",
+    "jetbrains-mono-latin.woff2": "JetBrains+Mono:wght@100..800",
+}
+
+CSS_URL = "https://fonts.googleapis.com/css2?family={family}&display=swap"
+# Google Fonts only serves WOFF2 to browsers that announce support for it
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+_LATIN_RE = re.compile(r"/\* latin \*/\s*@font-face\s*{[^}]*?src:\s*url\((?P<url>[^)]+)\)", re.S)
+
+
+def _get(url: str) -> bytes:
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def fetch_font(filename: str, family: str, force: bool = False) -> str:
+    """
+    Download one font's Latin subset to static/fonts.
+
+    Returns:
+        str: "downloaded" or "present"
+    """
+    path = os.path.join(FONTS_DIR, filename)
+    if os.path.exists(path) and not force:
+        return "present"
+    css = _get(CSS_URL.format(family=family)).decode("utf-8")
+    match = _LATIN_RE.search(css)
+    if not match:
+        raise RuntimeError(f"No Latin WOFF2 source in the stylesheet for {family}")
+    data = _get(match.group("url").strip("'\""))
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+    return "downloaded"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle the theme fonts into static/fonts")
+    parser.add_argument("--force", action="store_true", help="Download again even if the files exist")
+    args = parser.parse_args()
+
+    os.makedirs(FONTS_DIR, exist_ok=True)
+    failed = False
+    for filename, family in FONTS.items():
+        try:
+            print(f"   {fetch_font(filename, family, args.force):<10} static/fonts/{filename}")
+        except Exception as e:
+            failed = True
+            print(f"   ❌ {filename}: {type(e).__name__}: {str(e)}")
+    if failed:
+        print("❌ Theme fonts not bundled - the app will fall back to system fonts. "
+              "Re-run with network access to fonts.googleapis.com and fonts.gstatic.com.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
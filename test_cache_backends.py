@@ -0,0 +1,82 @@
+"""
+Cache backend test script for Diagnova
+Runs the same checks against the memory, SQLite and Redis-protocol backends
+(the latter via the local stand-in), with two backend instances playing two
+replicas, then the analysis and LLM response caches on a shared backend
+Run: python test_cache_backends.py
+"""
+
+import os
+import tempfile
+from types import SimpleNamespace
+
+from benchmarks.fake_redis import start_fake_redis
+from checks import check, finish
+from utils.cache_backend import make_backend, configure_cache, RedisBackend
+from utils.analysis_cache import (
+    analysis_key, get_analysis, store_analysis, cache_stats, clear_cache,
+)
+from utils.llm_client import configure, chat_completion
+
+
+server, redis_url = start_fake_redis()
+sqlite_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="diagnova-cache-"), "cache.db")
+package = {"results": [{"name": "Hemoglobin", "value": 11.2, "status": "red"}], "summary": "Low."}
+
+for number, (url, shared) in enumerate((("memory://", False), (sqlite_url, True), (redis_url, True)), 1):
+    replica_a, replica_b = make_backend(url), make_backend(url)
+    print("=" * 60)
+    print(f"{number}. {replica_a.name} backend")
+    print("=" * 60)
+    replica_a.clear()
+    replica_a.set("analyses", "report-1", package, 8)
+    value = replica_a.get("analyses", "report-1")
+    check("round trip", value, package)
+    value["summary"] = "mutated"
+    check("reads are copies", replica_a.get("analyses", "report-1")["summary"], "Low.")
+    check("unknown key", replica_a.get("analyses", "report-2"), None)
+    check("other replica sees the entry", replica_b.get("analyses", "report-1") is not None, shared)
+    replica_a.set("explanations", "e", "text", 8)
+    replica_a.clear("analyses")
+    check("clear one namespace", (replica_a.get("analyses", "report-1"), replica_a.get("explanations", "e")),
+          (None, "text"))
+    if replica_a.name != "redis":   # Redis bounds entries by TTL and maxmemory instead
+        for i in range(4):
+            replica_a.set("uploads", f"u{i}", i, 3)
+        check("least recently used trimmed", [replica_a.get("uploads", f"u{i}") for i in range(4)], [None, 1, 2, 3])
+    replica_a.clear()
+    print()
+
+print("=" * 60)
+print("4. Analysis and LLM caches on a shared backend")
+print("=" * 60)
+configure_cache(url=redis_url)
+clear_cache()
+key = analysis_key("report-hash", None, {"language": "English"})
+store_analysis(key, package)
+configure_cache(url=redis_url)   # A second replica
+check("analysis written by one replica is a hit on another", get_analysis(key), package)
+check("hit rate", cache_stats()["analyses"]["hit_rate"], 1.0)
+
+calls = []
+
+
+def create(**kwargs):
+    calls.append(kwargs)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Cached answer."))])
+
+
+configure(client=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+messages = [{"role": "user", "content": "What does a low hemoglobin mean?"}]
+first, second = chat_completion(messages), chat_completion(messages)
+check("identical prompt answered once", (first, second, len(calls)), ("Cached answer.", "Cached answer.", 1))
+chat_completion(messages, temperature=0.9)
+check("different settings are a different entry", len(calls), 2)
+
+configure_cache(backend=RedisBackend("redis://127.0.0.1:1/0"))   # Nothing listens there
+check("unreachable backend is a miss", get_analysis(key), None)
+check("and is counted as an error", cache_stats()["analyses"]["errors"], 1)
+configure_cache(url="memory://")
+server.shutdown()
+
+finish()
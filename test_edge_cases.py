@@ -6,16 +6,10 @@ Tests system behavior with problematic inputs
 import sys
 import json
 
-# Mock streamlit secrets for testing
-class MockSecrets:
-    def get(self, key, default=None):
-        # No API key for testing fallback behavior
-        return default
+from utils.llm_client import configure
 
-class MockStreamlit:
-    secrets = MockSecrets()
-
-sys.modules['streamlit'] = MockStreamlit()
+# No API key for testing fallback behavior
+configure(api_key="")
 
 # Now import our modules
 from utils.extractor_fixed import process_lab_report
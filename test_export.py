@@ -0,0 +1,54 @@
+"""
+Columnar export test script for Diagnova
+Writes batch analyses to Parquet and Arrow IPC across several row groups
+and checks the read-back
+Run: python test_export.py
+"""
+
+import os
+import tempfile
+
+from checks import check, finish
+from utils.batch import analyze_batch
+from utils.export import write_results, read_results, iter_results
+
+
+def reports(n):
+    """n reports alternating between two panels, so dictionaries grow between batches"""
+    for i in range(n):
+        if i % 2:
+            data, units = {"Glucose": 7.8, "Hemoglobin": 11.0}, {"Glucose": "mmol/L", "Hemoglobin": "g/dL"}
+        else:
+            data, units = {"Cholesterol": 240, "ALT": 30}, {"Cholesterol": "mg/dL", "ALT": "U/L"}
+        item = {"id": f"r{i}", "extraction": {"data": data, "units": units}, "context": {"sex": "female", "age": 40}}
+        if i == 0:
+            item["patient_id"] = "p-known"
+        yield item
+
+
+out = tempfile.mkdtemp(prefix="diagnova-export-")
+
+for number, name in enumerate(("results.parquet", "results.arrow"), 1):
+    path = os.path.join(out, name)
+    print("=" * 60)
+    print(f"{number}. {name} (3 rows per batch)")
+    print("=" * 60)
+    written = write_results(analyze_batch(reports(5)), path, row_group_size=3, patient_id="p-default")
+    check("rows written", written, 10)
+    table = read_results(path)
+    check("rows read back", table.num_rows, 10)
+    check("analytes across batches", sorted(set(table.column("analyte").to_pylist())),
+          ["alt", "hemoglobin", "random_glucose", "total_cholesterol"])
+    check("batches streamed back", sum(batch.num_rows for batch in iter_results(path, ["status"], batch_size=4)), 10)
+    glucose = read_results(path, filters=[("analyte", "=", "random_glucose")])
+    check("range kept exact in canonical units", (glucose.column("range_min")[0].as_py(),
+                                                  glucose.column("range_max")[0].as_py()), (70.0, 140.0))
+    check("patient id from the item, else the argument",
+          sorted(set(table.column("patient_id").to_pylist())), ["p-default", "p-known"])
+    print()
+
+path = os.path.join(out, "no-patient.arrow")
+write_results(analyze_batch(reports(3)), path, row_group_size=2)
+check("no patient id argument leaves it null", read_results(path).column("patient_id").to_pylist()[2:], [None] * 4)
+
+finish()
@@ -3,25 +3,26 @@ Test script to verify Groq LLM integration and extraction pipeline
 Run this to check if everything is working before running the full Streamlit app
 """
 
-# Mock streamlit secrets for testing
-class MockSecrets:
-    def get(self, key, default=None):
-        # Read from secrets.toml file
-        try:
-            with open('.streamlit/secrets.toml', 'r') as f:
-                for line in f:
-                    if line.strip().startswith('GROQ_API_KEY'):
-                        return line.split('=')[1].strip().strip('"').strip("'")
-        except:
-            pass
-        return default
-
-# Inject mock before importing
 import sys
 sys.path.insert(0, '.')
 
-import streamlit as st
-st.secrets = MockSecrets()
+from utils.llm_client import configure
+
+
+def read_api_key(default=None):
+    """Read GROQ_API_KEY from .streamlit/secrets.toml"""
+    try:
+        with open('.streamlit/secrets.toml', 'r') as f:
+            for line in f:
+                if line.strip().startswith('GROQ_API_KEY'):
+                    return line.split('=')[1].strip().strip('"').strip("'")
+    except:
+        pass
+    return default
+
+
+# Without secrets.toml the core falls back to the GROQ_API_KEY env var
+configure(api_key=read_api_key())
 
 from utils.extractor import process_lab_report
 
@@ -0,0 +1,55 @@
+"""
+History store test script for Diagnova
+Saves monthly panels to a throwaway SQLite file and checks the trend queries
+Run: python test_history.py
+"""
+
+import os
+import tempfile
+
+from checks import check, finish
+from utils.analyzer import process_lab_results
+from utils.history import save_analysis, get_series, get_trends, list_reports
+
+
+def panel(hemoglobin, unit="g/dL"):
+    """Minimal analysis package with one hemoglobin result"""
+    factor = 0.1 if unit == "g/L" else 1.0
+    canonical = hemoglobin * factor
+    return {"results": [{
+        "name": "Hemoglobin", "analyte": "hemoglobin", "value": hemoglobin, "unit": unit,
+        "canonical_value": canonical, "reference": "13.5 – 17.5" if unit == "g/dL" else "135 – 175",
+        "range_min": 13.5, "range_max": 17.5,
+        "range_source": "builtin", "status": "green" if 13.5 <= canonical <= 17.5 else "red",
+    }]}
+
+
+db = os.path.join(tempfile.mkdtemp(), "history.db")
+
+print("=" * 60)
+print("1. Saving reports")
+print("=" * 60)
+save_analysis("p1", panel(12.0), "2026-01-01", "r1", path=db)
+save_analysis("p1", panel(130, "g/L"), "2026-01-31", "r2", path=db)
+save_analysis("p1", panel(14.0), "2026-03-02", "r3", path=db)
+save_analysis("p1", panel(14.0), "2026-03-02", "r3", path=db)   # Re-save: no duplicate
+save_analysis("p2", panel(16.0), "2026-01-01", "r1", path=db)
+check("reports per patient", len(list_reports("p1", path=db)), 3)
+check("g/L stored canonically", get_series("p1", "Hb", path=db)[1]["canonical_value"], 13.0)
+check("range stored canonically", get_series("p1", "Hb", path=db)[1]["range_min"], 13.5)
+glucose = process_lab_results({"data": {"Glucose": 7.8}, "units": {"Glucose": "mmol/L"}})
+save_analysis("p3", glucose, "2026-01-01", "r1", path=db)
+check("range not re-parsed from the display", (get_series("p3", "glucose", path=db)[0]["range_min"],
+                                                get_series("p3", "glucose", path=db)[0]["range_max"]), (70.0, 140.0))
+
+print("\n" + "=" * 60)
+print("2. Trend queries")
+print("=" * 60)
+trend = get_trends("p1", path=db)["hemoglobin"]
+check("count", trend["count"], 3)
+check("delta since last", round(trend["delta"], 2), 1.0)
+check("slope per 30 days", round(trend["slope_per_30d"], 2), 1.0)
+check("time in range (out of range until March)", trend["time_in_range"], 0.0)
+check("other patients isolated", get_trends("p2", path=db)["hemoglobin"]["count"], 1)
+
+finish()
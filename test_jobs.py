@@ -0,0 +1,71 @@
+"""
+Background job test script for Diagnova
+Runs small jobs on a one-worker pool and checks progress, queueing and cancellation
+Run: python test_jobs.py
+"""
+
+import os
+import threading
+import time
+
+os.environ["DIAGNOVA_JOB_WORKERS"] = "1"
+
+from checks import check, finish
+from utils.jobs import submit_job, get_job, cancel_job, forget_job, job_progress, job_stats
+from utils.log import request_context, current_request_id
+
+
+def wait(job_id, timeout=5.0):
+    """Poll until the job has finished"""
+    deadline = time.time() + timeout
+    while get_job(job_id)["status"] in ("queued", "running") and time.time() < deadline:
+        time.sleep(0.01)
+    return get_job(job_id)
+
+
+def stepped(steps, gate):
+    """Job that reports progress per step and blocks on `gate` after the first"""
+    for i in range(steps):
+        job_progress("Working", i / steps)
+        if i == 0:
+            gate.wait(5)
+    return steps
+
+
+def failing():
+    raise ValueError("bad report")
+
+
+print("=" * 60)
+print("1. Results, errors and context")
+print("=" * 60)
+job = wait(submit_job(sum, [1, 2, 3]))
+check("done", (job["status"], job["result"]), ("done", 6))
+job = wait(submit_job(failing))
+check("failed", (job["status"], job["error"]), ("failed", "ValueError: bad report"))
+with request_context("req-1"):
+    job_id = submit_job(current_request_id)
+check("request id carried into the job", wait(job_id)["result"], "req-1")
+forget_job(job_id)
+check("forgotten job is gone", get_job(job_id), None)
+check("job_progress outside a job is a no-op", job_progress("Idle", 0.5), None)
+
+print("\n" + "=" * 60)
+print("2. Progress, queueing and cancellation")
+print("=" * 60)
+gate = threading.Event()
+running = submit_job(stepped, 4, gate)
+queued = submit_job(sum, [1])
+time.sleep(0.1)
+snapshot = get_job(running)
+check("running job reports its stage", (snapshot["status"], snapshot["stage"]), ("running", "Working"))
+check("second job waits for the one worker", get_job(queued)["status"], "queued")
+check("stats", (job_stats()["running"], job_stats()["queued"]), (1, 1))
+check("cancel queued job", cancel_job(queued), True)
+check("queued job never runs", get_job(queued)["status"], "cancelled")
+check("cancel running job", cancel_job(running), True)
+gate.set()
+check("running job stops at its next progress call", wait(running)["status"], "cancelled")
+check("cancel finished job", cancel_job(running), False)
+
+finish()
@@ -0,0 +1,70 @@
+"""
+Reference range test script for Diagnova
+Checks range parsing, analyte/unit canonicalization, vectorized scoring
+and age/sex-stratified lookup
+Run: python test_reference_ranges.py
+"""
+
+from checks import check, finish
+from utils.analyzer_fixed import detect_patterns
+from utils.extractor import regex_fallback_extraction
+from utils.reference_ranges import (
+    parse_reference_range, canonical_analyte, unit_factor, get_reference_range, age_group_for, DAY,
+)
+from utils.range_table import assess_all
+
+print("=" * 60)
+print("1. Report-printed range parsing")
+print("=" * 60)
+check("closed interval", parse_reference_range("13.0 - 17.0")["max"], 17.0)
+check("en dash, no spaces", parse_reference_range("0.4–4.5")["min"], 0.4)
+check("thousands separators", parse_reference_range("150,000 - 400,000")["min"], 150000.0)
+check("upper limit", parse_reference_range("< 200")["max"], 200.0)
+check("lower limit", parse_reference_range("> 40")["max"], float("inf"))
+check("no range", parse_reference_range("N/A"), None)
+check("exponent unit kept out of the range", regex_fallback_extraction("WBC Count 7.8 10^3/uL 4.0-11.0"),
+      {"WBC Count": {"value": "7.8", "unit": "10^3/uL", "reference_range": "4.0-11.0"}})
+
+print("\n" + "=" * 60)
+print("2. Analyte and unit canonicalization")
+print("=" * 60)
+check("Hb alias", canonical_analyte("Hb"), "hemoglobin")
+check("ALT (SGPT)", canonical_analyte("ALT (SGPT)"), "alt")
+check("unknown analyte", canonical_analyte("Ferritin"), None)
+check("bare glucose is not fasting", (canonical_analyte("Glucose"), canonical_analyte("FBS")),
+      ("random_glucose", "fasting_glucose"))
+check("g/L -> g/dL", unit_factor("hemoglobin", "g/L"), 0.1)
+check("micro sign variants", unit_factor("wbc_count", "10^3/µL"), 1000.0)
+
+print("\n" + "=" * 60)
+print("3. Vectorized scoring")
+print("=" * 60)
+scored = assess_all(
+    ["Hemoglobin", "Hemoglobin", "WBC Count", "Platelets", "Ferritin", "Mystery Test"],
+    [11.2, 130, 9.8, 40000, 8, 1.0],
+    ["g/dL", "g/L", "10^3/uL", "/μL", "ng/mL", ""],
+    [None, None, None, None, {"min": 15, "max": 150}, None],
+    "male",
+)
+check("statuses", scored["status"].tolist(), ["red", "yellow", "green", "red", "red", "yellow"])
+check("range sources", scored["range_source"].tolist(),
+      ["builtin", "builtin", "builtin", "builtin", "report", "none"])
+check("g/L converted", round(float(scored["canonical_value"][1]), 2), 13.0)
+check("130 mg/dL random glucose is normal, fasting is not",
+      assess_all(["Glucose", "Fasting Glucose"], [130, 130])["status"].tolist(), ["green", "red"])
+check("unlabelled glucose still gets recommendations",
+      [len(detect_patterns([{"name": "Glucose", "value": value}])) for value in (120, 140, 250)], [0, 1, 1])
+
+print("\n" + "=" * 60)
+print("4. Age- and sex-stratified ranges")
+print("=" * 60)
+check("neonate hemoglobin", get_reference_range("Hb", "default", age=10 * DAY), {"min": 14.0, "max": 24.0})
+check("adolescent female", get_reference_range("Hemoglobin", "female", age=15)["min"], 12.0)
+check("geriatric male", get_reference_range("Hemoglobin", "male", age=70)["min"], 12.5)
+check("adult falls back to table", get_reference_range("Creatinine", "female", age=40)["max"], 1.1)
+check("age groups", [age_group_for(a) for a in (0.01, 0.5, 5, 15, 40, 80)],
+      ["neonatal", "infant", "child", "adolescent", "adult", "geriatric"])
+scored = assess_all(["Hb", "Hb", "WBC"], [18, 18, 25000], genders="default", ages=[0.02, 30, 0.02])
+check("vectorized strata", scored["status"].tolist(), ["green", "red", "green"])
+
+finish()
@@ -0,0 +1,93 @@
+"""
+Session store test script for Diagnova
+Checks LRU eviction by size, spill-to-disk and per-session memory accounting
+Run: python test_session_store.py
+"""
+
+import os
+import tempfile
+import threading
+
+spill_dir = tempfile.mkdtemp(prefix="diagnova-spill-")
+os.environ["DIAGNOVA_SESSION_STORE_MB"] = str(10 / 1024)   # 10 KB
+os.environ.pop("DIAGNOVA_SESSION_SPILL_DIR", None)
+
+from checks import check, finish
+from utils.session_store import (
+    store_payload, get_payload, drop_payload, store_stats, session_footprint, clear_store,
+)
+
+
+def payload(n):
+    return {"results": [{"name": f"Test {i}", "explanation": f"{i} " + "x" * 400} for i in range(n)]}
+
+
+print("=" * 60)
+print("1. Size-bounded LRU")
+print("=" * 60)
+check("store returns the key", store_payload("analysis:a", payload(8)), "analysis:a")
+store_payload("analysis:b", payload(8))
+check("both fit", (get_payload("analysis:a") is not None, store_stats()["entries"]), (True, 2))
+store_payload("analysis:c", payload(8))
+check("least recently used evicted", (get_payload("analysis:b") is None, store_stats()["evictions"]), (True, 1))
+check("recently read entry kept", len(get_payload("analysis:a")["results"]), 8)
+check("bytes within capacity", store_stats()["bytes"] <= store_stats()["capacity_bytes"], True)
+check("default for unknown key", get_payload("chat:nobody", []), [])
+drop_payload("analysis:a")
+check("dropped", get_payload("analysis:a"), None)
+store_payload("analysis:big", payload(40))
+check("oversized payload still kept alone", (get_payload("analysis:big") is not None, store_stats()["entries"]), (True, 1))
+
+print("\n" + "=" * 60)
+print("2. Spill to disk")
+print("=" * 60)
+clear_store()
+os.environ["DIAGNOVA_SESSION_SPILL_DIR"] = spill_dir
+store_payload("analysis:a", payload(8))
+store_payload("analysis:b", payload(8))
+store_payload("analysis:c", payload(8))
+check("evicted entry written to disk", (store_stats()["spilled_entries"], len(os.listdir(spill_dir))), (1, 1))
+check("spilled entry comes back", len(get_payload("analysis:a")["results"]), 8)
+check("reloaded from disk", store_stats()["spill_reads"], 1)
+drop_payload("analysis:a")
+drop_payload("analysis:b")
+clear_store()
+check("clear removes spill files", os.listdir(spill_dir), [])
+
+print("\n" + "=" * 60)
+print("3. Per-session footprint")
+print("=" * 60)
+store_payload("analysis:s1", payload(4))
+state = {"analysis_ref": "analysis:s1", "chat_ref": None, "active_tab": "📋 Analysis"}
+footprint = session_footprint(state)
+check("stored payload counted for its ref", list(footprint["stored"]), ["analysis:s1"])
+check("session state itself is small", footprint["state_bytes"] < 200, True)
+check("total", footprint["total_bytes"], footprint["state_bytes"] + footprint["stored_bytes"])
+
+print("\n" + "=" * 60)
+print("4. Concurrent sessions spilling")
+print("=" * 60)
+clear_store()
+wrong = []
+
+
+def session(n):
+    for round_ in range(30):
+        store_payload(f"analysis:t{n}", {"round": round_, **payload(8)})
+        got = get_payload(f"analysis:t{n}")
+        if got is not None and got["round"] != round_:
+            wrong.append((n, round_, got["round"]))
+
+
+threads = [threading.Thread(target=session, args=(n,)) for n in range(6)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+check("every session reads its latest payload", wrong, [])
+check("spill files match the index", len(os.listdir(spill_dir)), store_stats()["spilled_entries"])
+check("all sessions still reachable", sum(get_payload(f"analysis:t{n}") is not None for n in range(6)), 6)
+clear_store()
+check("clear removes spill files", os.listdir(spill_dir), [])
+
+finish()
@@ -0,0 +1,194 @@
+# utils/analysis_cache.py
+
+"""
+Content-addressed cache for uploads, extractions, full analyses and LLM
+responses.
+
+Entries live in the process's cache backend (utils/cache_backend.py): by
+default an in-memory LRU shared by every Streamlit session in the process,
+or a SQLite file / Redis server shared by every replica. A report that was
+already analyzed (refresh, re-analyze click, shared with family) comes back
+without re-extracting or calling the LLM, whichever replica served it first.
+A backend that fails is treated as a miss, so the cache never breaks an
+analysis.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+
+from utils.cache_backend import get_cache_backend
+from utils.log import get_logger
+
+MAX_UPLOADS = 256      # raw upload hash -> extracted text
+MAX_EXTRACTIONS = 256  # report text hash -> extraction package
+MAX_ANALYSES = 512     # report hash + context + profile -> analysis package
+MAX_EXPLANATIONS = 4096  # test + value + status + range -> LLM explanation
+MAX_LLM_RESPONSES = 4096  # model + messages + sampling settings -> completion text
+LLM_CACHE_ENV = "DIAGNOVA_LLM_CACHE"   # "0" turns the LLM response cache off
+
+NAMESPACES = ("uploads", "extractions", "analyses", "explanations", "llm")
+
+log = get_logger(__name__)
+
+_stats = {namespace: {"hits": 0, "misses": 0, "errors": 0} for namespace in NAMESPACES}
+_lock = threading.Lock()
+
+
+def normalize_report_text(text: str) -> str:
+    """
+    Normalize report text so cosmetic differences hash identically.
+
+    Applies Unicode NFKC (e.g. full-width digits, ligatures), unifies line
+    endings, collapses runs of spaces/tabs and drops blank lines.
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def content_hash(content) -> str:
+    """
+    SHA-256 of an upload or report text.
+
+    Args:
+        content: Raw file bytes, or report text (normalized before hashing)
+
+    Returns:
+        str: Hex digest
+    """
+    if isinstance(content, str):
+        content = normalize_report_text(content).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+def analysis_key(report_hash: str, patient_context: dict = None, user_profile: dict = None) -> str:
+    """
+    Cache key for a full analysis: the same report analyzed for a different
+    patient context, profile or summary language is a different entry.
+    """
+    payload = json.dumps(
+        {"report": report_hash, "context": patient_context or {}, "profile": user_profile or {}},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _get(namespace: str, key: str):
+    # Backends hand out a copy (pickled or deep-copied), safe for callers to mutate
+    try:
+        value = get_cache_backend().get(namespace, key)
+        outcome = "misses" if value is None else "hits"
+    except Exception as e:
+        log.warning("Cache read failed (%s): %s", namespace, e)
+        value, outcome = None, "errors"
+    with _lock:
+        _stats[namespace][outcome] += 1
+    return value
+
+
+def _put(namespace: str, key: str, value, max_entries: int):
+    try:
+        get_cache_backend().set(namespace, key, value, max_entries)
+    except Exception as e:
+        log.warning("Cache write failed (%s): %s", namespace, e)
+        with _lock:
+            _stats[namespace]["errors"] += 1
+
+
+def get_upload_text(file_hash: str):
+    """Extracted text for a previously seen upload, or None."""
+    return _get("uploads", file_hash)
+
+
+def store_upload_text(file_hash: str, text: str):
+    if text:
+        _put("uploads", file_hash, text, MAX_UPLOADS)
+
+
+def get_extraction(report_hash: str):
+    """Extraction package for previously seen report text, or None."""
+    return _get("extractions", report_hash)
+
+
+def store_extraction(report_hash: str, extraction_package: dict):
+    # Don't pin a failed extraction; the next attempt may succeed
+    if extraction_package.get("metadata", {}).get("extraction_method", "failed") != "failed":
+        _put("extractions", report_hash, extraction_package, MAX_EXTRACTIONS)
+
+
+def get_analysis(key: str):
+    """Full analysis package for a key from analysis_key(), or None."""
+    return _get("analyses", key)
+
+
+def store_analysis(key: str, analysis_package: dict):
+    if analysis_package and analysis_package.get("results"):
+        _put("analyses", key, analysis_package, MAX_ANALYSES)
+
+
+def explanation_key(test_name: str, value, status: str, reference: str) -> str:
+    """Cache key for one result explanation (everything the prompt depends on)."""
+    return json.dumps([test_name, value, status, reference], default=str)
+
+
+def get_explanation(key: str):
+    """Explanation previously generated for the same result, or None."""
+    return _get("explanations", key)
+
+
+def store_explanation(key: str, explanation: str):
+    if explanation:
+        _put("explanations", key, explanation, MAX_EXPLANATIONS)
+
+
+def llm_cache_enabled() -> bool:
+    """LLM response cache on unless DIAGNOVA_LLM_CACHE is 0/false/no."""
+    return os.environ.get(LLM_CACHE_ENV, "1").lower() not in ("0", "false", "no")
+
+
+def llm_key(model: str, messages: list, temperature: float, max_tokens: int) -> str:
+    """Cache key for one completion: everything the request sends."""
+    payload = json.dumps([model, messages, temperature, max_tokens], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_llm_response(key: str):
+    """Completion previously returned for the same request, or None."""
+    return _get("llm", key)
+
+
+def store_llm_response(key: str, content: str):
+    if content:
+        _put("llm", key, content, MAX_LLM_RESPONSES)
+
+
+def cache_stats() -> dict:
+    """
+    Hits, misses and backend errors per namespace in this process.
+
+    Returns:
+        dict: {"backend": name, namespace: {"hits", "misses", "errors", "hit_rate"}}
+    """
+    with _lock:
+        stats = {namespace: dict(counts) for namespace, counts in _stats.items()}
+    for counts in stats.values():
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / lookups, 3) if lookups else None
+    stats["backend"] = getattr(get_cache_backend(), "name", type(get_cache_backend()).__name__)
+    return stats
+
+
+def clear_cache():
+    """Drop every cached upload, extraction, analysis, explanation and LLM response."""
+    for namespace in NAMESPACES:
+        try:
+            get_cache_backend().clear(namespace)
+        except Exception as e:
+            log.warning("Cache clear failed (%s): %s", namespace, e)
+    with _lock:
+        for counts in _stats.values():
+            counts.update(hits=0, misses=0, errors=0)
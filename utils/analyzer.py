@@ -1,18 +1,52 @@
 # utils/analyzer.py
 
-from utils.reference_ranges import get_reference_range, get_critical_limits
+from utils.reference_ranges import (
+    get_reference_unit, format_reference_range, normalize_sex, age_group_for,
+    analyte_key, canonical_analyte, parse_reference_range, context_dependencies,
+)
+from utils.range_table import assess_all
+from utils.pattern_rules import CLINICAL_PATTERNS, evaluate_rules, rule_inputs
+import numpy as np
 from utils.knowledge_base import MEDICAL_KNOWLEDGE
-import streamlit as st
-from groq import Groq
+from utils.retrieval import search
+from utils.llm_client import llm_available, chat_completion
+from utils.analysis_cache import explanation_key, get_explanation, store_explanation
+from utils.tracing import span, traced
+from utils.log import get_logger
+from utils.jobs import job_progress
 import json
 
+log = get_logger(__name__)
+
+@traced("retrieve_clinical_context")
+def retrieve_clinical_context(test_name: str, value: float, ref_range_str: str, k: int = 2) -> list:
+    """
+    Corpus passages for one result: likely causes and follow-up when the value
+    is out of range, the general interpretation otherwise. None for analytes
+    the corpus doesn't cover, rather than another analyte's passages.
+    """
+    bounds = parse_reference_range(ref_range_str)
+    direction = "normal"
+    if bounds and value < bounds["min"]:
+        direction = "low"
+    elif bounds and value > bounds["max"]:
+        direction = "high"
+    analyte = canonical_analyte(test_name)
+    if analyte is None:
+        return []
+    if direction == "normal":
+        return search(f"{test_name} interpretation", k=1, analyte=analyte)
+    return search(f"{test_name} {direction} follow up", k=k, analyte=analyte)
+
 def get_explanation_rag(test_name: str, value: float, status: str, ref_range_str: str):
     """
     FEATURE 1: Grounded Clinical Intelligence Engine
     Generates a patient-friendly explanation grounded in clinical context.
     """
-    kb_entry = MEDICAL_KNOWLEDGE.get(test_name.lower().replace(" ", "_"), {})
+    kb_entry = MEDICAL_KNOWLEDGE.get(analyte_key(test_name), {})
     definition = kb_entry.get("definition", "No specific definition available.")
+    passages = retrieve_clinical_context(test_name, value, ref_range_str)
+    clinical_context = "\n    ".join(f"- {p['text']}" for p in passages) or "- None available."
     
     prompt = f"""
     You are a helpful medical assistant focusing on lab report explanations.
@@ -22,121 +56,107 @@ def get_explanation_rag(test_name: str, value: float, status: str, ref_range_str
     Status: {status}
     Reference Range: {ref_range_str}
     Medical Definition: {definition}
+    Clinical Context:
+    {clinical_context}
     
     Instruction:
     1. Generate a grounded, simple, one-sentence explanation for this result.
-    2. Use the provided medical definition.
+    2. Use the provided medical definition and clinical context.
     3. NO diagnosis. NO medication advice.
     4. MUST end with: "Please consult your physician for clinical interpretation."
     5. Be encouraging but medically safe.
     """
     
     try:
-        api_key = st.secrets.get("GROQ_API_KEY", "")
-        if not api_key:
+        if not llm_available():
             return f"Your {test_name} is {status} ({ref_range_str}). {definition} Please consult your physician for clinical interpretation."
-            
-        client = Groq(api_key=api_key)
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=150
-        )
-        return response.choices[0].message.content.strip()
+        
+        # Same test, value, status and range as an earlier call: reuse the text. Keyed by
+        # the canonical analyte, so the raw extracted name and the card's title-cased
+        # name (used when re-scoring) hit the same entry
+        cache_key = explanation_key(analyte_key(test_name), value, status, ref_range_str)
+        cached = get_explanation(cache_key)
+        if cached is not None:
+            return cached
+        
+        explanation = chat_completion([{"role": "user", "content": prompt}], temperature=0.3, max_tokens=150).strip()
+        store_explanation(cache_key, explanation)
+        return explanation
     except:
         return f"Your {test_name} is {status} ({ref_range_str}). {definition} Please consult your physician for clinical interpretation."
 
-def detect_clinical_patterns(data: dict):
+@traced("detect_clinical_patterns")
+def detect_clinical_patterns(results: list):
     """
     FEATURE 2: Multi-Parameter Clinical Pattern Detection
     - Grounded Clinical Intelligence Engine: Explain parameters using a clinical corpus.
-    Rule-based reasoning for combined results.
+    Rule-based reasoning for combined results, driven by the declarative
+    rules in utils/pattern_rules.py.
     """
+    values, statuses, shown = rule_inputs(results)
     patterns = []
-    
-    # 1. Anemia Pattern: Low Hb + Low MCV
-    hb = data.get("Hemoglobin") or data.get("Hb")
-    mcv = data.get("MCV")
-    if hb and mcv and hb < 12 and mcv < 80:
+    for rule in evaluate_rules(CLINICAL_PATTERNS, values, statuses):
         patterns.append({
-            "title": "Possible Iron Deficiency Pattern",
-            "evidence": f"Low Hemoglobin ({hb}) and Low MCV ({mcv})",
-            "insight": "This combination often suggests iron deficiency anemia, though other causes are possible.",
-            "severity": "medium"
-        })
-    elif hb and hb < 12:
-         patterns.append({
-            "title": "Low Hemoglobin Detected",
-            "evidence": f"Hb ({hb}) is below normal range",
-            "insight": "Anemia involves lower-than-normal red blood cell levels or oxygen-carrying capacity.",
-            "severity": "medium"
+            "id": rule["id"],
+            "title": rule["title"],
+            "evidence": rule["evidence"].format_map(shown),
+            "insight": rule["insight"],
+            "severity": rule["severity"]
         })
+    return patterns
 
-    # 2. Infection Pattern: High WBC
-    wbc = data.get("WBC Count") or data.get("WBC") or data.get("White Blood Cells")
-    if wbc and wbc > 11000:
-        patterns.append({
-            "title": "Elevated White Blood Cell Count",
-            "evidence": f"WBC count ({wbc}) is high",
-            "insight": "This may indicate the body's response to infection, inflammation, or stress.",
-            "severity": "medium"
-        })
-        
-    # 3. Kidney Function: High Creatinine + High Urea
-    creatinine = data.get("Creatinine")
-    urea = data.get("Urea") or data.get("BUN")
-    if creatinine and creatinine > 1.3:
-        severity = "high" if creatinine > 2.0 else "medium"
-        patterns.append({
-            "title": "Kidney Function Insight",
-            "evidence": f"Creatinine ({creatinine}) is above the normal range",
-            "insight": "Elevated creatinine levels can reflect how well your kidneys are filtering waste.",
-            "severity": severity
-        })
+def _range_display(scored: dict, i: int, unit: str) -> str:
+    """Reference range of row i for the card, in the same unit as the value."""
+    source = scored["range_source"][i]
+    if source == "none":
+        return "Reference range not available"
+    min_val, max_val = scored["range_min"][i], scored["range_max"][i]
+    if source == "builtin":
+        factor = scored["unit_factor"][i]
+        if np.isnan(factor):
+            # Unknown unit: the value was compared as if in the table's unit
+            unit = get_reference_unit(scored["analyte"][i])
+        else:
+            min_val, max_val = min_val / factor, max_val / factor
+    return format_reference_range(round(float(min_val), 2), round(float(max_val), 2), unit)
 
-    return patterns
+def _canonical_bounds(scored: dict, i: int) -> tuple:
+    """Reference range of row i in the table's unit, None for a missing or open bound."""
+    if scored["range_source"][i] == "none":
+        return None, None
+    min_val, max_val = scored["range_min"][i], scored["range_max"][i]
+    if scored["range_source"][i] == "report":
+        # Report ranges are in the report's unit; an unknown unit is taken as the table's
+        factor = scored["unit_factor"][i]
+        if not np.isnan(factor):
+            min_val, max_val = min_val * factor, max_val * factor
+    return (float(min_val) if np.isfinite(min_val) else None,
+            float(max_val) if np.isfinite(max_val) else None)
 
+
+@traced("assess_risk")
 def assess_risk(test_name: str, value: float, unit: str = None, 
-                gender: str = "default", age_group: str = "adult"):
+                gender: str = "default", age_group: str = "adult",
+                reference_range: dict = None, age: float = None):
     """
     Inner function for individual parameter assessment.
+    
+    Prefers the reference range printed on the report (reference_range),
+    falling back to the built-in table. Scoring is shared with the batch
+    path via range_table.assess_all.
     """
-    ref_range = get_reference_range(test_name, gender, age_group)
-    if not ref_range:
+    scored = assess_all([test_name], [value], [unit], [reference_range], gender, age_group, age)
+    if scored["range_source"][0] == "none":
         return {
             "status": "yellow",
             "range": "Reference range not available",
+            "range_source": "none",
             "message": f"Unable to find reference range for {test_name}",
             "bar_pct": 50
         }
     
-    min_val = ref_range.get("min", 0)
-    max_val = ref_range.get("max", 100)
-    critical = get_critical_limits(test_name)
-    
-    status = "green"
-    if value < min_val:
-        deviation = ((min_val - value) / min_val) * 100
-        status = "red" if deviation > 10 else "yellow"
-    elif value > max_val:
-        deviation = ((value - max_val) / max_val) * 100
-        status = "red" if deviation > 10 else "yellow"
-
-    if critical:
-        if value < critical.get("low", -float('inf')) or value > critical.get("high", float('inf')):
-            status = "red"
-
-    # Bar percentage calculation
-    if value < min_val:
-        bar_pct = max(10, (value / min_val) * 30)
-    elif value > max_val:
-        ratio = value / max_val
-        bar_pct = min(90, 70 + (ratio * 15))
-    else:
-        bar_pct = 30 + ((value - min_val) / (max_val - min_val) * 40)
-
-    range_str = f"{min_val} – {max_val} {unit if unit else ''}".strip()
+    status = str(scored["status"][0])
+    range_str = _range_display(scored, 0, unit)
     
     # Feature 1: Get RAG explanation
     explanation = get_explanation_rag(test_name, value, status, range_str)
@@ -144,10 +164,12 @@ def assess_risk(test_name: str, value: float, unit: str = None,
     return {
         "status": status,
         "range": range_str,
+        "range_source": str(scored["range_source"][0]),
         "message": explanation,
-        "bar_pct": int(bar_pct)
+        "bar_pct": int(scored["bar_pct"][0])
     }
 
+@traced("generate_health_coach_plan")
 def generate_health_coach_plan(results: list, patterns: list, profile: dict):
     """
     FEATURE 3: Personalized Health Coach
@@ -182,21 +204,14 @@ def generate_health_coach_plan(results: list, patterns: list, profile: dict):
     """
     
     try:
-        api_key = st.secrets.get("GROQ_API_KEY", "")
-        if not api_key:
+        if not llm_available():
             return "Fill out your profile to receive a personalized health plan."
             
-        client = Groq(api_key=api_key)
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=600
-        )
-        return response.choices[0].message.content.strip()
+        return chat_completion([{"role": "user", "content": prompt}], temperature=0.7, max_tokens=600).strip()
     except:
         return "Unable to generate health plan. Please consult your physician."
 
+@traced("generate_summary_ai")
 def generate_summary_ai(results: list, patterns: list, language: str = "English"):
     """
     FEATURE 3: AI-Generated Patient Summary
@@ -226,18 +241,10 @@ def generate_summary_ai(results: list, patterns: list, language: str = "English"
     """
     
     try:
-        api_key = st.secrets.get("GROQ_API_KEY", "")
-        if not api_key:
+        if not llm_available():
             return "Unable to generate AI summary at this time. Please review individual results and consult your doctor."
             
-        client = Groq(api_key=api_key)
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.4,
-            max_tokens=300
-        )
-        return response.choices[0].message.content.strip()
+        return chat_completion([{"role": "user", "content": prompt}], temperature=0.4, max_tokens=300).strip()
     except:
         return "An error occurred generating summary. Please consult your physician for interpretation."
 
@@ -252,37 +259,111 @@ def calculate_confidence_score(extraction_metadata: dict, results_count: int):
         return "Medium"
     return "Low"
 
-def process_lab_results(extraction_package: dict, patient_context: dict = None):
-    """
-    Main entry point for analysis.
+def build_results(names: list, values: list, units: list, scored: dict, start: int = 0) -> list:
     """
-    data = extraction_package.get("data", {})
-    metadata = extraction_package.get("metadata", {})
-    user_profile = st.session_state.get("user_profile", {})
+    Result records for the dashboard from assess_all columns.
     
-    if patient_context is None:
-        patient_context = {"gender": "default", "age_group": "adult"}
+    Args:
+        names, values, units: Per-test inputs, aligned with scored[start:]
+        scored: Output of range_table.assess_all
+        start: Offset of these tests within the scored columns
     
+    Returns:
+        list: Result dicts with "explanation" left as None. "range_min" and
+              "range_max" are the numeric range in the canonical unit (None
+              when missing or open), "reference" its display in the value's
+              unit. "depends_on" lists the profile fields ("sex", "age") the
+              range, and so the status and explanation, depend on.
+    """
     results = []
-    for test_name, value in data.items():
-        risk_info = assess_risk(test_name, value, "", 
-                               patient_context.get("gender", "default"),
-                               patient_context.get("age_group", "adult"))
-        
+    for j, (test_name, value, unit) in enumerate(zip(names, values, units)):
+        i = start + j
+        range_min, range_max = _canonical_bounds(scored, i)
         results.append({
             "name": test_name.title().replace("_", " "),
+            "analyte": scored["analyte"][i],
             "value": value,
-            "unit": "",
-            "reference": risk_info["range"],
-            "status": risk_info["status"],
-            "bar_pct": risk_info["bar_pct"],
-            "explanation": risk_info["message"]
+            "unit": unit,
+            "canonical_value": float(scored["canonical_value"][i]),
+            "reference": _range_display(scored, i, unit),
+            "range_min": range_min,
+            "range_max": range_max,
+            "range_source": str(scored["range_source"][i]),
+            "status": str(scored["status"][i]),
+            "bar_pct": int(scored["bar_pct"][i]),
+            "depends_on": list(context_dependencies(scored["analyte"][i]))
+                          if scored["range_source"][i] == "builtin" else [],
+            "explanation": None
         })
+    return results
+
+def explain_result(test_name: str, result: dict) -> str:
+    """Patient-friendly explanation for one result (LLM call unless no range is known)."""
+    if result["range_source"] == "none":
+        return f"Unable to find reference range for {test_name}"
+    with span("explain_result", test=test_name):
+        return get_explanation_rag(test_name, result["value"], result["status"], result["reference"])
+
+def build_patient_context(profile: dict) -> dict:
+    """
+    Patient context for range selection from the sidebar profile.
+    
+    Returns:
+        dict: {"gender": "male" | "female" | "default", "age": years or None,
+               "age_group": "neonatal" ... "geriatric"}
+    """
+    profile = profile or {}
+    sex = normalize_sex(profile.get("sex"))
+    age = profile.get("age")
+    return {
+        "gender": sex if sex != "any" else "default",
+        "age": age,
+        "age_group": age_group_for(age),
+    }
+
+@traced("process_lab_results")
+def process_lab_results(extraction_package: dict, patient_context: dict = None,
+                        user_profile: dict = None):
+    """
+    Main entry point for analysis.
+    
+    Args:
+        extraction_package: Output of extractor.process_lab_report
+        patient_context: Range context (see build_patient_context); derived
+                         from user_profile when omitted
+        user_profile: Sidebar profile (age, sex, activity, goal, language)
+    """
+    data = extraction_package.get("data", {})
+    metadata = extraction_package.get("metadata", {})
+    user_profile = user_profile or {}
+    
+    if patient_context is None:
+        patient_context = build_patient_context(user_profile)
+    
+    units = extraction_package.get("units", {})
+    report_ranges = extraction_package.get("reference_ranges", {})
+    
+    # Score every value of the report in one vectorized pass
+    names = list(data)
+    job_progress("Checking values against reference ranges")
+    with span("assess_all", values=len(names)):
+        scored = assess_all(names, [data[n] for n in names],
+                            [units.get(n, "") for n in names],
+                            [report_ranges.get(n) for n in names],
+                            patient_context.get("gender", "default"),
+                            patient_context.get("age_group", "adult"),
+                            patient_context.get("age"))
+        results = build_results(names, [data[n] for n in names], [units.get(n, "") for n in names], scored)
+    for i, (test_name, result) in enumerate(zip(names, results)):
+        job_progress("Explaining results", i / len(results))
+        result["explanation"] = explain_result(test_name, result)
     
     # Feature 2: Patterns
-    patterns = detect_clinical_patterns(data)
+    job_progress("Looking for patterns")
+    patterns = detect_clinical_patterns(results)
     
     # Feature 3: Summary
+    job_progress("Writing your summary")
     language = user_profile.get("language", "English")
     ai_summary = generate_summary_ai(results, patterns, language)
     
@@ -290,12 +371,96 @@ def process_lab_results(extraction_package: dict, patient_context: dict = None):
     confidence = calculate_confidence_score(metadata, len(results))
     
     # Phase 2 - Feature 3: Health Coach
+    job_progress("Building your health plan")
     health_plan = generate_health_coach_plan(results, patterns, user_profile)
     
+    log.debug("Analyzed %d results (%d abnormal), %d patterns", len(results),
+              sum(r["status"] == "red" for r in results), len(patterns))
+    
     return {
         "results": results,
         "patterns": patterns,
         "summary": ai_summary,
         "confidence": confidence,
-        "health_plan": health_plan
+        "health_plan": health_plan,
+        "context": patient_context,
+        "profile": dict(user_profile)
     }
+
+def _summary_inputs(results: list, patterns: list, profile: dict) -> tuple:
+    """Everything generate_summary_ai's output depends on."""
+    return (len([r for r in results if r["status"] == "red"]),
+            len([r for r in results if r["status"] == "yellow"]),
+            len(results), json.dumps(patterns, sort_keys=True),
+            profile.get("language", "English"))
+
+def _health_plan_inputs(results: list, patterns: list, profile: dict) -> tuple:
+    """Everything generate_health_coach_plan's output depends on."""
+    return (profile.get("age"), profile.get("activity"), profile.get("goal"),
+            tuple(r["name"] for r in results if r["status"] == "red"),
+            tuple(p["title"] for p in patterns))
+
+@traced("reanalyze_for_context")
+def reanalyze_for_context(analysis: dict, user_profile: dict, patient_context: dict = None) -> dict:
+    """
+    Update an analysis for a changed profile without redoing unaffected work.
+    
+    Only results whose "depends_on" fields changed are re-scored; their
+    explanations are regenerated only if status or range actually changed
+    (and then come from the explanation cache when seen before). Patterns
+    are recomputed (cheap); summary and health plan are regenerated only
+    when their inputs changed, e.g. a new language or new abnormal results.
+    
+    Args:
+        analysis: Package from process_lab_results (not modified)
+        user_profile: New sidebar profile
+        patient_context: New range context (derived from user_profile if omitted)
+    
+    Returns:
+        dict: New analysis package for the profile
+    """
+    user_profile = user_profile or {}
+    old_profile = analysis.get("profile") or {}
+    old_context = analysis.get("context") or build_patient_context(old_profile)
+    if patient_context is None:
+        patient_context = build_patient_context(user_profile)
+    
+    changed = set()
+    if patient_context.get("gender") != old_context.get("gender"):
+        changed.add("sex")
+    if (patient_context.get("age") != old_context.get("age")
+            or patient_context.get("age_group") != old_context.get("age_group")):
+        changed.add("age")
+    
+    results = [dict(r) for r in analysis.get("results", [])]
+    affected = [i for i, r in enumerate(results) if changed & set(r.get("depends_on", []))]
+    if affected:
+        names = [results[i]["analyte"] for i in affected]
+        values = [results[i]["value"] for i in affected]
+        units = [results[i]["unit"] for i in affected]
+        scored = assess_all(names, values, units, None,
+                            patient_context.get("gender", "default"),
+                            patient_context.get("age_group", "adult"),
+                            patient_context.get("age"))
+        for i, rescored in zip(affected, build_results(names, values, units, scored)):
+            old = results[i]
+            rescored["name"] = old["name"]
+            if (rescored["status"], rescored["reference"]) == (old["status"], old["reference"]):
+                rescored["explanation"] = old.get("explanation")
+            else:
+                rescored["explanation"] = explain_result(old["name"], rescored)
+            results[i] = rescored
+    
+    patterns = detect_clinical_patterns(results) if affected else analysis.get("patterns", [])
+    old_results, old_patterns = analysis.get("results", []), analysis.get("patterns", [])
+    
+    summary = analysis.get("summary")
+    if _summary_inputs(results, patterns, user_profile) != _summary_inputs(old_results, old_patterns, old_profile):
+        summary = generate_summary_ai(results, patterns, user_profile.get("language", "English"))
+    
+    health_plan = analysis.get("health_plan")
+    if _health_plan_inputs(results, patterns, user_profile) != _health_plan_inputs(old_results, old_patterns, old_profile):
+        health_plan = generate_health_coach_plan(results, patterns, user_profile)
+    
+    return dict(analysis, results=results, patterns=patterns, summary=summary,
+                health_plan=health_plan, context=patient_context, profile=dict(user_profile))
@@ -5,6 +5,10 @@ Lab test risk analysis with pattern detection and intelligent recommendations.
 """
 
 from utils.reference_ranges import get_reference_range, get_critical_limits
+from utils.pattern_rules import RECOMMENDATIONS, evaluate_rules, rule_inputs
+from utils.log import get_logger
+
+log = get_logger(__name__)
 
 
 def assess_risk(test_name: str, value: float, unit: str = "", 
@@ -120,63 +124,17 @@ def detect_patterns(results: list) -> list:
     """
     Detect medical patterns across multiple lab values.
     
+    Uses the declarative RECOMMENDATION_RULES (utils/pattern_rules.py), so only
+    rules whose analytes are present in the results get evaluated.
+    
     Args:
         results: List of result dictionaries with name, value, status
     
     Returns:
         list: List of detected pattern strings
     """
-    patterns = []
-    
-    # Helper to find results by name
-    def find_test(name_substring):
-        return [r for r in results if name_substring.lower() in r["name"].lower()]
-    
-    # Pattern 1: Anemia indicators
-    hb_tests = find_test("hemoglobin")
-    if hb_tests and hb_tests[0]["status"] in ["red", "yellow"]:
-        if hb_tests[0]["value"] < 12:
-            patterns.append("Possible anemia detected (low hemoglobin). Consider iron studies, B12, and folate levels.")
-    
-    # Pattern 2: Diabetes indicators
-    glucose_tests = find_test("glucose")
-    if glucose_tests and glucose_tests[0]["value"] > 100:
-        if glucose_tests[0]["value"] >= 126:
-            patterns.append("Fasting glucose in diabetic range. HbA1c testing recommended.")
-        elif glucose_tests[0]["value"] > 100:
-            patterns.append("Fasting glucose elevated. Pre-diabetic range - lifestyle modifications recommended.")
-    
-    # Pattern 3: Kidney function
-    creatinine_tests = find_test("creatinine")
-    if creatinine_tests and creatinine_tests[0]["status"] == "red":
-        patterns.append("Elevated creatinine may indicate reduced kidney function. Additional kidney function tests recommended.")
-    
-    # Pattern 4: Liver function
-    alt_tests = find_test("alt")
-    ast_tests = find_test("ast")
-    if (alt_tests and alt_tests[0]["status"] in ["red", "yellow"]) or \
-       (ast_tests and ast_tests[0]["status"] in ["red", "yellow"]):
-        patterns.append("Liver enzyme elevation detected. Avoid alcohol and hepatotoxic medications. Consult physician.")
-    
-    # Pattern 5: Lipid profile issues
-    chol_tests = find_test("cholesterol")
-    if chol_tests and chol_tests[0]["value"] > 200:
-        patterns.append("Elevated cholesterol. Dietary modifications (low saturated fat) and exercise recommended.")
-    
-    # Pattern 6: Infection/inflammation indicators
-    wbc_tests = find_test("wbc")
-    if wbc_tests and wbc_tests[0]["value"] > 11000:
-        patterns.append("Elevated WBC count may indicate infection or inflammation.")
-    
-    # Pattern 7: Clotting risk
-    platelet_tests = find_test("platelet")
-    if platelet_tests:
-        if platelet_tests[0]["value"] < 100000:
-            patterns.append("Low platelet count increases bleeding risk. Avoid NSAIDs and contact sports.")
-        elif platelet_tests[0]["value"] > 500000:
-            patterns.append("Elevated platelet count may increase clotting risk.")
-    
-    return patterns
+    values, statuses, _ = rule_inputs(results, value_key="value")
+    return [rule["insight"] for rule in evaluate_rules(RECOMMENDATIONS, values, statuses)]
 
 
 def generate_summary(results: list, patterns: list) -> str:
@@ -345,7 +303,7 @@ def process_lab_results(extracted_data: dict, patient_context: dict = None):
             })
         
         except Exception as e:
-            print(f"⚠️ Error processing {test_name}: {str(e)}")
+            log.warning("Error processing %s: %s", test_name, e)
             continue
     
     # Detect patterns
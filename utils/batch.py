@@ -0,0 +1,150 @@
+# utils/batch.py
+
+"""
+Cohort batch analysis over many lab reports.
+
+Scores a clinic's daily batch (or years of history) without Streamlit and
+without the LLM: reports are consumed in chunks, every value of a chunk is
+range-assessed in one vectorized pass, patterns come from the rule index,
+and analyses are streamed out one report at a time. LLM explanations,
+summaries and health plans are an optional later stage (add_llm_text).
+"""
+
+from itertools import islice
+
+from utils.analyzer import (
+    build_results, build_patient_context, calculate_confidence_score,
+    detect_clinical_patterns, explain_result, generate_summary_ai,
+    generate_health_coach_plan,
+)
+from utils.range_table import assess_all
+
+DEFAULT_CHUNK_SIZE = 1000   # Reports per vectorized scoring pass
+
+
+def _normalize_item(item, position: int) -> tuple:
+    """
+    Accept the input shapes analyze_batch supports.
+
+    Returns:
+        tuple: (report_id, patient_id, extraction_package, patient_context)
+    """
+    patient_id = None
+    if isinstance(item, tuple):
+        extraction_package, context = item
+        report_id = position
+    elif "data" in item:
+        extraction_package, context, report_id = item, None, position
+    else:
+        extraction_package = item.get("extraction", {})
+        context = item.get("context")
+        report_id = item.get("id", position)
+        patient_id = item.get("patient_id")
+
+    # A sidebar-style profile ({"age", "sex"}) is turned into a range context
+    if not context or not ({"gender", "age_group"} & set(context)):
+        context = build_patient_context(context)
+    return report_id, patient_id, extraction_package, context
+
+
+def _analyze_chunk(chunk: list, offset: int):
+    reports = [_normalize_item(item, offset + i) for i, item in enumerate(chunk)]
+
+    # Flatten every value of every report into columns
+    names, values, units, ranges = [], [], [], []
+    genders, age_groups, ages, bounds = [], [], [], []
+    for _, _, package, context in reports:
+        data = package.get("data", {})
+        package_units = package.get("units", {})
+        package_ranges = package.get("reference_ranges", {})
+        start = len(names)
+        for name, value in data.items():
+            names.append(name)
+            values.append(value)
+            units.append(package_units.get(name, ""))
+            ranges.append(package_ranges.get(name))
+        count = len(names) - start
+        genders.extend([context.get("gender", "default")] * count)
+        age_groups.extend([context.get("age_group", "adult")] * count)
+        ages.extend([context.get("age")] * count)
+        bounds.append((start, len(names)))
+
+    scored = assess_all(names, values, units, ranges, genders, age_groups, ages)
+
+    for (report_id, patient_id, package, context), (start, end) in zip(reports, bounds):
+        results = build_results(names[start:end], values[start:end], units[start:end], scored, start)
+        patterns = detect_clinical_patterns(results)
+        counts = {"green": 0, "yellow": 0, "red": 0}
+        for r in results:
+            counts[r["status"]] += 1
+        yield {
+            "id": report_id,
+            "patient_id": patient_id,
+            "context": context,
+            "results": results,
+            "patterns": patterns,
+            "counts": counts,
+            "summary": None,
+            "confidence": calculate_confidence_score(package.get("metadata", {}), len(results)),
+            "health_plan": None,
+        }
+
+
+def analyze_batch(items, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Analyze an iterable of reports, streaming one analysis per report.
+
+    Only `chunk_size` reports are held in memory at a time, so the input can
+    be a generator over a 100k-report archive.
+
+    Args:
+        items: Iterable of extraction packages, (extraction_package, context)
+               tuples, or {"id", "patient_id", "extraction", "context"} dicts
+               (all but "extraction" optional). A context is
+               either a patient context ({"gender", "age", "age_group"}) or a
+               sidebar-style profile ({"age", "sex"}).
+        chunk_size: Reports scored per vectorized pass
+
+    Yields:
+        dict: Analysis package (as process_lab_results, plus "id",
+              "patient_id", "context" and "counts"); explanations, summary
+              and health plan are None
+    """
+    iterator = iter(items)
+    offset = 0
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield from _analyze_chunk(chunk, offset)
+        offset += len(chunk)
+
+
+def add_llm_text(analyses, language: str = "English", explanations: bool = True,
+                 summary: bool = True, health_plan: bool = False, profile: dict = None):
+    """
+    Optional later stage: fill in LLM-generated text for batch analyses.
+
+    Args:
+        analyses: Iterable of packages from analyze_batch
+        language: Summary language
+        explanations: Generate per-result explanations
+        summary: Generate the patient summary
+        health_plan: Generate the health coach plan
+        profile: Profile for the health plan (defaults to each report's context)
+
+    Yields:
+        dict: The same packages with text fields filled in
+    """
+    for analysis in analyses:
+        results, patterns = analysis["results"], analysis["patterns"]
+        if explanations:
+            for r in results:
+                if r["explanation"] is None:
+                    r["explanation"] = explain_result(r["name"], r)
+        if summary:
+            analysis["summary"] = generate_summary_ai(results, patterns, language)
+        if health_plan:
+            analysis["health_plan"] = generate_health_coach_plan(
+                results, patterns, profile or analysis.get("context"))
+        yield analysis
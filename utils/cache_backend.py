@@ -0,0 +1,311 @@
+# utils/cache_backend.py
+
+"""
+Pluggable storage behind the app's caches.
+
+The upload, extraction, analysis, explanation and LLM response caches
+(utils/analysis_cache.py) keep their entries in one backend per process,
+chosen by DIAGNOVA_CACHE_URL:
+
+    memory://                          per-process LRU (default)
+    sqlite:////shared/diagnova-cache.db  one SQLite file on a volume every replica mounts
+    redis://[:password@]host:6379/0    any server speaking the Redis protocol
+
+With a shared backend, each replica behind the load balancer reads what the
+others wrote, so the hit rate doesn't drop as replicas are added. The Redis
+client is a minimal RESP implementation (no third-party dependency); entries
+expire after DIAGNOVA_CACHE_TTL_S (default 7 days) and the server's
+maxmemory policy does the rest. Entries are pickled, so only point a shared
+backend at storage the replicas trust.
+
+A backend is any object with get(namespace, key), set(namespace, key,
+value, max_entries) and clear(namespace=None); configure_cache() injects
+one, e.g. for tests.
+"""
+
+import copy
+import hashlib
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+from utils.log import get_logger
+
+CACHE_URL_ENV = "DIAGNOVA_CACHE_URL"
+CACHE_TTL_ENV = "DIAGNOVA_CACHE_TTL_S"
+DEFAULT_TTL_S = 7 * 24 * 3600
+REDIS_PREFIX = "diagnova"
+REDIS_TIMEOUT_S = 2.0
+REDIS_RETRY_S = 5.0    # After a failed connection, skip the server for this long
+
+log = get_logger(__name__)
+
+_backend = None
+_lock = threading.Lock()
+
+
+class MemoryBackend:
+    """Per-process LRU per namespace, capped at max_entries."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str):
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            if entries is None or key not in entries:
+                return None
+            entries.move_to_end(key)
+            value = entries[key]
+        # Callers mutate packages (e.g. summary translation); never hand out the shared copy
+        return copy.deepcopy(value)
+
+    def set(self, namespace: str, key: str, value, max_entries: int):
+        value = copy.deepcopy(value)
+        with self._lock:
+            entries = self._namespaces.setdefault(namespace, OrderedDict())
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+
+    def clear(self, namespace: str = None):
+        with self._lock:
+            if namespace is None:
+                self._namespaces.clear()
+            else:
+                self._namespaces.pop(namespace, None)
+
+
+class SQLiteBackend:
+    """
+    One SQLite file shared by every replica that mounts it; least recently
+    used entries beyond max_entries are trimmed per namespace on write.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        namespace TEXT NOT NULL,
+        key       TEXT NOT NULL,
+        value     BLOB NOT NULL,
+        accessed  REAL NOT NULL,
+        PRIMARY KEY (namespace, key)
+    );
+    CREATE INDEX IF NOT EXISTS idx_cache_recency ON cache_entries (namespace, accessed);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        """This thread's connection, created with the schema on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Rollback journal, not WAL: WAL needs shared memory, which network volumes lack
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str):
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM cache_entries WHERE namespace = ? AND key = ?",
+                           (namespace, key)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE cache_entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                         (time.time(), namespace, key))
+        return pickle.loads(row[0])
+
+    def set(self, namespace: str, key: str, value, max_entries: int):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?)",
+                         (namespace, key, data, time.time()))
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache_entries WHERE namespace = ? ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (namespace, namespace, max_entries))
+
+    def clear(self, namespace: str = None):
+        conn = self._conn()
+        with conn:
+            if namespace is None:
+                conn.execute("DELETE FROM cache_entries")
+            else:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+
+
+class RedisBackend:
+    """
+    Redis-protocol (RESP2) client: one connection per thread, reconnecting
+    once on a dropped connection. While the server is unreachable, commands
+    fail fast for REDIS_RETRY_S instead of waiting on a connect each time.
+    Entries expire after ttl_s; max_entries is left to the server's
+    maxmemory policy.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl_s: int = None):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip("/") or 0)
+        self.ttl_s = ttl_s
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=REDIS_TIMEOUT_S)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.reader = sock, sock.makefile("rb")
+        if self.password:
+            self._send("AUTH", self.password)
+        if self.db:
+            self._send("SELECT", self.db)
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = self._local.reader = None
+
+    def _send(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._local.sock.sendall(b"".join(parts))
+        return self._read()
+
+    def _read(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            raise RuntimeError(f"Redis error: {body.decode('utf-8', 'replace')}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    def command(self, *args):
+        """Run one command; reconnects once if the connection was dropped."""
+        if time.time() < self._down_until:
+            raise ConnectionError(f"Redis at {self.host}:{self.port} unreachable; retrying shortly")
+        for attempt in (1, 2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return self._send(*args)
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt == 2:
+                    self._down_until = time.time() + REDIS_RETRY_S
+                    raise
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{REDIS_PREFIX}:{namespace}:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+    def get(self, namespace: str, key: str):
+        data = self.command("GET", self._key(namespace, key))
+        return None if data is None else pickle.loads(data)
+
+    def set(self, namespace: str, key: str, value, max_entries: int):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.ttl_s:
+            self.command("SET", self._key(namespace, key), data, "EX", self.ttl_s)
+        else:
+            self.command("SET", self._key(namespace, key), data)
+
+    def clear(self, namespace: str = None):
+        pattern = f"{REDIS_PREFIX}:{namespace or '*'}:*"
+        cursor = "0"
+        while True:
+            cursor, keys = self.command("SCAN", cursor, "MATCH", pattern, "COUNT", 500)
+            cursor = cursor.decode("utf-8") if isinstance(cursor, bytes) else str(cursor)
+            if keys:
+                self.command("DEL", *keys)
+            if cursor == "0":
+                break
+
+
+def _ttl_s() -> int:
+    try:
+        return max(0, int(os.environ.get(CACHE_TTL_ENV, DEFAULT_TTL_S)))
+    except ValueError:
+        return DEFAULT_TTL_S
+
+
+def make_backend(url: str = None):
+    """
+    Backend for a cache URL (default: DIAGNOVA_CACHE_URL, else memory://).
+
+    Raises:
+        ValueError: For an unsupported scheme
+    """
+    url = url if url is not None else os.environ.get(CACHE_URL_ENV, "")
+    if not url or url.startswith("memory:"):
+        return MemoryBackend()
+    if url.startswith("sqlite:///"):
+        # SQLAlchemy style: sqlite:///relative.db, sqlite:////absolute.db
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith("redis://"):
+        return RedisBackend(url, ttl_s=_ttl_s())
+    raise ValueError(f"Unsupported cache URL: {url!r} (use memory://, sqlite:///path or redis://host:port/db)")
+
+
+def configure_cache(backend=None, url: str = None):
+    """
+    Replace the process's cache backend.
+
+    Args:
+        backend: A backend object (get/set/clear), e.g. a test double
+        url: Build the backend from a cache URL instead
+    """
+    global _backend
+    with _lock:
+        _backend = backend if backend is not None else make_backend(url)
+
+
+def get_cache_backend():
+    """The process's cache backend, built from DIAGNOVA_CACHE_URL on first use."""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = make_backend()
+                log.info("Cache backend: %s", _backend.name)
+    return _backend
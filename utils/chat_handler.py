@@ -1,53 +1,157 @@
 # utils/chat_handler.py
 
-import streamlit as st
-from groq import Groq
-import json
+from utils.llm_client import llm_available, chat_completion
+from utils.knowledge_base import CLINICAL_PASSAGES
+from utils.reference_ranges import REFERENCE_RANGES
+from utils.retrieval import build_tfidf, tfidf_search
+from collections import OrderedDict
+import threading
+
+MAX_PROMPT_ITEMS = 5      # Results/patterns carried into the prompt per question
+MAX_PROMPT_NOTES = 3      # Reference notes carried into the prompt per question
+MAX_CHAT_INDEXES = 64     # Analyses whose TF-IDF matrix is kept in memory
+
+_chat_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _result_line(r: dict) -> str:
+    return f"{r['name']}: {r['value']} {r['unit']} ({r['status']}, reference {r.get('reference', 'n/a')})"
+
+
+def _analysis_documents(context: dict) -> list:
+    """
+    Retrievable items for one analysis: every result, every pattern and the
+    corpus passages, as (kind, prompt line, indexed text) tuples.
+    """
+    documents = []
+    for r in context.get("results", []):
+        line = _result_line(r)
+        aliases = " ".join(REFERENCE_RANGES.get(r.get("analyte"), {}).get("aliases", []))
+        documents.append(("result", line, f"{line} {aliases} {r.get('explanation') or ''}"))
+    for p in context.get("patterns", []):
+        line = f"{p['title']}: {p['evidence']}. {p['insight']}"
+        documents.append(("pattern", line, line))
+    for p in CLINICAL_PASSAGES:
+        analyte = (p.get("analyte") or "").replace("_", " ")
+        documents.append(("note", p["text"], f"{p['text']} {analyte} {p['topic'].replace('_', ' ')}"))
+    return documents
+
+
+def analysis_fingerprint(context: dict) -> int:
+    """
+    In-process key for the results and patterns a chat is grounded in.
+    Built from tuples of the fields that are indexed (string hashes are
+    cached by Python), so it stays cheap on reports with hundreds of rows.
+    """
+    return hash((
+        tuple((r["name"], r["value"], r["unit"], r["status"], r.get("reference"), r.get("explanation"))
+              for r in context.get("results", [])),
+        tuple((p["title"], p["evidence"]) for p in context.get("patterns", [])),
+    ))
+
+
+def get_chat_index(context: dict) -> dict:
+    """
+    TF-IDF matrix over an analysis and the corpus, built once per analysis
+    (memoized by fingerprint) and reused for every question about it.
+    """
+    key = analysis_fingerprint(context)
+    with _lock:
+        if key in _chat_indexes:
+            _chat_indexes.move_to_end(key)
+            return _chat_indexes[key]
+
+    documents = _analysis_documents(context)
+    index = {"documents": documents, "matrix": build_tfidf([text for _, _, text in documents])}
+    with _lock:
+        _chat_indexes[key] = index
+        while len(_chat_indexes) > MAX_CHAT_INDEXES:
+            _chat_indexes.popitem(last=False)
+    return index
+
+
+def select_grounding(messages: list, context: dict, k: int = MAX_PROMPT_ITEMS,
+                     notes: int = MAX_PROMPT_NOTES) -> dict:
+    """
+    Items relevant to the latest question, grouped by kind.
+
+    The last two user turns form the query, so follow-ups ("what causes
+    that?") still find the result being discussed. Results/patterns and
+    reference notes are ranked together but capped separately, so long
+    corpus passages can't crowd out the user's own values. When nothing in
+    the analysis matches, the abnormal results are used instead.
+
+    Returns:
+        dict: {"result": [lines], "pattern": [lines], "note": [lines]}
+    """
+    user_turns = [m["content"] for m in messages if m.get("role") == "user"]
+    query = " ".join(user_turns[-2:])
+    index = get_chat_index(context)
+
+    selected = {"result": [], "pattern": [], "note": []}
+    for doc, _ in tfidf_search(index["matrix"], query, k=len(index["documents"])):
+        kind, line, _ = index["documents"][doc]
+        if kind == "note":
+            if len(selected["note"]) < notes:
+                selected["note"].append(line)
+        elif len(selected["result"]) + len(selected["pattern"]) < k:
+            selected[kind].append(line)
+        if len(selected["note"]) == notes and len(selected["result"]) + len(selected["pattern"]) == k:
+            break
+
+    if not selected["result"] and not selected["pattern"]:
+        by_severity = sorted((r for r in context.get("results", []) if r["status"] != "green"),
+                             key=lambda r: r["status"] != "red")
+        selected["result"] = [_result_line(r) for r in by_severity[:k]]
+    return selected
+
 
 def get_chat_response(messages: list, context: dict):
     """
     Handle AI Chat Assistant Q&A.
-    Grounds the conversation in the current analysis context.
+    Grounds the conversation in the current analysis context, carrying only
+    the results, patterns and reference notes relevant to the question.
     """
-    results_summary = []
-    for r in context.get("results", []):
-        results_summary.append(f"{r['name']}: {r['value']} {r['unit']} ({r['status']})")
-    
-    patterns_summary = [p["title"] for p in context.get("patterns", [])]
-    
+    results = context.get("results", [])
+    abnormal_count = len([r for r in results if r["status"] == "red"])
+    borderline_count = len([r for r in results if r["status"] == "yellow"])
+    grounding = select_grounding(messages, context)
+
+    def bullet_list(lines):
+        return "\n    ".join(f"- {line}" for line in lines) or "None relevant to this question."
+
     system_prompt = f"""
     You are Diagnova AI, a friendly and professional medical report assistant.
     The user is asking questions about their specific lab results.
-    
-    CURRENT RESULTS:
-    {", ".join(results_summary)}
-    
-    DETECTED PATTERNS:
-    {", ".join(patterns_summary)}
-    
+
+    REPORT OVERVIEW:
+    {len(results)} parameters: {abnormal_count} abnormal, {borderline_count} borderline.
+
+    RELEVANT RESULTS:
+    {bullet_list(grounding["result"])}
+
+    RELEVANT PATTERNS:
+    {bullet_list(grounding["pattern"])}
+
+    REFERENCE NOTES:
+    {bullet_list(grounding["note"])}
+
     INSTRUCTIONS:
-    1. Base your answers ONLY on the provided results and general medical knowledge.
+    1. Base your answers ONLY on the provided results, reference notes and general medical knowledge.
     2. Be empathetic and clear.
     3. NEVER give a definitive diagnosis or prescribe medication.
     4. If asked about something not in the report, clearly state that.
     5. Always remind the user: "This information is for educational purposes. Please consult your doctor for a formal diagnosis."
     6. Keep answers concise (under 3 sentences unless complex).
     """
-    
+
     full_messages = [{"role": "system", "content": system_prompt}] + messages
-    
+
     try:
-        api_key = st.secrets.get("GROQ_API_KEY", "")
-        if not api_key:
+        if not llm_available():
             return "I apologize, but I cannot answer questions right now (API Key missing). Please consult your physician."
-            
-        client = Groq(api_key=api_key)
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=full_messages,
-            temperature=0.6,
-            max_tokens=500
-        )
-        return response.choices[0].message.content.strip()
+
+        return chat_completion(full_messages, temperature=0.6, max_tokens=500).strip()
     except Exception as e:
         return f"I'm sorry, I'm having trouble processing your question. Error: {str(e)}"
@@ -0,0 +1,212 @@
+# utils/export.py
+
+"""
+Columnar export of batch analysis results (Parquet / Arrow IPC).
+
+One row per result: report and patient id, canonical analyte, reported value
+and unit, canonical value and unit, parsed range, status, range source and a
+boolean flag per clinical pattern rule. Analyses (e.g. the analyze_batch
+generator) are consumed as a stream and written one row group at a time, so
+a million-row export never holds more than `row_group_size` rows in memory.
+Low-cardinality text columns are dictionary-encoded against one dictionary
+per column that grows across row groups (Arrow IPC files allow only one
+dictionary per field, extended by deltas), and read-back only touches the
+requested columns (and, for Parquet, the row groups the filters can match).
+
+pyarrow is optional: without it, the write/read functions raise ImportError.
+"""
+
+from utils.pattern_rules import CLINICAL_PATTERN_RULES
+from utils.reference_ranges import get_reference_unit
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+DEFAULT_ROW_GROUP_SIZE = 100_000
+DEFAULT_COMPRESSION = "zstd"
+
+PATTERN_COLUMNS = [f"pattern_{rule['id']}" for rule in CLINICAL_PATTERN_RULES]
+
+# (column, type) - "dict" columns are dictionary-encoded strings
+_COLUMNS = [
+    ("report_id", "string"),
+    ("patient_id", "string"),
+    ("analyte", "dict"),
+    ("name", "dict"),
+    ("value", "float"),
+    ("unit", "dict"),
+    ("canonical_value", "float"),
+    ("canonical_unit", "dict"),
+    ("range_min", "float"),
+    ("range_max", "float"),
+    ("status", "dict"),
+    ("range_source", "dict"),
+] + [(column, "bool") for column in PATTERN_COLUMNS]
+
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow is required for columnar export (pip install pyarrow)")
+
+
+def results_schema():
+    """Arrow schema of exported result rows."""
+    _require_pyarrow()
+    types = {
+        "string": pa.string(),
+        "dict": pa.dictionary(pa.int32(), pa.string()),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+    }
+    return pa.schema([(column, types[kind]) for column, kind in _COLUMNS])
+
+
+def _is_arrow_path(path: str) -> bool:
+    return str(path).lower().endswith((".arrow", ".feather", ".ipc"))
+
+
+def _append_rows(columns: dict, analysis: dict, default_patient_id: str = None):
+    """Append one analysis's results to the column buffers."""
+    report_id = str(analysis.get("id"))
+    patient_id = analysis.get("patient_id")
+    patient_id = default_patient_id if patient_id is None else str(patient_id)
+    found = {f"pattern_{pattern['id']}" for pattern in analysis.get("patterns", [])}
+    flags = [f"pattern_{rule['id']}" in found for rule in CLINICAL_PATTERN_RULES]
+
+    for r in analysis.get("results", []):
+        columns["report_id"].append(report_id)
+        columns["patient_id"].append(patient_id)
+        columns["analyte"].append(r.get("analyte"))
+        columns["name"].append(r["name"])
+        columns["value"].append(r["value"])
+        columns["unit"].append(r.get("unit"))
+        columns["canonical_value"].append(r.get("canonical_value"))
+        columns["canonical_unit"].append(get_reference_unit(r.get("analyte")) or r.get("unit"))
+        columns["range_min"].append(r.get("range_min"))
+        columns["range_max"].append(r.get("range_max"))
+        columns["status"].append(r["status"])
+        columns["range_source"].append(r.get("range_source"))
+        for column, flag in zip(PATTERN_COLUMNS, flags):
+            columns[column].append(flag)
+
+
+def _empty_columns() -> dict:
+    return {column: [] for column, _ in _COLUMNS}
+
+
+def _record_batch(columns: dict, schema, dictionaries: dict):
+    """
+    Build one record batch. Dictionary columns index into `dictionaries`
+    (value -> index per column), which only ever grows, so every batch's
+    dictionary extends the previous one.
+    """
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if pa.types.is_dictionary(field.type):
+            dictionary = dictionaries.setdefault(field.name, {})
+            indices = [None if v is None else dictionary.setdefault(v, len(dictionary)) for v in values]
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(indices, type=field.type.index_type),
+                pa.array(list(dictionary), type=field.type.value_type)))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_results(analyses, path: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                  compression: str = DEFAULT_COMPRESSION, patient_id: str = None) -> int:
+    """
+    Stream batch analyses into a Parquet file (or an Arrow IPC file when the
+    path ends in .arrow / .feather / .ipc).
+
+    Args:
+        analyses: Iterable of analysis packages (analyze_batch output, or
+                  process_lab_results packages with an "id")
+        path: Output file
+        row_group_size: Rows buffered per row group / record batch
+        compression: Parquet or IPC codec ("zstd", "lz4", "snappy" - Parquet only - or None)
+        patient_id: Patient id for analyses without a "patient_id" (default:
+                    left null)
+
+    Returns:
+        int: Number of rows written
+    """
+    _require_pyarrow()
+    schema = results_schema()
+    if _is_arrow_path(path):
+        options = ipc.IpcWriteOptions(compression=compression if compression in ("zstd", "lz4") else None,
+                                      emit_dictionary_deltas=True)
+        writer = ipc.new_file(path, schema, options=options)
+    else:
+        writer = pq.ParquetWriter(path, schema, compression=compression or "none")
+
+    columns, dictionaries, buffered, total = _empty_columns(), {}, 0, 0
+    try:
+        for analysis in analyses:
+            _append_rows(columns, analysis, patient_id)
+            buffered = len(columns["report_id"])
+            if buffered >= row_group_size:
+                writer.write_batch(_record_batch(columns, schema, dictionaries))
+                total += buffered
+                columns, buffered = _empty_columns(), 0
+        if buffered or not total:
+            writer.write_batch(_record_batch(columns, schema, dictionaries))
+            total += buffered
+    finally:
+        writer.close()
+    return total
+
+
+def read_results(path: str, columns: list = None, filters=None):
+    """
+    Columnar read-back of an export.
+
+    Args:
+        path: Parquet or Arrow IPC file from write_results
+        columns: Columns to load (default all)
+        filters: Parquet row filters, e.g. [("status", "=", "red")] -
+                 row groups whose statistics rule them out are skipped
+
+    Returns:
+        pyarrow.Table
+    """
+    _require_pyarrow()
+    if _is_arrow_path(path):
+        # Memory-mapped: only the selected columns' buffers are paged in
+        table = ipc.open_file(pa.memory_map(str(path))).read_all()
+        if filters:
+            import pyarrow.compute as pc
+            mask = None
+            for column, op, value in filters:
+                if op not in ("=", "=="):
+                    raise ValueError(f"Arrow IPC read-back only supports equality filters, got {op}")
+                test = pc.equal(table[column], value)
+                mask = test if mask is None else pc.and_(mask, test)
+            table = table.filter(mask)
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns, filters=filters)
+
+
+def iter_results(path: str, columns: list = None, batch_size: int = DEFAULT_ROW_GROUP_SIZE):
+    """
+    Stream an export back as record batches of at most `batch_size` rows.
+
+    Yields:
+        pyarrow.RecordBatch
+    """
+    _require_pyarrow()
+    if _is_arrow_path(path):
+        reader = ipc.open_file(pa.memory_map(str(path)))
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            batch = batch.select(columns) if columns else batch
+            for offset in range(0, batch.num_rows, batch_size):
+                yield batch.slice(offset, batch_size)
+        return
+    yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
@@ -8,8 +8,19 @@ Extracts lab test values from pasted text using LLM and cleans them for analysis
 import json
 import re
 from typing import Dict
-import streamlit as st
-from groq import Groq
+from utils.llm_client import llm_available, chat_completion
+from utils.reference_ranges import parse_reference_range
+from utils.tracing import traced
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Test name, value and optional unit; the unit may be a count per volume
+# written with an exponent ("10^3/uL", "x10^9/L", "10*6/μL")
+UNIT_ROW_RE = re.compile(
+    r'([A-Za-z\s]+?)[\s:=-]+([0-9,.<>]+)\s*'
+    r'((?:[x×]\s*)?10\s*[\^*]\s*\d+\s*/\s*[A-Za-zμµ]+|[A-Za-z/μµ°%]+)?'
+)
 
 
 def call_llm(prompt: str) -> str:
@@ -26,37 +37,28 @@ def call_llm(prompt: str) -> str:
         str: LLM response (should be valid JSON)
     """
     try:
-        # Get API key from Streamlit secrets
-        api_key = st.secrets.get("GROQ_API_KEY", "")
-        
-        if not api_key:
+        if not llm_available():
             # No API key - return empty JSON
-            print("⚠️ No GROQ_API_KEY found in secrets")
+            log.info("No GROQ_API_KEY configured")
             return "{}"
         
-        print(f"✅ API key found, calling Groq...")
-        
-        # Initialize Groq client
-        client = Groq(api_key=api_key)
+        log.debug("Calling LLM for extraction (%d prompt chars)", len(prompt))
         
-        # Call Groq API
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
+        result = chat_completion(
+            [{"role": "user", "content": prompt}],
             temperature=0.1,  # Low temperature for consistent JSON output
-            max_tokens=2000
+            max_tokens=4000  # Room for unit + range on every row
         )
-        
-        result = response.choices[0].message.content
-        print(f"✅ LLM response received ({len(result)} chars)")
+        log.debug("LLM response received (%d chars)", len(result))
         return result
         
     except Exception as e:
         # API call failed - return empty JSON safely
-        print(f"❌ LLM call failed: {str(e)}")
+        log.warning("LLM call failed: %s", e)
         return "{}"
 
 
+@traced("extract_json_from_llm")
 def extract_json_from_llm(text: str) -> dict:
     """
     Extract lab values from raw report text using LLM.
@@ -65,20 +67,22 @@ def extract_json_from_llm(text: str) -> dict:
         text: Raw lab report text from user input
         
     Returns:
-        dict: Extracted lab values (may need cleaning), empty dict on failure
+        dict: Extracted lab values {test: {"value", "unit", "reference_range"}}
+              (may need cleaning), empty dict on failure
     """
     # Build prompt for LLM
-    prompt = f"""Extract all lab test names and their numeric values from the following lab report.
+    prompt = f"""Extract all lab test names, their numeric values, units and printed reference ranges from the following lab report.
 
 Return ONLY valid JSON in this exact format:
 {{
-  "Test Name": numeric_value,
-  "Another Test": numeric_value
+  "Test Name": {{"value": numeric_value, "unit": "unit", "reference_range": "13.0 - 17.0"}},
+  "Another Test": {{"value": numeric_value, "unit": "unit", "reference_range": "< 200"}}
 }}
 
 Rules:
 - Use standard medical test names (e.g., "Hemoglobin", "WBC Count", "Glucose")
-- Extract ONLY the numeric value, ignore units
+- "value" is ONLY the numeric result, without units
+- "reference_range" is the normal/reference interval printed next to the result, copied as written; use "" if none is printed
 - Do NOT include any explanations, markdown, or extra text
 - Return ONLY the JSON object
 
@@ -163,12 +167,14 @@ def clean_lab_values(data: dict) -> dict:
     return cleaned
 
 
+@traced("regex_fallback_extraction")
 def regex_fallback_extraction(text: str) -> dict:
     """
     Simple regex-based fallback extraction when LLM fails.
     
     Extracts patterns like:
-    - Hemoglobin: 9.8
+    - Hemoglobin: 9.8 g/dL   13.0 - 17.0
+    - WBC Count 7.8 10^3/uL 4.0-11.0
     - WBC 12000
     - MCV - 70
     
@@ -176,7 +182,7 @@ def regex_fallback_extraction(text: str) -> dict:
         text: Raw lab report text
         
     Returns:
-        dict: Extracted values {test_name: value_string}
+        dict: Extracted values {test_name: {"value": str, "unit": str, "reference_range": str}}
     """
     results = {}
     
@@ -185,17 +191,23 @@ def regex_fallback_extraction(text: str) -> dict:
         lines = text.strip().split('\n')
         
         for line in lines:
-            # Pattern: Word(s) followed by separator (:, -, or space) then number
+            # Pattern: Word(s) followed by separator (:, -, or space) then number and optional unit
             # Matches: "Hemoglobin: 9.8" or "WBC 12000" or "MCV - 70"
-            match = re.match(r'([A-Za-z\s]+?)[\s:=-]+([0-9,.<>]+(?:\s*[A-Za-z/μ°%]+)?)', line.strip())
+            line = line.strip()
+            match = UNIT_ROW_RE.match(line)
             
             if match:
                 test_name = match.group(1).strip()
-                value = match.group(2).strip()
                 
                 # Only keep if test name looks reasonable (2-30 chars)
                 if 2 <= len(test_name) <= 30:
-                    results[test_name] = value
+                    # Whatever follows the value on the row may hold the printed range
+                    reference = parse_reference_range(line[match.end():])
+                    results[test_name] = {
+                        "value": match.group(2).strip(),
+                        "unit": (match.group(3) or "").strip(),
+                        "reference_range": reference["text"] if reference else "",
+                    }
     
     except:
         pass
@@ -203,6 +215,30 @@ def regex_fallback_extraction(text: str) -> dict:
     return results
 
 
+def extract_row_details(data: dict) -> tuple:
+    """
+    Collect units and printed reference ranges from raw extraction rows.
+    
+    Args:
+        data: Dictionary from LLM or regex (rows may be plain values or dicts)
+        
+    Returns:
+        tuple: ({test_name: unit}, {test_name: {"min", "max", "text"}})
+    """
+    units, ranges = {}, {}
+    for key, val in data.items():
+        if not isinstance(val, dict):
+            continue
+        unit = val.get("unit")
+        if isinstance(unit, str) and unit.strip():
+            units[key] = unit.strip()
+        reference = parse_reference_range(val.get("reference_range"))
+        if reference:
+            ranges[key] = reference
+    return units, ranges
+
+
+@traced("process_lab_report")
 def process_lab_report(text: str) -> dict:
     """
     Main function to process raw lab report text into clean lab values.
@@ -210,6 +246,8 @@ def process_lab_report(text: str) -> dict:
     Returns:
         dict: {
             "data": Dict[str, float],
+            "units": Dict[str, str],
+            "reference_ranges": Dict[str, {"min": float, "max": float, "text": str}],
             "metadata": {
                 "extraction_method": "llm" | "regex" | "failed",
                 "raw_count": int
@@ -218,6 +256,8 @@ def process_lab_report(text: str) -> dict:
     """
     result_package = {
         "data": {},
+        "units": {},
+        "reference_ranges": {},
         "metadata": {"extraction_method": "failed", "raw_count": 0}
     }
 
@@ -237,15 +277,22 @@ def process_lab_report(text: str) -> dict:
             result_package["metadata"]["raw_count"] = len(cleaned_data)
         else:
             # Step 2: If LLM failed, try regex fallback
-            fallback_data = regex_fallback_extraction(text)
-            cleaned_data = clean_lab_values(fallback_data)
+            extracted_data = regex_fallback_extraction(text)
+            cleaned_data = clean_lab_values(extracted_data)
             if cleaned_data:
                 result_package["data"] = cleaned_data
                 result_package["metadata"]["extraction_method"] = "regex"
                 result_package["metadata"]["raw_count"] = len(cleaned_data)
         
+        # Step 3: Units and report-printed reference ranges for the kept rows
+        units, ranges = extract_row_details(extracted_data)
+        result_package["units"] = {k: v for k, v in units.items() if k in cleaned_data}
+        result_package["reference_ranges"] = {k: v for k, v in ranges.items() if k in cleaned_data}
+        
+        log.debug("Extracted %d values from %d chars via %s", len(cleaned_data), len(text),
+                  result_package["metadata"]["extraction_method"])
         return result_package
         
     except Exception as e:
-        print(f"❌ Exception in process_lab_report: {str(e)}")
+        log.error("Exception in process_lab_report: %s", e, exc_info=True)
         return result_package
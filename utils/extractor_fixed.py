@@ -8,8 +8,10 @@ Extracts lab test values from pasted text using LLM and cleans them for analysis
 import json
 import re
 from typing import Dict, Tuple
-import streamlit as st
-from groq import Groq
+from utils.llm_client import llm_available, get_client
+from utils.log import get_logger
+
+log = get_logger(__name__)
 
 
 def call_llm(prompt: str) -> str:
@@ -26,18 +28,14 @@ def call_llm(prompt: str) -> str:
         str: LLM response (should be valid JSON)
     """
     try:
-        # Get API key from Streamlit secrets
-        api_key = st.secrets.get("GROQ_API_KEY", "")
-        
-        if not api_key:
+        if not llm_available():
             # No API key - return empty JSON
-            print("⚠️ No GROQ_API_KEY found in secrets - using regex fallback")
+            log.info("No GROQ_API_KEY configured - using regex fallback")
             return "{}"
         
-        print(f"✅ API key found, calling Groq...")
+        log.debug("Calling LLM for extraction (%d prompt chars)", len(prompt))
         
-        # Initialize Groq client
-        client = Groq(api_key=api_key)
+        client = get_client()
         
         # Call Groq API
         response = client.chat.completions.create(
@@ -48,12 +46,12 @@ def call_llm(prompt: str) -> str:
         )
         
         result = response.choices[0].message.content
-        print(f"✅ LLM response received ({len(result)} chars)")
+        log.debug("LLM response received (%d chars)", len(result))
         return result
         
     except Exception as e:
         # API call failed - return empty JSON safely
-        print(f"❌ LLM call failed: {str(e)}")
+        log.warning("LLM call failed: %s", e)
         return "{}"
 
 
@@ -262,28 +260,28 @@ def process_lab_report(text: str) -> dict:
     """
     # Validate input
     if not text or not isinstance(text, str) or not text.strip():
-        print("❌ No valid text provided")
+        log.warning("No valid text provided")
         return {}
     
     try:
         text = text.strip()
-        print(f"📝 Processing {len(text)} characters of text...")
+        log.debug("Processing %d characters of text", len(text))
         
         # Step 1: Try LLM extraction first
         extracted_data = extract_json_from_llm(text)
         cleaned_data = clean_lab_values(extracted_data)
         
         if cleaned_data:
-            print(f"✅ LLM extraction successful: {len(cleaned_data)} values")
+            log.debug("LLM extraction successful: %d values", len(cleaned_data))
         else:
-            print("⚠️ LLM extraction returned empty, trying regex fallback...")
+            log.info("LLM extraction returned empty, trying regex fallback")
             # Step 2: If LLM failed, try regex fallback
             fallback_data = regex_fallback_extraction(text)
             cleaned_data = clean_lab_values(fallback_data)
             if cleaned_data:
-                print(f"✅ Regex fallback successful: {len(cleaned_data)} values")
+                log.debug("Regex fallback successful: %d values", len(cleaned_data))
             else:
-                print("❌ Both LLM and regex extraction failed")
+                log.warning("Both LLM and regex extraction failed")
         
         # Step 3: Final validation
         valid_data = {}
@@ -291,10 +289,10 @@ def process_lab_report(text: str) -> dict:
             if isinstance(data, dict) and "value" in data and isinstance(data["value"], float):
                 valid_data[test] = data
         
-        print(f"📊 Final result: {len(valid_data)} valid lab values")
+        log.debug("Final result: %d valid lab values", len(valid_data))
         return valid_data
         
     except Exception as e:
         # Never crash the app
-        print(f"❌ Exception in process_lab_report: {str(e)}")
+        log.error("Exception in process_lab_report: %s", e, exc_info=True)
         return {}
@@ -0,0 +1,258 @@
+# utils/history.py
+
+"""
+Longitudinal result history in a local SQLite database.
+
+Each saved analysis becomes a report row plus one row per result with its
+canonical value (built-in table units) and reference range, so monthly
+panels can be trended without re-extracting old PDFs. Results carry the
+patient and date alongside the analyte, and the (patient, analyte, date)
+index serves every series query directly. Trends are delta since the last
+result, slope per 30 days and time-in-range.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime
+from itertools import groupby
+
+import numpy as np
+
+from utils.reference_ranges import analyte_key, get_reference_unit, unit_factor
+
+DEFAULT_DB_PATH = os.environ.get("DIAGNOVA_HISTORY_DB", "diagnova_history.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id          INTEGER PRIMARY KEY,
+    patient_id  TEXT NOT NULL,
+    report_hash TEXT NOT NULL,
+    taken_at    TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    UNIQUE (patient_id, report_hash, taken_at)
+);
+CREATE TABLE IF NOT EXISTS results (
+    report_id       INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    patient_id      TEXT NOT NULL,
+    analyte         TEXT NOT NULL,
+    taken_at        TEXT NOT NULL,
+    name            TEXT,
+    value           REAL,
+    unit            TEXT,
+    canonical_value REAL,
+    canonical_unit  TEXT,
+    range_min       REAL,
+    range_max       REAL,
+    status          TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_series ON results (patient_id, analyte, taken_at);
+CREATE INDEX IF NOT EXISTS idx_results_report ON results (report_id);
+CREATE INDEX IF NOT EXISTS idx_reports_patient ON reports (patient_id, taken_at);
+"""
+
+
+@contextmanager
+def _connect(path: str = None):
+    """Short-lived connection with the schema in place (safe across Streamlit threads)."""
+    conn = sqlite3.connect(path or DEFAULT_DB_PATH)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _to_iso(taken_at) -> str:
+    if taken_at is None:
+        return date.today().isoformat()
+    if isinstance(taken_at, (date, datetime)):
+        return taken_at.isoformat()
+    return str(taken_at)
+
+
+def _days(taken_at: str) -> float:
+    """ISO date/datetime -> days on a continuous scale."""
+    moment = datetime.fromisoformat(taken_at)
+    return moment.toordinal() + (moment.hour * 3600 + moment.minute * 60 + moment.second) / 86400
+
+
+def _results_hash(results: list) -> str:
+    """Stand-in report hash for analyses that have none (e.g. the sample report)."""
+    payload = json.dumps(sorted((r["name"], r["value"], r["unit"]) for r in results), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _result_row(result: dict) -> tuple:
+    """(analyte, canonical value, canonical unit, range min, range max) for one result."""
+    analyte = result.get("analyte") or analyte_key(result["name"])
+    factor = unit_factor(analyte, result.get("unit")) or 1.0
+    canonical_value = result.get("canonical_value", result["value"] * factor)
+    canonical_unit = get_reference_unit(analyte) or result.get("unit", "")
+    # Numeric range in canonical units from build_results, not the rounded display string
+    return analyte, canonical_value, canonical_unit, result.get("range_min"), result.get("range_max")
+
+
+def save_analysis(patient_id: str, analysis: dict, taken_at=None,
+                  report_hash: str = None, path: str = None) -> int:
+    """
+    Store an analysis in the history.
+
+    Saving the same report for the same patient and date again replaces its
+    results (e.g. after a profile change re-scored them) instead of adding
+    a duplicate point to every series.
+
+    Args:
+        patient_id: Whose results these are
+        analysis: Package from process_lab_results
+        taken_at: Sample date (date, datetime or ISO string; default today)
+        report_hash: Content hash of the report text (derived from results if None)
+        path: Database file (default DIAGNOVA_HISTORY_DB / diagnova_history.db)
+
+    Returns:
+        int: Report id
+    """
+    results = analysis.get("results", [])
+    taken_at = _to_iso(taken_at)
+    report_hash = report_hash or _results_hash(results)
+
+    with _connect(path) as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO reports (patient_id, report_hash, taken_at, created_at) VALUES (?, ?, ?, ?)",
+            (patient_id, report_hash, taken_at, datetime.now().isoformat(timespec="seconds")),
+        )
+        report_id = conn.execute(
+            "SELECT id FROM reports WHERE patient_id = ? AND report_hash = ? AND taken_at = ?",
+            (patient_id, report_hash, taken_at),
+        ).fetchone()[0]
+        conn.execute("DELETE FROM results WHERE report_id = ?", (report_id,))
+
+        rows = []
+        for r in results:
+            analyte, canonical_value, canonical_unit, range_min, range_max = _result_row(r)
+            rows.append((report_id, patient_id, analyte, taken_at, r["name"], r["value"], r["unit"],
+                         canonical_value, canonical_unit, range_min, range_max, r["status"]))
+        conn.executemany(
+            "INSERT INTO results (report_id, patient_id, analyte, taken_at, name, value, unit, "
+            "canonical_value, canonical_unit, range_min, range_max, status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    return report_id
+
+
+def list_reports(patient_id: str, path: str = None) -> list:
+    """Saved reports for a patient, oldest first: [{"id", "taken_at", "report_hash"}]."""
+    with _connect(path) as conn:
+        rows = conn.execute(
+            "SELECT id, taken_at, report_hash FROM reports WHERE patient_id = ? ORDER BY taken_at",
+            (patient_id,),
+        ).fetchall()
+    return [{"id": i, "taken_at": t, "report_hash": h} for i, t, h in rows]
+
+
+def delete_patient(patient_id: str, path: str = None):
+    """Remove a patient's reports and results."""
+    with _connect(path) as conn:
+        conn.execute("DELETE FROM reports WHERE patient_id = ?", (patient_id,))
+
+
+def get_series(patient_id: str, analyte: str, path: str = None) -> list:
+    """
+    One analyte's history for a patient, oldest first.
+
+    Returns:
+        list: [{"taken_at", "canonical_value", "canonical_unit", "range_min",
+                "range_max", "status"}]
+    """
+    with _connect(path) as conn:
+        rows = conn.execute(
+            "SELECT taken_at, canonical_value, canonical_unit, range_min, range_max, status "
+            "FROM results WHERE patient_id = ? AND analyte = ? ORDER BY taken_at",
+            (patient_id, analyte_key(analyte)),
+        ).fetchall()
+    keys = ("taken_at", "canonical_value", "canonical_unit", "range_min", "range_max", "status")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def trend_stats(series: list) -> dict:
+    """
+    Trend of one series (as returned by get_series).
+
+    Time-in-range treats each result as holding until the next one, so a
+    value that stayed out of range for five months weighs more than one
+    that was corrected a week later.
+
+    Returns:
+        dict: {"count", "first", "last", "latest", "unit", "status",
+               "delta" / "delta_pct" (vs. the previous result, None if only one),
+               "slope_per_30d" (least squares, None if < 2 distinct dates),
+               "time_in_range" (0-1, None if no range is known)}
+    """
+    days = np.array([_days(s["taken_at"]) for s in series], dtype=float)
+    values = np.array([s["canonical_value"] for s in series], dtype=float)
+    lows = np.array([np.nan if s["range_min"] is None else s["range_min"] for s in series], dtype=float)
+    highs = np.array([np.inf if s["range_max"] is None else s["range_max"] for s in series], dtype=float)
+    has_range = ~np.isnan(lows)
+    statuses = np.array([s["status"] for s in series])
+
+    delta = delta_pct = slope = time_in_range = None
+    if len(values) >= 2:
+        delta = float(values[-1] - values[-2])
+        delta_pct = float(delta / values[-2] * 100) if values[-2] else None
+    if len(np.unique(days)) >= 2:
+        centered = days - days.mean()
+        slope = float((centered * (values - values.mean())).sum() / (centered ** 2).sum() * 30)
+
+    if has_range.any():
+        in_range = np.where(has_range, (values >= lows) & (values <= highs), statuses == "green")
+        held = np.diff(days)
+        if held.sum() > 0:
+            time_in_range = float((held * in_range[:-1]).sum() / held.sum())
+        else:
+            time_in_range = float(in_range.mean())
+
+    return {
+        "count": len(series),
+        "first": series[0]["taken_at"],
+        "last": series[-1]["taken_at"],
+        "latest": float(values[-1]),
+        "unit": series[-1]["canonical_unit"],
+        "status": series[-1]["status"],
+        "delta": delta,
+        "delta_pct": delta_pct,
+        "slope_per_30d": slope,
+        "time_in_range": time_in_range,
+    }
+
+
+def get_trends(patient_id: str, analytes: list = None, path: str = None) -> dict:
+    """
+    Trend stats for every (or the given) analyte of a patient, from a single
+    index-ordered scan.
+
+    Returns:
+        dict: {analyte: trend_stats(...)}
+    """
+    query = ("SELECT analyte, taken_at, canonical_value, canonical_unit, range_min, range_max, status "
+             "FROM results WHERE patient_id = ?")
+    params = [patient_id]
+    if analytes:
+        keys = sorted({analyte_key(a) for a in analytes})
+        query += f" AND analyte IN ({', '.join('?' * len(keys))})"
+        params.extend(keys)
+    query += " ORDER BY analyte, taken_at"
+
+    with _connect(path) as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    keys = ("taken_at", "canonical_value", "canonical_unit", "range_min", "range_max", "status")
+    return {
+        analyte: trend_stats([dict(zip(keys, row[1:])) for row in group])
+        for analyte, group in groupby(rows, key=lambda row: row[0])
+    }
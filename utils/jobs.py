@@ -0,0 +1,202 @@
+# utils/jobs.py
+
+"""
+Background jobs for long-running analysis.
+
+A job runs on a thread pool shared by every session in the process, so a
+Streamlit rerun only polls the job instead of waiting for extraction and
+the LLM calls, and the pool size (DIAGNOVA_JOB_WORKERS, default 4) caps how
+many analyses, and therefore how much concurrent LLM work, one replica
+runs at a time. Further jobs wait in the queue.
+
+Job code reports progress with job_progress(stage, fraction); the same call
+is where a cancelled job stops (cancellation is cooperative once a job has
+started). Outside a job, job_progress() does nothing, so the core can call
+it unconditionally. Finished jobs are kept until they are collected with
+forget_job() or pushed out by newer ones.
+"""
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from utils.log import get_logger
+
+WORKERS_ENV = "DIAGNOVA_JOB_WORKERS"
+DEFAULT_WORKERS = 4
+MAX_JOBS = 256          # Finished jobs kept for retrieval
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+log = get_logger(__name__)
+
+_jobs = OrderedDict()
+_lock = threading.Lock()
+_executor = None
+_current = contextvars.ContextVar("diagnova_job", default=None)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by job_progress() once the job has been cancelled."""
+
+
+def job_workers() -> int:
+    """Size of the shared pool (DIAGNOVA_JOB_WORKERS, default 4)."""
+    try:
+        return max(1, int(os.environ.get(WORKERS_ENV, DEFAULT_WORKERS)))
+    except ValueError:
+        return DEFAULT_WORKERS
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _executor = ThreadPoolExecutor(max_workers=job_workers(), thread_name_prefix="diagnova-job")
+    return _executor
+
+
+def _evict():
+    """Drop the oldest finished jobs beyond MAX_JOBS (caller holds _lock)."""
+    finished = [job_id for job_id, job in _jobs.items() if job["status"] in FINISHED]
+    for job_id in finished[:max(0, len(finished) - MAX_JOBS)]:
+        del _jobs[job_id]
+
+
+def _finish(job: dict, status: str, result=None, error: str = None):
+    with _lock:
+        job.update(status=status, result=result, error=error, finished_at=time.time())
+        _evict()
+
+
+def _run(job: dict, fn, args, kwargs):
+    with _lock:
+        if job["cancel"].is_set():
+            job.update(status=CANCELLED, finished_at=time.time())
+            return
+        job.update(status=RUNNING, started_at=time.time())
+    token = _current.set(job)
+    try:
+        result = fn(*args, **kwargs)
+    except JobCancelled:
+        _finish(job, CANCELLED)
+    except Exception as e:
+        log.warning("Job %s (%s) failed: %s", job["id"], job["name"], e, exc_info=True)
+        _finish(job, FAILED, error=f"{type(e).__name__}: {str(e)}")
+    else:
+        _finish(job, DONE, result=result)
+    finally:
+        _current.reset(token)
+
+
+def submit_job(fn, *args, **kwargs) -> str:
+    """
+    Run fn(*args, **kwargs) on the shared pool.
+
+    The caller's context variables (request id, log fields) carry over to
+    the job, so its log records keep the request's correlation id.
+
+    Returns:
+        str: Job id for get_job() / cancel_job()
+    """
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "name": getattr(fn, "__name__", "job"),
+        "status": QUEUED,
+        "stage": "Waiting for a free worker",
+        "progress": 0.0,
+        "result": None,
+        "error": None,
+        "submitted_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "cancel": threading.Event(),
+    }
+    context = contextvars.copy_context()
+    with _lock:
+        _jobs[job["id"]] = job
+        job["future"] = _get_executor().submit(context.run, _run, job, fn, args, kwargs)
+    return job["id"]
+
+
+def get_job(job_id: str):
+    """
+    Snapshot of a job, or None if unknown (never submitted or already forgotten).
+
+    Returns:
+        dict: {"id", "name", "status", "stage", "progress", "result", "error",
+               "submitted_at", "started_at", "finished_at", "queue_position"}
+               queue_position counts the queued jobs ahead of this one.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = {k: v for k, v in job.items() if k not in ("cancel", "future")}
+        snapshot["queue_position"] = 0
+        if job["status"] == QUEUED:
+            for other in _jobs.values():
+                if other is job:
+                    break
+                snapshot["queue_position"] += other["status"] == QUEUED
+    return snapshot
+
+
+def cancel_job(job_id: str) -> bool:
+    """
+    Cancel a job: a queued job never starts; a running one stops at its next
+    job_progress() call.
+
+    Returns:
+        bool: False if the job is unknown or already finished
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return False
+        job["cancel"].set()
+        if job["status"] == QUEUED and job["future"].cancel():
+            job.update(status=CANCELLED, finished_at=time.time())
+    return True
+
+
+def forget_job(job_id: str):
+    """Drop a job once its result has been collected."""
+    with _lock:
+        _jobs.pop(job_id, None)
+
+
+def job_progress(stage: str = None, fraction: float = None):
+    """
+    Report progress from inside a job (no-op outside one).
+
+    Args:
+        stage: What the job is doing now, shown to the user
+        fraction: 0-1 progress within that stage
+
+    Raises:
+        JobCancelled: If the job has been cancelled
+    """
+    job = _current.get()
+    if job is None:
+        return
+    if job["cancel"].is_set():
+        raise JobCancelled(job["id"])
+    with _lock:
+        if stage is not None:
+            job["stage"] = stage
+        job["progress"] = min(max(fraction or 0.0, 0.0), 1.0)
+
+
+def job_stats() -> dict:
+    """Jobs per status in this process, plus the pool size."""
+    with _lock:
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+        for job in _jobs.values():
+            counts[job["status"]] += 1
+    counts["workers"] = job_workers()
+    return counts
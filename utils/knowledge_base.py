@@ -21,6 +21,10 @@ MEDICAL_KNOWLEDGE = {
         "definition": "The amount of sugar (glucose) in your blood after not eating for at least 8 hours.",
         "functions": ["Energy source for body cells"]
     },
+    "random_glucose": {
+        "definition": "The amount of sugar (glucose) in your blood at the time of the test, whenever you last ate.",
+        "functions": ["Energy source for body cells"]
+    },
     "creatinine": {
         "definition": "A waste product from the normal breakdown of muscle tissue, filtered out by the kidneys.",
         "functions": ["Marker of kidney function"]
@@ -44,5 +48,223 @@ MEDICAL_KNOWLEDGE = {
     "urea": {
         "definition": "A waste product formed in the liver when protein is broken down, excreted by kidneys.",
         "functions": ["Marker of kidney/protein metabolism"]
+    },
+    "bun": {
+        "definition": "Blood Urea Nitrogen — the nitrogen portion of urea in the blood, cleared by the kidneys.",
+        "functions": ["Marker of kidney function and hydration"]
+    },
+    "total_cholesterol": {
+        "definition": "The total amount of cholesterol, a waxy fat carried in the blood by lipoproteins (LDL and HDL).",
+        "functions": ["Cell membrane building block", "Hormone and bile acid production"]
     }
 }
+
+
+# Retrieval corpus for explanations and chat (indexed by utils/retrieval.py).
+# One short passage per analyte and topic; topic is "interpretation",
+# "causes_low", "causes_high", "follow_up" or "general".
+CLINICAL_PASSAGES = [
+    # Hemoglobin
+    {"id": "hemoglobin.interpretation", "analyte": "hemoglobin", "topic": "interpretation",
+     "text": "Hemoglobin reflects how much oxygen the blood can carry. Values below the range are "
+             "described as anemia and can cause tiredness, pale skin or shortness of breath; values "
+             "above the range mean the blood is more concentrated than usual."},
+    {"id": "hemoglobin.causes_low", "analyte": "hemoglobin", "topic": "causes_low",
+     "text": "Low hemoglobin is most often linked to iron deficiency, heavy menstrual or gut blood "
+             "loss, low vitamin B12 or folate, chronic kidney disease, chronic inflammation or "
+             "pregnancy. A low MCV alongside it points towards iron deficiency."},
+    {"id": "hemoglobin.causes_high", "analyte": "hemoglobin", "topic": "causes_high",
+     "text": "High hemoglobin can follow dehydration, smoking, living at high altitude, long-standing "
+             "lung or heart disease, testosterone use or, rarely, a bone marrow condition that makes "
+             "too many red blood cells."},
+    {"id": "hemoglobin.follow_up", "analyte": "hemoglobin", "topic": "follow_up",
+     "text": "An abnormal hemoglobin is usually followed up with a repeat complete blood count, red "
+             "cell indices (MCV), ferritin and iron studies, and vitamin B12 and folate levels."},
+
+    # White blood cells
+    {"id": "wbc_count.interpretation", "analyte": "wbc_count", "topic": "interpretation",
+     "text": "The white blood cell count measures the immune cells in the blood. A high count "
+             "(leukocytosis) often reflects the body responding to infection or stress; a low count "
+             "(leukopenia) can lower resistance to infection."},
+    {"id": "wbc_count.causes_high", "analyte": "wbc_count", "topic": "causes_high",
+     "text": "A raised white cell count is commonly caused by bacterial infection, inflammation, "
+             "physical or emotional stress, smoking, steroid medicines or recent intense exercise, and "
+             "less often by a blood disorder."},
+    {"id": "wbc_count.causes_low", "analyte": "wbc_count", "topic": "causes_low",
+     "text": "A low white cell count can follow viral infections, some medicines such as "
+             "chemotherapy or certain antibiotics, autoimmune conditions, severe infection, or "
+             "vitamin B12 and folate deficiency."},
+    {"id": "wbc_count.follow_up", "analyte": "wbc_count", "topic": "follow_up",
+     "text": "An abnormal white cell count is usually followed by a differential count (neutrophils, "
+             "lymphocytes and other types), a repeat test after any infection settles, and a review "
+             "of symptoms and medicines."},
+
+    # MCV
+    {"id": "mcv.interpretation", "analyte": "mcv", "topic": "interpretation",
+     "text": "MCV is the average size of red blood cells. Small cells (microcytosis) and large cells "
+             "(macrocytosis) help narrow down the cause of anemia."},
+    {"id": "mcv.causes_low", "analyte": "mcv", "topic": "causes_low",
+     "text": "A low MCV, meaning small red cells, is most often due to iron deficiency, and can also be "
+             "seen with thalassemia trait or anemia of chronic disease."},
+    {"id": "mcv.causes_high", "analyte": "mcv", "topic": "causes_high",
+     "text": "A high MCV, meaning large red cells, is linked to vitamin B12 or folate deficiency, "
+             "regular alcohol use, liver disease, an underactive thyroid and some medicines."},
+    {"id": "mcv.follow_up", "analyte": "mcv", "topic": "follow_up",
+     "text": "An abnormal MCV is read together with hemoglobin, and is often followed by ferritin, "
+             "iron studies, vitamin B12 and folate, or hemoglobin electrophoresis."},
+
+    # Platelets
+    {"id": "platelets.interpretation", "analyte": "platelets", "topic": "interpretation",
+     "text": "Platelets help blood clot. A low count (thrombocytopenia) can cause easy bruising or "
+             "bleeding; a high count (thrombocytosis) is usually a reaction to another condition."},
+    {"id": "platelets.causes_low", "analyte": "platelets", "topic": "causes_low",
+     "text": "Low platelets can result from viral infections such as dengue, some medicines, heavy "
+             "alcohol use, an enlarged spleen, immune conditions or bone marrow problems. A clumped "
+             "sample can also give a falsely low count."},
+    {"id": "platelets.causes_high", "analyte": "platelets", "topic": "causes_high",
+     "text": "High platelets are most often reactive: iron deficiency, infection, inflammation, "
+             "recent surgery or bleeding. Persistent very high counts may point to a bone marrow "
+             "disorder."},
+    {"id": "platelets.follow_up", "analyte": "platelets", "topic": "follow_up",
+     "text": "An abnormal platelet count is usually repeated, often with a blood smear review, and "
+             "bleeding symptoms or medicines such as NSAIDs and blood thinners are discussed."},
+
+    # Fasting glucose
+    {"id": "fasting_glucose.interpretation", "analyte": "fasting_glucose", "topic": "interpretation",
+     "text": "Fasting glucose is blood sugar after at least 8 hours without food. 100-125 mg/dL is "
+             "the prediabetes range and 126 mg/dL or more on two occasions meets the definition of "
+             "diabetes."},
+    {"id": "fasting_glucose.causes_high", "analyte": "fasting_glucose", "topic": "causes_high",
+     "text": "High fasting glucose can come from insulin resistance, prediabetes or diabetes, and "
+             "temporarily from not fasting fully, illness, stress or steroid medicines."},
+    {"id": "fasting_glucose.causes_low", "analyte": "fasting_glucose", "topic": "causes_low",
+     "text": "Low fasting glucose can follow a long fast, diabetes medicines such as insulin or "
+             "sulfonylureas, heavy alcohol use, or rarely hormone problems; symptoms include "
+             "shakiness, sweating and confusion."},
+    {"id": "fasting_glucose.follow_up", "analyte": "fasting_glucose", "topic": "follow_up",
+     "text": "A raised fasting glucose is usually confirmed with a repeat fasting test or an HbA1c, "
+             "which reflects average blood sugar over about three months. Diet, activity and weight "
+             "changes lower glucose."},
+
+    # Random glucose
+    {"id": "random_glucose.interpretation", "analyte": "random_glucose", "topic": "interpretation",
+     "text": "A random (non-fasting) glucose depends on when and what you last ate; under 140 mg/dL "
+             "is typical. 200 mg/dL or more with symptoms such as thirst and frequent urination "
+             "suggests diabetes."},
+    {"id": "random_glucose.follow_up", "analyte": "random_glucose", "topic": "follow_up",
+     "text": "A raised random glucose is usually followed by a fasting glucose or an HbA1c before any "
+             "conclusion is drawn, since a recent meal alone can raise it."},
+
+    # Creatinine
+    {"id": "creatinine.interpretation", "analyte": "creatinine", "topic": "interpretation",
+     "text": "Creatinine is filtered by the kidneys, so a rising creatinine suggests the kidneys are "
+             "clearing waste less efficiently. Muscle mass affects it, so it is often converted to "
+             "an estimated GFR (eGFR)."},
+    {"id": "creatinine.causes_high", "analyte": "creatinine", "topic": "causes_high",
+     "text": "High creatinine can reflect reduced kidney function, dehydration, a high-protein meal "
+             "or creatine supplements, heavy exercise, large muscle mass or medicines such as NSAIDs."},
+    {"id": "creatinine.causes_low", "analyte": "creatinine", "topic": "causes_low",
+     "text": "Low creatinine is usually not a concern and mostly reflects low muscle mass, older "
+             "age, pregnancy or a low-protein diet."},
+    {"id": "creatinine.follow_up", "analyte": "creatinine", "topic": "follow_up",
+     "text": "A high creatinine is usually followed by eGFR, urea or BUN, a urine test for protein "
+             "(albumin-creatinine ratio), a medicine review and a repeat test after good hydration."},
+
+    # Urea
+    {"id": "urea.interpretation", "analyte": "urea", "topic": "interpretation",
+     "text": "Urea is made in the liver from protein breakdown and removed by the kidneys. It is read "
+             "alongside creatinine when looking at kidney function and hydration."},
+    {"id": "urea.causes_high", "analyte": "urea", "topic": "causes_high",
+     "text": "High urea can be due to dehydration, a high-protein diet, bleeding in the upper gut, "
+             "heart failure or reduced kidney function."},
+    {"id": "urea.causes_low", "analyte": "urea", "topic": "causes_low",
+     "text": "Low urea can follow a low-protein diet, overhydration, pregnancy or severe liver "
+             "disease."},
+    {"id": "urea.follow_up", "analyte": "urea", "topic": "follow_up",
+     "text": "An abnormal urea is usually interpreted with creatinine and eGFR, and repeated after "
+             "attention to fluid intake."},
+
+    # BUN
+    {"id": "bun.interpretation", "analyte": "bun", "topic": "interpretation",
+     "text": "Blood urea nitrogen (BUN) measures the nitrogen in urea. The BUN to creatinine ratio "
+             "helps separate dehydration from kidney causes."},
+    {"id": "bun.causes_high", "analyte": "bun", "topic": "causes_high",
+     "text": "High BUN is commonly caused by dehydration, a high-protein diet, gut bleeding, steroid "
+             "medicines or reduced kidney function."},
+    {"id": "bun.causes_low", "analyte": "bun", "topic": "causes_low",
+     "text": "Low BUN is usually harmless and can reflect low protein intake, overhydration or liver "
+             "disease."},
+    {"id": "bun.follow_up", "analyte": "bun", "topic": "follow_up",
+     "text": "An abnormal BUN is followed up with creatinine, eGFR and a hydration review."},
+
+    # Total cholesterol
+    {"id": "total_cholesterol.interpretation", "analyte": "total_cholesterol", "topic": "interpretation",
+     "text": "Total cholesterol below 200 mg/dL is desirable, 200-239 mg/dL is borderline high and "
+             "240 mg/dL or more is high. Heart risk depends on the LDL and HDL split, not the total "
+             "alone."},
+    {"id": "total_cholesterol.causes_high", "analyte": "total_cholesterol", "topic": "causes_high",
+     "text": "High cholesterol is linked to diets rich in saturated and trans fats, low physical "
+             "activity, excess weight, smoking, family history, an underactive thyroid and some "
+             "medicines."},
+    {"id": "total_cholesterol.causes_low", "analyte": "total_cholesterol", "topic": "causes_low",
+     "text": "Low cholesterol is uncommon and can be seen with an overactive thyroid, malnutrition, "
+             "liver disease or cholesterol-lowering medicines."},
+    {"id": "total_cholesterol.follow_up", "analyte": "total_cholesterol", "topic": "follow_up",
+     "text": "A high cholesterol is usually followed by a full fasting lipid profile (LDL, HDL, "
+             "triglycerides) and an overall heart risk estimate. Diet, exercise and not smoking "
+             "improve cholesterol."},
+
+    # ALT
+    {"id": "alt.interpretation", "analyte": "alt", "topic": "interpretation",
+     "text": "ALT (SGPT) is an enzyme found mainly in liver cells; it leaks into the blood when "
+             "liver cells are irritated or damaged, making it a sensitive marker of liver stress."},
+    {"id": "alt.causes_high", "analyte": "alt", "topic": "causes_high",
+     "text": "Raised ALT is commonly caused by fatty liver, alcohol, viral hepatitis, medicines or "
+             "supplements (including paracetamol in excess), and intense exercise."},
+    {"id": "alt.follow_up", "analyte": "alt", "topic": "follow_up",
+     "text": "A raised ALT is often rechecked with a full liver panel (AST, ALP, bilirubin, "
+             "albumin), hepatitis tests and sometimes a liver ultrasound; alcohol and liver-affecting "
+             "medicines are reviewed."},
+
+    # AST
+    {"id": "ast.interpretation", "analyte": "ast", "topic": "interpretation",
+     "text": "AST (SGOT) is an enzyme found in the liver, heart and muscles, so a raised AST is less "
+             "specific to the liver than ALT. The AST to ALT ratio gives extra context."},
+    {"id": "ast.causes_high", "analyte": "ast", "topic": "causes_high",
+     "text": "Raised AST can come from liver conditions such as fatty liver or hepatitis, alcohol use, "
+             "muscle injury or strenuous exercise, and some medicines."},
+    {"id": "ast.follow_up", "analyte": "ast", "topic": "follow_up",
+     "text": "A raised AST is interpreted with ALT and the rest of the liver panel, and a creatine "
+             "kinase test may be added if a muscle source is suspected."},
+
+    # TSH
+    {"id": "tsh.interpretation", "analyte": "tsh", "topic": "interpretation",
+     "text": "TSH is the pituitary signal that drives the thyroid. A high TSH usually means the "
+             "thyroid is underactive (hypothyroidism); a low TSH usually means it is overactive "
+             "(hyperthyroidism)."},
+    {"id": "tsh.causes_high", "analyte": "tsh", "topic": "causes_high",
+     "text": "High TSH is most often caused by autoimmune thyroiditis (Hashimoto's), iodine "
+             "deficiency, thyroid surgery or treatment, or recovery from an illness. Symptoms "
+             "include tiredness, weight gain and feeling cold."},
+    {"id": "tsh.causes_low", "analyte": "tsh", "topic": "causes_low",
+     "text": "Low TSH can be caused by Graves' disease, thyroid nodules, thyroiditis or taking too "
+             "much thyroid hormone. Symptoms include palpitations, weight loss and feeling hot."},
+    {"id": "tsh.follow_up", "analyte": "tsh", "topic": "follow_up",
+     "text": "An abnormal TSH is usually followed by free T4 (and sometimes free T3) and thyroid "
+             "antibodies, and repeated in 6-8 weeks if mildly abnormal."},
+
+    # General
+    {"id": "general.reference_ranges", "analyte": None, "topic": "general",
+     "text": "Reference ranges describe where results fall for about 95% of healthy people, so a "
+             "slightly out-of-range value is not necessarily a problem. Ranges differ between "
+             "laboratories, age groups and sexes."},
+    {"id": "general.borderline", "analyte": None, "topic": "general",
+     "text": "Borderline results just outside the range are often repeated before conclusions are "
+             "drawn, since hydration, recent meals, exercise and time of day can shift values."},
+    {"id": "general.fasting", "analyte": None, "topic": "general",
+     "text": "Glucose and lipid tests are usually taken after an 8-12 hour fast with water only. "
+             "Eating beforehand can raise glucose and triglyceride results."},
+    {"id": "general.trends", "analyte": None, "topic": "general",
+     "text": "A single result is a snapshot; the trend across repeated tests over time is often more "
+             "informative than one value."},
+]
@@ -0,0 +1,122 @@
+# utils/llm_client.py
+
+"""
+Shared Groq LLM access for the extraction and analysis core.
+
+The core never touches Streamlit: the API key is injected with configure()
+(app.py passes st.secrets in) and otherwise read from the GROQ_API_KEY
+environment variable, so batch workers and serverless handlers can import
+and run the core headless. The groq SDK is imported on first use and a
+single client is shared per API key. Completions are cached by request
+(model, messages, sampling settings) in the shared cache backend, so an
+identical prompt is answered once across sessions and replicas.
+"""
+
+import os
+import threading
+import time
+
+from utils.analysis_cache import llm_cache_enabled, llm_key, get_llm_response, store_llm_response
+from utils.log import get_logger
+from utils.tracing import current_span, traced
+
+MODEL = "llama-3.3-70b-versatile"
+
+log = get_logger(__name__)
+
+_config = {}
+_client = None
+_client_key = None
+_lock = threading.Lock()
+
+
+def configure(api_key: str = None, client=None):
+    """
+    Inject LLM configuration.
+
+    Args:
+        api_key: Groq API key. An explicit "" disables the LLM even when the
+                 environment variable is set; None leaves the setting alone.
+        client: Pre-built client exposing chat.completions.create (e.g. a
+                stand-in for tests and benchmarks); replaces the Groq client
+    """
+    global _client, _client_key
+    with _lock:
+        if api_key is not None:
+            _config["api_key"] = api_key
+        if client is not None:
+            _config["client"] = client
+        _client, _client_key = None, None
+
+
+def get_api_key() -> str:
+    """Configured API key, else the GROQ_API_KEY environment variable."""
+    if "api_key" in _config:
+        return _config["api_key"]
+    return os.environ.get("GROQ_API_KEY", "")
+
+
+def llm_available() -> bool:
+    """True if LLM calls can be made (injected client or an API key)."""
+    return _config.get("client") is not None or bool(get_api_key())
+
+
+def get_client():
+    """
+    The shared LLM client, created on first use.
+
+    Raises:
+        RuntimeError: If no client is injected and no API key is configured
+    """
+    global _client, _client_key
+    if _config.get("client") is not None:
+        return _config["client"]
+
+    api_key = get_api_key()
+    if not api_key:
+        raise RuntimeError("GROQ_API_KEY is not configured")
+
+    with _lock:
+        if _client is None or _client_key != api_key:
+            from groq import Groq  # Deferred: the SDK is slow to import
+            _client, _client_key = Groq(api_key=api_key), api_key
+        return _client
+
+
+@traced("llm.chat_completion")
+def chat_completion(messages: list, temperature: float = 0.3, max_tokens: int = 500) -> str:
+    """
+    Run one chat completion against the shared client, or answer it from
+    the LLM response cache.
+
+    Args:
+        messages: OpenAI-style [{"role", "content"}] messages
+        temperature: Sampling temperature
+        max_tokens: Completion length limit
+
+    Returns:
+        str: The completion text
+
+    Raises:
+        Exception: Whatever the client raises; callers fall back on failure
+    """
+    cache_key = llm_key(MODEL, messages, temperature, max_tokens) if llm_cache_enabled() else None
+    if cache_key:
+        cached = get_llm_response(cache_key)
+        if current_span() is not None:
+            current_span()["attrs"]["cache"] = "miss" if cached is None else "hit"
+        if cached is not None:
+            return cached
+
+    started = time.perf_counter()
+    response = get_client().chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    content = response.choices[0].message.content
+    log.debug("LLM completion: %d chars in %.0f ms", len(content), (time.perf_counter() - started) * 1000)
+    if cache_key:
+        store_llm_response(cache_key, content)
+    return content
@@ -0,0 +1,146 @@
+# utils/log.py
+
+"""
+Structured logging for the extraction and analysis core.
+
+Modules log through get_logger(__name__) on the standard logging module,
+so messages use lazy %-style arguments: a record below the configured level
+is dropped before its message is ever formatted. Every record carries the
+correlation id of the request it belongs to (request_context() sets it in
+a context variable, so it follows the call chain through extraction,
+analysis and the LLM client without being passed around), and output is
+either human-readable text or one JSON object per line for log pipelines.
+
+Configuration (configure_logging() arguments or environment):
+    DIAGNOVA_LOG_LEVEL   Default level for the core (default WARNING)
+    DIAGNOVA_LOG_LEVELS  Per-module overrides, e.g. "extractor=DEBUG,ocr=INFO"
+    DIAGNOVA_LOG_FORMAT  "text" (default) or "json"
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+ROOT_LOGGER = "diagnova"
+
+_request = contextvars.ContextVar("diagnova_request", default={})
+_configured = False
+_lock = threading.Lock()
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module: "utils.extractor" -> "diagnova.extractor"."""
+    short = name.rsplit(".", 1)[-1] if name.startswith(("utils.", "components.")) else name
+    return logging.getLogger(f"{ROOT_LOGGER}.{short}")
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+@contextmanager
+def request_context(request_id: str = None, **fields):
+    """
+    Tag every log record in this block (and in the calls it makes) with a
+    correlation id and extra fields, e.g. request_context(session=...).
+
+    Yields:
+        str: The request id
+    """
+    request_id = request_id or new_request_id()
+    token = _request.set(dict(_request.get(), request_id=request_id, **fields))
+    try:
+        yield request_id
+    finally:
+        _request.reset(token)
+
+
+def current_request_id():
+    """Correlation id of the current request, or None outside request_context()."""
+    return _request.get().get("request_id")
+
+
+def _add_context(record: logging.LogRecord) -> bool:
+    """Handler filter: copy the current request context onto each record."""
+    context = _request.get()
+    record.request_id = context.get("request_id", "-")
+    for key, value in context.items():
+        if key != "request_id" and not hasattr(record, key):
+            setattr(record, key, value)
+    return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request id, extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s"
+
+
+def _parse_levels(spec: str) -> dict:
+    """"extractor=DEBUG,ocr=INFO" -> {"extractor": "DEBUG", "ocr": "INFO"}."""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            module, level = item.split("=", 1)
+            levels[module.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: str = None, fmt: str = None, levels: dict = None, stream=None,
+                      force: bool = False):
+    """
+    Attach the core's handler (once per process unless force=True).
+
+    Args:
+        level: Default level (DIAGNOVA_LOG_LEVEL, else WARNING)
+        fmt: "text" or "json" (DIAGNOVA_LOG_FORMAT, else text)
+        levels: Per-module levels {"extractor": "DEBUG"} (DIAGNOVA_LOG_LEVELS)
+        stream: Output stream (default stderr)
+        force: Reconfigure even if already configured
+    """
+    global _configured
+    with _lock:
+        if _configured and not force:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        handler = logging.StreamHandler(stream or sys.stderr)
+        fmt = (fmt or os.environ.get("DIAGNOVA_LOG_FORMAT", "text")).lower()
+        handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+        handler.addFilter(_add_context)
+        root.addHandler(handler)
+        root.setLevel((level or os.environ.get("DIAGNOVA_LOG_LEVEL", "WARNING")).upper())
+        root.propagate = False
+
+        overrides = _parse_levels(os.environ.get("DIAGNOVA_LOG_LEVELS", ""))
+        overrides.update({k: v.upper() for k, v in (levels or {}).items()})
+        for module, module_level in overrides.items():
+            logging.getLogger(f"{ROOT_LOGGER}.{module}").setLevel(module_level)
+        _configured = True
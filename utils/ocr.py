@@ -0,0 +1,268 @@
+# utils/ocr.py
+
+"""
+Local OCR pipeline for image uploads and scanned PDF pages.
+Cleans up phone photos and fax scans with Pillow, then runs Tesseract
+on horizontal tiles in a shared worker pool.
+
+Tesseract starts its own OpenMP threads per call, on top of the tile pool.
+Deployments should run the app with OMP_THREAD_LIMIT=1 in its environment
+to avoid oversubscribing the cores; it is not set here, since it would also
+apply to every other OpenMP user in the process.
+"""
+
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+
+from utils.tracing import traced
+from utils.log import get_logger
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+OCR_LANGUAGE = "eng"
+TESSERACT_CONFIG = "--oem 1 --psm 6"   # LSTM engine, uniform block of text
+
+MAX_IMAGE_SIDE = 4000        # Downscale huge phone photos before processing
+MIN_TEXT_HEIGHT = 1200       # Upscale tiny images so glyphs are big enough to read
+TILE_HEIGHT = 1000           # Target tile height (px) for parallel OCR
+TILE_SEARCH_WINDOW = 150     # How far (px) to look for a blank row to cut at
+DESKEW_MAX_ANGLE = 5.0       # Degrees either side of horizontal to search
+DESKEW_STEP = 0.5
+THRESHOLD_BLOCK = 31         # Neighbourhood size for adaptive threshold
+THRESHOLD_OFFSET = 12        # How much darker than its neighbourhood a pixel must be
+
+MIN_PAGE_CHARS = 20          # Fewer extracted characters than this = scanned page
+TARGET_PAGE_PIXELS = 3300    # Long side (px) to render scanned pages at
+MIN_RENDER_DPI = 150
+MAX_RENDER_DPI = 400
+
+log = get_logger(__name__)
+
+_pool = None
+_tesseract_ok = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """Shared OCR worker pool (Tesseract runs out-of-process, so threads suffice)."""
+    global _pool
+    if _pool is None:
+        workers = int(os.environ.get("DIAGNOVA_OCR_WORKERS", 0)) or min(4, os.cpu_count() or 1)
+        _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+        if "OMP_THREAD_LIMIT" not in os.environ:
+            log.info("OMP_THREAD_LIMIT is not set; each of the %d concurrent OCR calls may start one "
+                     "Tesseract thread per core (set OMP_THREAD_LIMIT=1 for the app)", workers)
+    return _pool
+
+
+def is_ocr_available() -> bool:
+    """Check that pytesseract is installed and the tesseract binary can be found."""
+    global _tesseract_ok
+    if _tesseract_ok is None:
+        try:
+            pytesseract.get_tesseract_version()
+            _tesseract_ok = True
+        except Exception:
+            _tesseract_ok = False
+    return _tesseract_ok
+
+
+def _row_profile(gray: Image.Image) -> list:
+    """Mean brightness of every row, computed in C by squashing the image to 1px wide."""
+    return list(gray.resize((1, gray.height), Image.BOX).getdata())
+
+
+def estimate_skew_angle(gray: Image.Image) -> float:
+    """
+    Estimate page rotation with a projection profile search.
+
+    Text lines produce sharp dark/light alternation in the row profile when
+    they are horizontal, so the angle with the highest row variance wins.
+
+    Args:
+        gray: Grayscale image
+
+    Returns:
+        float: Angle in degrees to rotate by to straighten the text
+    """
+    # Work on a small, inverted copy: text becomes bright on black background
+    scale = min(1.0, 800 / max(gray.size))
+    small = gray.resize((max(1, int(gray.width * scale)), max(1, int(gray.height * scale))))
+    small = ImageOps.invert(ImageOps.autocontrast(small))
+
+    best_angle, best_score = 0.0, -1.0
+    steps = int(DESKEW_MAX_ANGLE / DESKEW_STEP)
+    for i in range(-steps, steps + 1):
+        angle = i * DESKEW_STEP
+        rotated = small.rotate(angle, resample=Image.BILINEAR, expand=False)
+        profile = _row_profile(rotated)
+        mean = sum(profile) / len(profile)
+        score = sum((p - mean) ** 2 for p in profile)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def adaptive_threshold(gray: Image.Image, block: int = THRESHOLD_BLOCK,
+                       offset: int = THRESHOLD_OFFSET) -> Image.Image:
+    """
+    Binarize with a local-mean threshold so uneven lighting and fax noise
+    don't wipe out text the way a single global cutoff would.
+
+    Args:
+        gray: Grayscale image
+        block: Size of the neighbourhood used for the local mean
+        offset: Pixels this much darker than their neighbourhood become ink
+
+    Returns:
+        Image: Black text on white background (mode "L")
+    """
+    local_mean = gray.filter(ImageFilter.BoxBlur(block // 2))
+    # How much darker each pixel is than its surroundings (clipped at 0)
+    darkness = ImageChops.subtract(local_mean, gray)
+    return darkness.point(lambda p: 0 if p > offset else 255)
+
+
+def preprocess_image(image: Image.Image) -> Image.Image:
+    """
+    Prepare a photo or scan for Tesseract: orientation, grayscale, size,
+    deskew and adaptive threshold.
+    """
+    image = ImageOps.exif_transpose(image)
+    gray = image.convert("L")
+
+    longest = max(gray.size)
+    if longest > MAX_IMAGE_SIDE:
+        scale = MAX_IMAGE_SIDE / longest
+        gray = gray.resize((int(gray.width * scale), int(gray.height * scale)), Image.LANCZOS)
+    elif gray.height < MIN_TEXT_HEIGHT:
+        scale = MIN_TEXT_HEIGHT / gray.height
+        gray = gray.resize((int(gray.width * scale), int(gray.height * scale)), Image.LANCZOS)
+
+    angle = estimate_skew_angle(gray)
+    if angle:
+        gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+    return adaptive_threshold(gray)
+
+
+def split_into_tiles(binary: Image.Image, tile_height: int = TILE_HEIGHT) -> list:
+    """
+    Cut a binarized page into horizontal bands for parallel OCR.
+
+    Cuts are placed on the whitest row near each tile boundary so that
+    no line of text is split between two tiles.
+
+    Returns:
+        list: Image tiles in top-to-bottom order
+    """
+    if binary.height <= tile_height * 1.5:
+        return [binary]
+
+    profile = _row_profile(binary)
+    cuts = [0]
+    target = tile_height
+    while target < binary.height - tile_height // 2:
+        lo = max(cuts[-1] + 1, target - TILE_SEARCH_WINDOW)
+        hi = min(binary.height - 1, target + TILE_SEARCH_WINDOW)
+        cut = max(range(lo, hi + 1), key=lambda row: profile[row])
+        cuts.append(cut)
+        target = cut + tile_height
+    cuts.append(binary.height)
+
+    return [binary.crop((0, top, binary.width, bottom))
+            for top, bottom in zip(cuts, cuts[1:]) if bottom - top > 1]
+
+
+def _ocr_tile(tile: Image.Image) -> str:
+    try:
+        return pytesseract.image_to_string(tile, lang=OCR_LANGUAGE, config=TESSERACT_CONFIG)
+    except Exception as e:
+        log.warning("OCR tile failed: %s", e)
+        return ""
+
+
+@traced("ocr_images")
+def ocr_images(images: list) -> list:
+    """
+    OCR several images, preprocessing and tiling each one, with all tiles
+    sharing the worker pool.
+
+    Args:
+        images: PIL images (photos, scans or rendered PDF pages)
+
+    Returns:
+        list: Extracted text per input image, "" where nothing was read
+    """
+    if not images or not is_ocr_available():
+        return [""] * len(images)
+
+    pool = _get_pool()
+    tiles_per_image = [split_into_tiles(preprocess_image(img)) for img in images]
+    futures = [[pool.submit(_ocr_tile, tile) for tile in tiles] for tiles in tiles_per_image]
+    return ["\n".join(f.result() for f in tile_futures).strip() for tile_futures in futures]
+
+
+def ocr_image_bytes(image_bytes: bytes) -> str:
+    """Extract text from an uploaded PNG/JPG."""
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.load()
+    except Exception as e:
+        log.warning("Could not open image: %s", e)
+        return ""
+    return ocr_images([image])[0]
+
+
+def choose_render_dpi(page_width_pt: float, page_height_pt: float) -> int:
+    """
+    Pick a rasterization DPI that gives scanned pages roughly TARGET_PAGE_PIXELS
+    on their long side: small slips get more DPI, posters get less.
+    """
+    longest_inches = max(page_width_pt, page_height_pt, 1.0) / 72.0
+    dpi = int(TARGET_PAGE_PIXELS / longest_inches)
+    return max(MIN_RENDER_DPI, min(MAX_RENDER_DPI, dpi))
+
+
+@traced("extract_pdf_text")
+def extract_pdf_text(pdf_bytes: bytes) -> str:
+    """
+    Extract text from a PDF, OCR-ing pages that have no text layer.
+
+    Pages are read with PyMuPDF's text layer first; pages that come back
+    (almost) empty are rasterized at an adaptive DPI and sent through OCR.
+
+    Args:
+        pdf_bytes: Raw PDF file content
+
+    Returns:
+        str: Text of all pages in order
+    """
+    import fitz  # PyMuPDF
+
+    pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        page_texts = []
+        scanned = {}   # page index -> rendered image
+        for page_num in range(pdf_document.page_count):
+            page = pdf_document[page_num]
+            text = page.get_text()
+            page_texts.append(text)
+            if len(text.strip()) < MIN_PAGE_CHARS and is_ocr_available():
+                dpi = choose_render_dpi(page.rect.width, page.rect.height)
+                pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+                scanned[page_num] = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    finally:
+        pdf_document.close()
+
+    if scanned:
+        log.info("OCR on %d scanned page(s)", len(scanned))
+        for page_num, text in zip(scanned, ocr_images(list(scanned.values()))):
+            page_texts[page_num] = text
+
+    return "\n".join(t.strip() for t in page_texts if t.strip())
@@ -0,0 +1,273 @@
+# utils/pattern_rules.py
+
+"""
+Declarative multi-parameter pattern rules and their evaluation engine.
+
+Each rule lists the analytes it needs, predicates over their canonical
+values / statuses, and the text to show when it fires. Rules are compiled at
+import into an index from analyte -> rules, so a report only evaluates rules
+whose inputs are all present, however many rules exist.
+
+Rule format:
+    {
+        "id": "iron_deficiency",
+        "requires": ["hemoglobin", "mcv"],          # canonical analyte ids
+        "when": [("hemoglobin", "<", 12),           # value comparisons, or
+                 ("mcv", "status", ("red",))],      # status membership
+        "suppressed_by": ["other_rule_id"],         # optional
+        "severity": "medium",
+        "title": "...",
+        "evidence": "Low Hemoglobin ({hemoglobin})",  # formatted with values
+        "insight": "...",
+    }
+"""
+
+import operator
+from collections import Counter
+
+from utils.reference_ranges import analyte_key
+
+_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+ABNORMAL = ("red", "yellow")
+
+
+# ── Rules behind the dashboard's "Clinical Patterns" section ─────────────────
+CLINICAL_PATTERN_RULES = [
+    {
+        "id": "iron_deficiency",
+        "requires": ["hemoglobin", "mcv"],
+        "when": [("hemoglobin", "<", 12), ("mcv", "<", 80)],
+        "severity": "medium",
+        "title": "Possible Iron Deficiency Pattern",
+        "evidence": "Low Hemoglobin ({hemoglobin}) and Low MCV ({mcv})",
+        "insight": "This combination often suggests iron deficiency anemia, though other causes are possible.",
+    },
+    {
+        "id": "low_hemoglobin",
+        "requires": ["hemoglobin"],
+        "when": [("hemoglobin", "<", 12)],
+        "suppressed_by": ["iron_deficiency"],
+        "severity": "medium",
+        "title": "Low Hemoglobin Detected",
+        "evidence": "Hb ({hemoglobin}) is below normal range",
+        "insight": "Anemia involves lower-than-normal red blood cell levels or oxygen-carrying capacity.",
+    },
+    {
+        "id": "high_wbc",
+        "requires": ["wbc_count"],
+        "when": [("wbc_count", ">", 11000)],
+        "severity": "medium",
+        "title": "Elevated White Blood Cell Count",
+        "evidence": "WBC count ({wbc_count}) is high",
+        "insight": "This may indicate the body's response to infection, inflammation, or stress.",
+    },
+    {
+        "id": "kidney_function_high",
+        "requires": ["creatinine"],
+        "when": [("creatinine", ">", 2.0)],
+        "severity": "high",
+        "title": "Kidney Function Insight",
+        "evidence": "Creatinine ({creatinine}) is above the normal range",
+        "insight": "Elevated creatinine levels can reflect how well your kidneys are filtering waste.",
+    },
+    {
+        "id": "kidney_function",
+        "requires": ["creatinine"],
+        "when": [("creatinine", ">", 1.3)],
+        "suppressed_by": ["kidney_function_high"],
+        "severity": "medium",
+        "title": "Kidney Function Insight",
+        "evidence": "Creatinine ({creatinine}) is above the normal range",
+        "insight": "Elevated creatinine levels can reflect how well your kidneys are filtering waste.",
+    },
+]
+
+
+# ── Rules behind analyzer_fixed's plain-text recommendations ─────────────────
+RECOMMENDATION_RULES = [
+    {
+        "id": "anemia",
+        "requires": ["hemoglobin"],
+        "when": [("hemoglobin", "status", ABNORMAL), ("hemoglobin", "<", 12)],
+        "insight": "Possible anemia detected (low hemoglobin). Consider iron studies, B12, and folate levels.",
+    },
+    {
+        "id": "diabetic_glucose",
+        "requires": ["fasting_glucose"],
+        "when": [("fasting_glucose", ">=", 126)],
+        "insight": "Fasting glucose in diabetic range. HbA1c testing recommended.",
+    },
+    {
+        "id": "prediabetic_glucose",
+        "requires": ["fasting_glucose"],
+        "when": [("fasting_glucose", ">", 100)],
+        "suppressed_by": ["diabetic_glucose"],
+        "insight": "Fasting glucose elevated. Pre-diabetic range - lifestyle modifications recommended.",
+    },
+    {
+        "id": "diabetic_random_glucose",
+        "requires": ["random_glucose"],
+        "when": [("random_glucose", ">=", 200)],
+        "insight": "Random glucose in diabetic range. Fasting glucose or HbA1c testing recommended.",
+    },
+    {
+        "id": "elevated_random_glucose",
+        "requires": ["random_glucose"],
+        "when": [("random_glucose", ">=", 140)],
+        "suppressed_by": ["diabetic_random_glucose"],
+        "insight": "Random glucose elevated. A fasting glucose or HbA1c test is recommended to check for pre-diabetes.",
+    },
+    {
+        "id": "kidney",
+        "requires": ["creatinine"],
+        "when": [("creatinine", "status", ("red",))],
+        "insight": "Elevated creatinine may indicate reduced kidney function. Additional kidney function tests recommended.",
+    },
+    {
+        "id": "liver_alt",
+        "requires": ["alt"],
+        "when": [("alt", "status", ABNORMAL)],
+        "insight": "Liver enzyme elevation detected. Avoid alcohol and hepatotoxic medications. Consult physician.",
+    },
+    {
+        "id": "liver_ast",
+        "requires": ["ast"],
+        "when": [("ast", "status", ABNORMAL)],
+        "suppressed_by": ["liver_alt"],
+        "insight": "Liver enzyme elevation detected. Avoid alcohol and hepatotoxic medications. Consult physician.",
+    },
+    {
+        "id": "high_cholesterol",
+        "requires": ["total_cholesterol"],
+        "when": [("total_cholesterol", ">", 200)],
+        "insight": "Elevated cholesterol. Dietary modifications (low saturated fat) and exercise recommended.",
+    },
+    {
+        "id": "high_wbc",
+        "requires": ["wbc_count"],
+        "when": [("wbc_count", ">", 11000)],
+        "insight": "Elevated WBC count may indicate infection or inflammation.",
+    },
+    {
+        "id": "low_platelets",
+        "requires": ["platelets"],
+        "when": [("platelets", "<", 100000)],
+        "insight": "Low platelet count increases bleeding risk. Avoid NSAIDs and contact sports.",
+    },
+    {
+        "id": "high_platelets",
+        "requires": ["platelets"],
+        "when": [("platelets", ">", 500000)],
+        "insight": "Elevated platelet count may increase clotting risk.",
+    },
+]
+
+
+def compile_rules(rules: list) -> dict:
+    """
+    Validate rules and index them by required analyte.
+
+    Args:
+        rules: List of rule dicts (see module docstring)
+
+    Returns:
+        dict: {"rules": rules, "by_analyte": {analyte: [rule positions]}}
+
+    Raises:
+        ValueError: On duplicate ids, unknown operators, predicates over
+                    analytes missing from "requires", or unknown suppressors
+    """
+    by_analyte = {}
+    ids = [rule["id"] for rule in rules]
+    if len(ids) != len(set(ids)):
+        raise ValueError("Duplicate pattern rule ids")
+
+    for position, rule in enumerate(rules):
+        if not rule.get("requires"):
+            raise ValueError(f"Rule {rule['id']} has no required analytes")
+        for analyte, op, _ in rule.get("when", []):
+            if analyte not in rule["requires"]:
+                raise ValueError(f"Rule {rule['id']} tests {analyte} without requiring it")
+            if op != "status" and op not in _OPERATORS:
+                raise ValueError(f"Rule {rule['id']} uses unknown operator {op}")
+        for other in rule.get("suppressed_by", []):
+            if other not in ids:
+                raise ValueError(f"Rule {rule['id']} is suppressed by unknown rule {other}")
+        for analyte in set(rule["requires"]):
+            by_analyte.setdefault(analyte, []).append(position)
+
+    return {"rules": rules, "by_analyte": by_analyte}
+
+
+CLINICAL_PATTERNS = compile_rules(CLINICAL_PATTERN_RULES)
+RECOMMENDATIONS = compile_rules(RECOMMENDATION_RULES)
+
+
+def rule_inputs(results: list, value_key: str = "canonical_value") -> tuple:
+    """
+    Per-analyte values and statuses from analysis results. When a report lists
+    an analyte twice the first occurrence wins.
+
+    Args:
+        results: Result dicts with "name"/"analyte", a value and "status"
+        value_key: Which value to test ("canonical_value" when available)
+
+    Returns:
+        tuple: ({analyte: value}, {analyte: status}, {analyte: value as shown})
+    """
+    values, statuses, shown = {}, {}, {}
+    for r in results:
+        analyte = r.get("analyte") or analyte_key(r["name"])
+        if analyte in values:
+            continue
+        values[analyte] = r.get(value_key, r["value"])
+        statuses[analyte] = r.get("status")
+        shown[analyte] = r["value"]
+    return values, statuses, shown
+
+
+def _holds(predicate: tuple, values: dict, statuses: dict) -> bool:
+    analyte, op, expected = predicate
+    if op == "status":
+        return statuses.get(analyte) in expected
+    return _OPERATORS[op](values[analyte], expected)
+
+
+def evaluate_rules(compiled: dict, values: dict, statuses: dict = None) -> list:
+    """
+    Fire every rule whose required analytes are present and whose predicates hold.
+
+    Only rules reachable from the present analytes are looked at: a rule is a
+    candidate once all of its required analytes have been counted, so the cost
+    is proportional to the index postings touched, not rules x results.
+
+    Args:
+        compiled: Output of compile_rules
+        values: {analyte: value}
+        statuses: {analyte: "green" | "yellow" | "red"}
+
+    Returns:
+        list: Fired rules (minus suppressed ones) in authoring order
+    """
+    statuses = statuses or {}
+    rules = compiled["rules"]
+    hits = Counter()
+    for analyte in values:
+        hits.update(compiled["by_analyte"].get(analyte, ()))
+
+    fired = {}
+    for position in sorted(hits):
+        rule = rules[position]
+        if hits[position] < len(set(rule["requires"])):
+            continue
+        if all(_holds(p, values, statuses) for p in rule.get("when", [])):
+            fired[rule["id"]] = rule
+
+    return [rule for rule in fired.values()
+            if not any(other in fired for other in rule.get("suppressed_by", []))]
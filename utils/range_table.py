@@ -0,0 +1,265 @@
+# utils/range_table.py
+
+"""
+Columnar, array-backed form of REFERENCE_RANGES for vectorized risk assessment.
+
+REFERENCE_RANGES is compiled once at import into NumPy arrays with one row
+per (analyte, context variant). assess_all() then scores every value of a
+report - or of thousands of reports flattened together - in a single pass,
+with the same rules as analyzer.assess_risk.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from utils.reference_ranges import (
+    REFERENCE_RANGES, STRATIFIED_RANGES, STRATUM_INDEX, AGE_BAND_STARTS, SEXES,
+    canonical_analyte, unit_factor, normalize_sex,
+)
+
+STATUS_LABELS = np.array(["green", "yellow", "red"])
+GREEN, YELLOW, RED = 0, 1, 2
+
+BORDERLINE_DEVIATION_PCT = 10   # Beyond this % outside the range a value is "red"
+
+
+def compile_reference_table(reference_ranges: dict, stratified_ranges: dict) -> dict:
+    """
+    Flatten the nested reference range dicts into columns.
+
+    Args:
+        reference_ranges: Dict in the REFERENCE_RANGES format
+        stratified_ranges: Dict in the STRATIFIED_RANGES format
+
+    Returns:
+        dict: {
+            "analytes": [analyte id per row],
+            "variants": [variant name per row],
+            "min", "max": float arrays of range bounds,
+            "crit_low", "crit_high": float arrays (-inf / inf where not set),
+            "row_index": {(analyte, variant): row},
+            "default_row": {analyte: row used when no variant matches},
+            "analyte_ids": {analyte: dense id},
+            "by_age": int array [analyte id, sex, age band] -> row (-1 = no stratum),
+        }
+    """
+    analytes, variants, mins, maxs, crit_low, crit_high = [], [], [], [], [], []
+    row_index, default_row = {}, {}
+
+    for analyte, info in reference_ranges.items():
+        critical = info.get("critical", {})
+        for variant, bounds in info.get("ranges", {}).items():
+            row_index[(analyte, variant)] = len(analytes)
+            analytes.append(analyte)
+            variants.append(variant)
+            mins.append(bounds.get("min", 0))
+            maxs.append(bounds.get("max", 100))
+            crit_low.append(critical.get("low", -np.inf))
+            crit_high.append(critical.get("high", np.inf))
+        if info.get("ranges"):
+            # Same fallback as get_reference_range: "default", else the first variant
+            default_row[analyte] = row_index.get(
+                (analyte, "default"), row_index[(analyte, next(iter(info["ranges"])))]
+            )
+
+    # Age/sex strata become extra rows; stratum_rows[analyte][i] is the row of stratum i
+    stratum_rows = {}
+    for analyte, strata in stratified_ranges.items():
+        critical = reference_ranges.get(analyte, {}).get("critical", {})
+        stratum_rows[analyte] = []
+        for stratum in strata:
+            limits = stratum.get("critical", critical)
+            stratum_rows[analyte].append(len(analytes))
+            analytes.append(analyte)
+            variants.append(f"{stratum['sex']} {stratum['age_min']:.3g}-{stratum['age_max']:.3g}y")
+            mins.append(stratum["min"])
+            maxs.append(stratum["max"])
+            crit_low.append(limits.get("low", -np.inf))
+            crit_high.append(limits.get("high", np.inf))
+
+    # Dense (analyte id, sex, age band) -> row lookup for vectorized resolution
+    analyte_ids = {analyte: i for i, analyte in enumerate(reference_ranges)}
+    by_age = np.full((len(analyte_ids), len(SEXES), len(AGE_BAND_STARTS)), -1, dtype=int)
+    for (analyte, sex, band), i in STRATUM_INDEX.items():
+        if analyte in analyte_ids:
+            by_age[analyte_ids[analyte], SEXES.index(sex), band] = stratum_rows[analyte][i]
+
+    return {
+        "analytes": analytes,
+        "variants": variants,
+        "min": np.array(mins, dtype=float),
+        "max": np.array(maxs, dtype=float),
+        "crit_low": np.array(crit_low, dtype=float),
+        "crit_high": np.array(crit_high, dtype=float),
+        "row_index": row_index,
+        "default_row": default_row,
+        "analyte_ids": analyte_ids,
+        "by_age": by_age,
+    }
+
+
+REFERENCE_TABLE = compile_reference_table(REFERENCE_RANGES, STRATIFIED_RANGES)
+
+
+@lru_cache(maxsize=4096)
+def resolve_row(analyte: str, gender: str = "default", age_group: str = "adult") -> int:
+    """
+    Table row for an analyte in a patient context (-1 if the analyte is unknown).
+    Mirrors get_reference_range: gender variant, then age group, then default.
+    """
+    if analyte not in REFERENCE_TABLE["default_row"]:
+        return -1
+    row_index = REFERENCE_TABLE["row_index"]
+    return row_index.get((analyte, gender),
+                         row_index.get((analyte, age_group), REFERENCE_TABLE["default_row"][analyte]))
+
+
+def resolve_rows(analytes: list, genders: list, age_groups: list, ages=None) -> np.ndarray:
+    """
+    Table rows for many values at once.
+
+    Where an exact age is known and the analyte has a matching age/sex
+    stratum, that stratum's row is used (one searchsorted over the age bands
+    plus a gather from the precomputed by_age table). Otherwise the flat
+    gender/age-group variants apply, as in resolve_row.
+
+    Args:
+        analytes: Canonical analyte ids (None for unknown)
+        genders: Gender label per value
+        age_groups: Age group label per value
+        ages: Age in years per value (NaN/None where unknown), or None
+
+    Returns:
+        np.ndarray: Row per value, -1 where the analyte is unknown
+    """
+    rows = np.array([resolve_row(a, g, ag) if a else -1
+                     for a, g, ag in zip(analytes, genders, age_groups)], dtype=int)
+    if ages is None or not len(rows):
+        return rows
+
+    ages = np.array([np.nan if a is None else a for a in ages], dtype=float)
+    ids = np.array([REFERENCE_TABLE["analyte_ids"].get(a, -1) for a in analytes], dtype=int)
+    sexes = np.array([SEXES.index(normalize_sex(g)) for g in genders], dtype=int)
+    usable = (ids >= 0) & ~np.isnan(ages)
+    bands = np.searchsorted(AGE_BAND_STARTS, np.where(usable, ages, 0.0), side="right") - 1
+    by_age = REFERENCE_TABLE["by_age"][np.where(usable, ids, 0), sexes, np.clip(bands, 0, None)]
+    return np.where(usable & (by_age >= 0), by_age, rows)
+
+
+def assess_arrays(values, ref_min, ref_max, crit_low, crit_high) -> dict:
+    """
+    Core vectorized scoring. All inputs are equal-length float arrays; rows
+    with NaN ref_min have no reference range.
+
+    Returns:
+        dict: "status" (int codes, see STATUS_LABELS), "deviation" (% outside
+              the range, 0 inside) and "bar_pct" (int position for the card bar)
+    """
+    values = np.asarray(values, dtype=float)
+    has_range = ~np.isnan(ref_min)
+    below = has_range & (values < ref_min)
+    above = has_range & (values > ref_max)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        deviation = np.where(below, (ref_min - values) / ref_min * 100,
+                             np.where(above, (values - ref_max) / ref_max * 100, 0.0))
+
+        status = np.where(below | above,
+                          np.where(deviation > BORDERLINE_DEVIATION_PCT, RED, YELLOW), GREEN)
+        critical = (values < crit_low) | (values > crit_high)
+        status = np.where(has_range, np.where(critical, RED, status), YELLOW)
+
+        span = ref_max - ref_min
+        in_range_bar = np.where(np.isinf(ref_max) | (span == 0), 50.0,
+                                30 + (values - ref_min) / span * 40)
+        bar = np.where(below, np.maximum(10, values / ref_min * 30),
+                       np.where(above, np.minimum(90, 70 + values / ref_max * 15), in_range_bar))
+        bar = np.where(has_range, np.nan_to_num(bar, nan=50.0), 50.0)
+
+    return {
+        "status": status.astype(np.int8),
+        "deviation": np.nan_to_num(deviation),
+        "bar_pct": np.trunc(bar).astype(int),
+    }
+
+
+def _per_row(value, n: int) -> list:
+    return [value] * n if value is None or isinstance(value, str) else list(value)
+
+
+def assess_all(names, values, units=None, report_ranges=None,
+               genders="default", age_groups="adult", ages=None) -> dict:
+    """
+    Score many lab values in one vectorized pass.
+
+    Values with a report-printed range are compared against it in the report's
+    units; everything else is converted to the table's unit and compared against
+    the built-in range for the patient context. Built-in critical limits apply
+    whenever the value can be expressed in the table's unit.
+
+    Args:
+        names: Test names as extracted (any alias, e.g. "Hb")
+        values: Numeric values, same length as names
+        units: Unit per value (or None)
+        report_ranges: Per value {"min", "max"} from the report, or None
+        genders: One gender for all rows, or one per row
+        age_groups: One age group for all rows, or one per row
+        ages: Exact age in years for all rows, or one per row (None if unknown)
+
+    Returns:
+        dict of equal-length columns: "analyte", "row", "canonical_value",
+        "unit_factor" (NaN if unknown), "range_min", "range_max",
+        "range_source", "status" (labels), "deviation", "bar_pct"
+    """
+    n = len(names)
+    units = _per_row(units, n)
+    report_ranges = _per_row(report_ranges, n)
+    genders = _per_row(genders, n)
+    age_groups = _per_row(age_groups, n)
+    values = np.asarray(values, dtype=float)
+
+    if ages is not None and np.ndim(ages) == 0:
+        ages = [ages] * n
+
+    analytes = [canonical_analyte(name) for name in names]
+    rows = resolve_rows(analytes, genders, age_groups, ages)
+    factors = np.array([(unit_factor(a, u) if a else None) or np.nan
+                        for a, u in zip(analytes, units)], dtype=float)
+    report_min = np.array([r["min"] if r else np.nan for r in report_ranges], dtype=float)
+    report_max = np.array([r["max"] if r else np.nan for r in report_ranges], dtype=float)
+
+    known = rows >= 0
+    safe_rows = np.where(known, rows, 0)
+    from_report = ~np.isnan(report_min)
+
+    # Unknown/missing units are assumed to already be in the table's unit
+    canonical_value = values * np.where(np.isnan(factors), 1.0, factors)
+    table_min = np.where(known, REFERENCE_TABLE["min"][safe_rows], np.nan)
+    table_max = np.where(known, REFERENCE_TABLE["max"][safe_rows], np.nan)
+
+    # Compare in report units against the report range, in table units otherwise.
+    # Critical limits are in table units: rescale them into report units where we can.
+    compare = np.where(from_report, values, canonical_value)
+    ref_min = np.where(from_report, report_min, table_min)
+    ref_max = np.where(from_report, report_max, table_max)
+    scale = np.where(from_report, factors, 1.0)
+    critical_ok = known & ~np.isnan(scale)
+    with np.errstate(invalid="ignore"):
+        crit_low = np.where(critical_ok, REFERENCE_TABLE["crit_low"][safe_rows] / scale, -np.inf)
+        crit_high = np.where(critical_ok, REFERENCE_TABLE["crit_high"][safe_rows] / scale, np.inf)
+
+    scored = assess_arrays(compare, ref_min, ref_max, crit_low, crit_high)
+
+    return {
+        "analyte": analytes,
+        "row": rows,
+        "canonical_value": canonical_value,
+        "unit_factor": factors,
+        "range_min": ref_min,
+        "range_max": ref_max,
+        "range_source": np.where(from_report, "report", np.where(known, "builtin", "none")),
+        "status": STATUS_LABELS[scored["status"]],
+        "deviation": scored["deviation"],
+        "bar_pct": scored["bar_pct"],
+    }
@@ -5,11 +5,17 @@ Medical reference ranges for lab tests.
 Sources: Standard clinical guidelines
 """
 
+import re
+from bisect import bisect_right
+from functools import lru_cache
+
 REFERENCE_RANGES = {
     # Complete Blood Count (CBC)
     "hemoglobin": {
         "name": "Hemoglobin",
         "unit": "g/dL",
+        "aliases": ["hb", "hgb", "haemoglobin"],
+        "conversions": {"g/l": 0.1, "mmol/l": 1.611},  # factor to multiply by to get "unit"
         "ranges": {
             "male": {"min": 13.5, "max": 17.5},
             "female": {"min": 12.0, "max": 16.0},
@@ -25,6 +31,8 @@ REFERENCE_RANGES = {
     "wbc_count": {
         "name": "WBC Count",
         "unit": "/μL",
+        "aliases": ["wbc", "white blood cells", "white blood cell count", "total leukocyte count", "tlc", "leukocytes"],
+        "conversions": {"10^3/ul": 1000, "x10^3/ul": 1000, "k/ul": 1000, "10^9/l": 1000, "/cumm": 1, "/mm3": 1, "cells/ul": 1},
         "ranges": {
             "default": {"min": 4500, "max": 11000}
         },
@@ -34,9 +42,21 @@ REFERENCE_RANGES = {
         }
     },
     
+    "mcv": {
+        "name": "MCV",
+        "unit": "fL",
+        "aliases": ["mean corpuscular volume", "mean cell volume"],
+        "conversions": {},
+        "ranges": {
+            "default": {"min": 80, "max": 100}
+        }
+    },
+    
     "platelets": {
         "name": "Platelets",
         "unit": "/μL",
+        "aliases": ["platelet count", "plt", "platelet"],
+        "conversions": {"10^3/ul": 1000, "x10^3/ul": 1000, "k/ul": 1000, "10^9/l": 1000, "lakh/cumm": 100000, "/cumm": 1, "/mm3": 1},
         "ranges": {
             "default": {"min": 150000, "max": 400000}
         },
@@ -50,6 +70,8 @@ REFERENCE_RANGES = {
     "fasting_glucose": {
         "name": "Fasting Glucose",
         "unit": "mg/dL",
+        "aliases": ["glucose fasting", "fasting blood sugar", "fbs", "fasting plasma glucose"],
+        "conversions": {"mmol/l": 18.016},
         "ranges": {
             "default": {"min": 70, "max": 100},
             "prediabetic": {"min": 101, "max": 125},
@@ -61,9 +83,28 @@ REFERENCE_RANGES = {
         }
     },
     
+    # Glucose without a fasting label: judged as a random (non-fasting) sample,
+    # never against the fasting limits
+    "random_glucose": {
+        "name": "Random Glucose",
+        "unit": "mg/dL",
+        "aliases": ["glucose", "blood glucose", "plasma glucose", "glucose random", "random blood sugar",
+                    "rbs", "blood sugar"],
+        "conversions": {"mmol/l": 18.016},
+        "ranges": {
+            "default": {"min": 70, "max": 140}
+        },
+        "critical": {
+            "low": 50,
+            "high": 400
+        }
+    },
+    
     "creatinine": {
         "name": "Creatinine",
         "unit": "mg/dL",
+        "aliases": ["serum creatinine", "creatinine serum"],
+        "conversions": {"umol/l": 0.01131},
         "ranges": {
             "male": {"min": 0.7, "max": 1.3},
             "female": {"min": 0.6, "max": 1.1},
@@ -71,10 +112,32 @@ REFERENCE_RANGES = {
         }
     },
     
+    "urea": {
+        "name": "Urea",
+        "unit": "mg/dL",
+        "aliases": ["blood urea", "serum urea"],
+        "conversions": {"mmol/l": 6.006},
+        "ranges": {
+            "default": {"min": 15, "max": 45}
+        }
+    },
+    
+    "bun": {
+        "name": "BUN",
+        "unit": "mg/dL",
+        "aliases": ["blood urea nitrogen", "urea nitrogen"],
+        "conversions": {"mmol/l": 2.801},
+        "ranges": {
+            "default": {"min": 7, "max": 20}
+        }
+    },
+    
     # Lipid Profile
     "total_cholesterol": {
         "name": "Total Cholesterol",
         "unit": "mg/dL",
+        "aliases": ["cholesterol", "cholesterol total", "serum cholesterol"],
+        "conversions": {"mmol/l": 38.67},
         "ranges": {
             "desirable": {"min": 0, "max": 200},
             "borderline": {"min": 201, "max": 239},
@@ -86,6 +149,8 @@ REFERENCE_RANGES = {
     "alt": {
         "name": "ALT (SGPT)",
         "unit": "U/L",
+        "aliases": ["sgpt", "alt sgpt", "alanine aminotransferase"],
+        "conversions": {"iu/l": 1},
         "ranges": {
             "male": {"min": 10, "max": 40},
             "female": {"min": 7, "max": 35},
@@ -96,6 +161,8 @@ REFERENCE_RANGES = {
     "ast": {
         "name": "AST (SGOT)",
         "unit": "U/L",
+        "aliases": ["sgot", "ast sgot", "aspartate aminotransferase"],
+        "conversions": {"iu/l": 1},
         "ranges": {
             "default": {"min": 10, "max": 40}
         }
@@ -105,6 +172,8 @@ REFERENCE_RANGES = {
     "tsh": {
         "name": "TSH",
         "unit": "mIU/L",
+        "aliases": ["thyroid stimulating hormone", "tsh ultrasensitive"],
+        "conversions": {"uiu/ml": 1, "miu/ml": 1000},
         "ranges": {
             "default": {"min": 0.4, "max": 4.5}
         }
@@ -112,7 +181,202 @@ REFERENCE_RANGES = {
 }
 
 
-def get_reference_range(test_name: str, gender: str = "default", age_group: str = "adult"):
+def _name_key(name: str) -> str:
+    """Lowercase, drop punctuation and join words with "_" ("ALT (SGPT)" -> "alt_sgpt")."""
+    return "_".join(re.findall(r"[a-z0-9]+", str(name).lower()))
+
+
+# alias key -> canonical analyte id, built once at import
+ANALYTE_ALIASES = {}
+for _key, _info in REFERENCE_RANGES.items():
+    for _alias in [_key, _info["name"]] + _info.get("aliases", []):
+        ANALYTE_ALIASES.setdefault(_name_key(_alias), _key)
+
+
+def analyte_key(test_name: str) -> str:
+    """Canonical analyte id when known, otherwise the normalized name ("Neutrophils %" -> "neutrophils")."""
+    return canonical_analyte(test_name) or _name_key(test_name)
+
+
+@lru_cache(maxsize=4096)
+def canonical_analyte(test_name: str):
+    """
+    Map a test name as written on a report to its REFERENCE_RANGES key.
+    
+    Args:
+        test_name: e.g. "Hb", "WBC", "ALT (SGPT)", "Serum Creatinine"
+    
+    Returns:
+        str: Canonical analyte id (e.g. "hemoglobin") or None if unknown
+    """
+    return ANALYTE_ALIASES.get(_name_key(test_name))
+
+
+def normalize_unit(unit: str) -> str:
+    """Comparable form of a unit string: lowercase, no spaces, micro signs as "u"."""
+    unit = (unit or "").strip().lower().replace(" ", "")
+    return unit.replace("µ", "u").replace("μ", "u").replace("×", "x").replace("*", "")
+
+
+@lru_cache(maxsize=4096)
+def unit_factor(analyte: str, unit: str):
+    """
+    Factor converting a value in `unit` to the analyte's reference unit.
+    
+    Returns:
+        float: 1.0 for the reference unit itself, the conversion factor for a
+               known alternative unit, or None if the unit is unknown/missing
+    """
+    info = REFERENCE_RANGES.get(analyte)
+    unit = normalize_unit(unit)
+    if not info or not unit:
+        return None
+    if unit == normalize_unit(info["unit"]):
+        return 1.0
+    for alt_unit, factor in info.get("conversions", {}).items():
+        if unit == normalize_unit(alt_unit):
+            return float(factor)
+    return None
+
+
+# ── Age- and sex-stratified ranges ───────────────────────────────────────────
+# Ages are in years; intervals are [age_min, age_max). Approximate pediatric and
+# geriatric intervals from common clinical references - laboratories vary.
+# A stratum may carry its own "critical" limits (e.g. neonatal hemoglobin).
+# Ages with no matching stratum fall back to the "ranges" table above.
+
+DAY = 1 / 365.25
+NO_MAX_AGE = 200.0
+
+AGE_GROUPS = [  # (name, start age in years)
+    ("neonatal", 0.0),
+    ("infant", 28 * DAY),
+    ("child", 1.0),
+    ("adolescent", 12.0),
+    ("adult", 18.0),
+    ("geriatric", 65.0),
+]
+
+STRATIFIED_RANGES = {
+    "hemoglobin": [
+        {"sex": "any", "age_min": 0, "age_max": 28 * DAY, "min": 14.0, "max": 24.0,
+         "critical": {"low": 9.0, "high": 26.0}},
+        {"sex": "any", "age_min": 28 * DAY, "age_max": 1, "min": 9.5, "max": 14.0},
+        {"sex": "any", "age_min": 1, "age_max": 6, "min": 11.0, "max": 14.0},
+        {"sex": "any", "age_min": 6, "age_max": 12, "min": 11.5, "max": 15.5},
+        {"sex": "male", "age_min": 12, "age_max": 18, "min": 13.0, "max": 16.0},
+        {"sex": "female", "age_min": 12, "age_max": 18, "min": 12.0, "max": 16.0},
+        {"sex": "male", "age_min": 18, "age_max": 65, "min": 13.5, "max": 17.5},
+        {"sex": "female", "age_min": 18, "age_max": 65, "min": 12.0, "max": 16.0},
+        {"sex": "male", "age_min": 65, "age_max": NO_MAX_AGE, "min": 12.5, "max": 17.0},
+        {"sex": "female", "age_min": 65, "age_max": NO_MAX_AGE, "min": 11.5, "max": 16.0},
+    ],
+    "wbc_count": [
+        {"sex": "any", "age_min": 0, "age_max": 28 * DAY, "min": 9000, "max": 30000,
+         "critical": {"low": 5000, "high": 40000}},
+        {"sex": "any", "age_min": 28 * DAY, "age_max": 1, "min": 6000, "max": 17500},
+        {"sex": "any", "age_min": 1, "age_max": 6, "min": 5500, "max": 15500},
+        {"sex": "any", "age_min": 6, "age_max": 12, "min": 4500, "max": 13500},
+        {"sex": "any", "age_min": 12, "age_max": 18, "min": 4500, "max": 13000},
+    ],
+    "platelets": [
+        {"sex": "any", "age_min": 0, "age_max": 18, "min": 150000, "max": 450000},
+    ],
+    "fasting_glucose": [
+        {"sex": "any", "age_min": 0, "age_max": 28 * DAY, "min": 50, "max": 90,
+         "critical": {"low": 40, "high": 300}},
+        {"sex": "any", "age_min": 28 * DAY, "age_max": 18, "min": 60, "max": 100},
+    ],
+    "creatinine": [
+        {"sex": "any", "age_min": 0, "age_max": 28 * DAY, "min": 0.3, "max": 1.0},
+        {"sex": "any", "age_min": 28 * DAY, "age_max": 1, "min": 0.2, "max": 0.4},
+        {"sex": "any", "age_min": 1, "age_max": 6, "min": 0.2, "max": 0.5},
+        {"sex": "any", "age_min": 6, "age_max": 12, "min": 0.3, "max": 0.7},
+        {"sex": "any", "age_min": 12, "age_max": 18, "min": 0.5, "max": 1.0},
+    ],
+    "alt": [
+        {"sex": "any", "age_min": 1, "age_max": 18, "min": 5, "max": 45},
+    ],
+    "tsh": [
+        {"sex": "any", "age_min": 0, "age_max": 28 * DAY, "min": 0.7, "max": 15.2},
+        {"sex": "any", "age_min": 28 * DAY, "age_max": 1, "min": 0.7, "max": 8.4},
+        {"sex": "any", "age_min": 1, "age_max": 6, "min": 0.7, "max": 6.0},
+        {"sex": "any", "age_min": 6, "age_max": 12, "min": 0.6, "max": 4.8},
+        {"sex": "any", "age_min": 12, "age_max": 18, "min": 0.5, "max": 4.3},
+        {"sex": "any", "age_min": 65, "age_max": NO_MAX_AGE, "min": 0.4, "max": 5.8},
+    ],
+}
+
+SEXES = ("any", "male", "female")
+
+# Every stratum boundary of every analyte, sorted: consecutive boundaries form
+# "age bands" inside which no analyte's range changes. Any exact age maps to its
+# band with one bisect, and (analyte, sex, band) -> stratum is precomputed below.
+AGE_BAND_STARTS = sorted({0.0} | {float(b) for strata in STRATIFIED_RANGES.values()
+                                  for st in strata for b in (st["age_min"], st["age_max"])})
+
+
+def _build_band_index() -> dict:
+    """(analyte, sex, band) -> index into STRATIFIED_RANGES[analyte]; sex-specific beats "any"."""
+    index = {}
+    for analyte, strata in STRATIFIED_RANGES.items():
+        for band, band_start in enumerate(AGE_BAND_STARTS):
+            for sex in SEXES:
+                match = None
+                for i, stratum in enumerate(strata):
+                    if stratum["sex"] not in (sex, "any"):
+                        continue
+                    if stratum["age_min"] <= band_start < stratum["age_max"]:
+                        if match is None or stratum["sex"] != "any":
+                            match = i
+                if match is not None:
+                    index[(analyte, sex, band)] = match
+    return index
+
+
+STRATUM_INDEX = _build_band_index()
+
+
+def normalize_sex(gender: str) -> str:
+    """Normalize a gender label to "male", "female" or "any" (unknown/unspecified)."""
+    gender = (gender or "").strip().lower()
+    if gender in ("male", "m", "man", "boy"):
+        return "male"
+    if gender in ("female", "f", "woman", "girl"):
+        return "female"
+    return "any"
+
+
+def age_band(age: float) -> int:
+    """Index of the age band containing `age` (years) - O(log bands)."""
+    return max(0, bisect_right(AGE_BAND_STARTS, float(age)) - 1)
+
+
+def age_group_for(age) -> str:
+    """Named age group ("neonatal" ... "geriatric") for an age in years, "adult" if unknown."""
+    if age is None:
+        return "adult"
+    starts = [start for _, start in AGE_GROUPS]
+    return AGE_GROUPS[max(0, bisect_right(starts, float(age)) - 1)][0]
+
+
+def get_stratified_range(test_name: str, gender: str, age: float):
+    """
+    Age/sex-specific range for a test, or None if the analyte has no stratum
+    covering this patient.
+    
+    Returns:
+        dict: The stratum ({"sex", "age_min", "age_max", "min", "max", ...})
+    """
+    analyte = canonical_analyte(test_name)
+    if analyte is None or age is None:
+        return None
+    i = STRATUM_INDEX.get((analyte, normalize_sex(gender), age_band(age)))
+    return STRATIFIED_RANGES[analyte][i] if i is not None else None
+
+
+def get_reference_range(test_name: str, gender: str = "default", age_group: str = "adult",
+                        age: float = None):
     """
     Get reference range for a specific test considering patient context.
     
@@ -120,15 +384,20 @@ def get_reference_range(test_name: str, gender: str = "default", age_group: str
         test_name: Name of the lab test
         gender: "male", "female", or "default"
         age_group: "adult", "child", etc.
+        age: Exact age in years; selects an age/sex stratum when one exists
     
     Returns:
         Dictionary with min/max values or None if test not found
     """
-    test_key = test_name.lower().replace(" ", "_")
+    test_key = canonical_analyte(test_name)
     
-    if test_key not in REFERENCE_RANGES:
+    if test_key is None:
         return None
     
+    stratum = get_stratified_range(test_key, gender, age)
+    if stratum:
+        return {"min": stratum["min"], "max": stratum["max"]}
+    
     test_info = REFERENCE_RANGES[test_key]
     
     # Try gender-specific range first
@@ -138,14 +407,111 @@ def get_reference_range(test_name: str, gender: str = "default", age_group: str
         elif age_group in test_info["ranges"]:
             return test_info["ranges"][age_group]
         else:
-            return test_info["ranges"].get("default", test_info["ranges"])
+            # No "default" variant (e.g. cholesterol bands): the first one is the normal band
+            return test_info["ranges"].get("default", next(iter(test_info["ranges"].values())))
     
     return None
 
 
+def get_reference_unit(test_name: str) -> str:
+    """Unit the built-in range for a test is expressed in ("" if unknown)."""
+    test_key = canonical_analyte(test_name)
+    if test_key is not None:
+        return REFERENCE_RANGES[test_key].get("unit", "")
+    return ""
+
+
 def get_critical_limits(test_name: str):
     """Get critical low/high values for a test."""
-    test_key = test_name.lower().replace(" ", "_")
-    if test_key in REFERENCE_RANGES:
+    test_key = canonical_analyte(test_name)
+    if test_key is not None:
         return REFERENCE_RANGES[test_key].get("critical", {})
-    return {}
\ No newline at end of file
+    return {}
+
+
+@lru_cache(maxsize=None)
+def context_dependencies(analyte: str) -> tuple:
+    """
+    Patient context fields the built-in range of an analyte depends on.
+
+    Args:
+        analyte: Canonical analyte id
+
+    Returns:
+        tuple: Subset of ("sex", "age"); empty for unknown analytes
+    """
+    variants = set(REFERENCE_RANGES.get(analyte, {}).get("ranges", {}))
+    strata = STRATIFIED_RANGES.get(analyte, [])
+    depends_on = []
+    if variants & {"male", "female"} or any(st["sex"] != "any" for st in strata):
+        depends_on.append("sex")
+    if variants & {name for name, _ in AGE_GROUPS} or strata:
+        depends_on.append("age")
+    return tuple(depends_on)
+
+
+# Report-printed reference intervals, e.g. "13.0 - 17.0", "< 200", "0.4–4.5", "> 40"
+_NUMBER = r"(\d[\d,]*\.?\d*|\.\d+)"
+_BETWEEN_RE = re.compile(_NUMBER + r"\s*(?:-|–|—|~|to)\s*" + _NUMBER, re.IGNORECASE)
+_UPPER_RE = re.compile(r"(?:<=?|≤|up\s*to|less\s+than|below)\s*" + _NUMBER, re.IGNORECASE)
+_LOWER_RE = re.compile(r"(?:>=?|≥|greater\s+than|more\s+than|above)\s*" + _NUMBER, re.IGNORECASE)
+
+
+def _to_float(number: str) -> float:
+    return float(number.replace(",", ""))
+
+
+def parse_reference_range(text) -> dict:
+    """
+    Parse a reference interval as printed on a lab report.
+
+    Handles closed intervals ("13.0 - 17.0", "0.4–4.5", "4.5 to 11"),
+    upper limits ("< 200", "up to 40") and lower limits ("> 40").
+    Also accepts {"min": x, "max": y} dicts and [min, max] pairs from the LLM.
+
+    Args:
+        text: Range as found in the report
+
+    Returns:
+        dict: {"min": float, "max": float, "text": str} (open sides are 0 / inf),
+              or None if no range could be read
+    """
+    try:
+        if isinstance(text, dict):
+            low, high = text.get("min"), text.get("max")
+            if low is None and high is None:
+                return None
+            low = float(low) if low is not None else 0.0
+            high = float(high) if high is not None else float("inf")
+            text = format_reference_range(low, high)
+        elif isinstance(text, (list, tuple)) and len(text) == 2:
+            low, high = float(text[0]), float(text[1])
+            text = format_reference_range(low, high)
+        else:
+            text = str(text or "").strip()
+            match = _BETWEEN_RE.search(text)
+            if match:
+                low, high = _to_float(match.group(1)), _to_float(match.group(2))
+            elif _UPPER_RE.search(text):
+                low, high = 0.0, _to_float(_UPPER_RE.search(text).group(1))
+            elif _LOWER_RE.search(text):
+                low, high = _to_float(_LOWER_RE.search(text).group(1)), float("inf")
+            else:
+                return None
+    except (TypeError, ValueError):
+        return None
+
+    if low > high:
+        return None
+    return {"min": low, "max": high, "text": text}
+
+
+def format_reference_range(min_val: float, max_val: float, unit: str = "") -> str:
+    """Human-readable range, e.g. "13.5 – 17.5 g/dL", "< 200 mg/dL", "> 40"."""
+    if max_val == float("inf"):
+        text = f"> {min_val:g}"
+    elif min_val <= 0:
+        text = f"< {max_val:g}"
+    else:
+        text = f"{min_val:g} – {max_val:g}"
+    return f"{text} {unit if unit else ''}".strip()
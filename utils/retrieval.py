@@ -0,0 +1,270 @@
+# utils/retrieval.py
+
+"""
+Local BM25 retrieval over the clinical passage corpus.
+
+CLINICAL_PASSAGES (utils/knowledge_base.py) is tokenized once into an
+in-memory inverted index. BM25 term weights are query-independent, so each
+posting stores its final per-document weight and a query is just a sum over
+the postings of its terms: well under a millisecond per query. The index can
+also be saved to / loaded from a prebuilt JSON file (DIAGNOVA_RETRIEVAL_INDEX).
+
+build_tfidf/tfidf_search are a sparse TF-IDF matrix for ranking arbitrary
+documents (e.g. one analysis's results plus the corpus) against chat questions.
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from utils.knowledge_base import CLINICAL_PASSAGES
+from utils.log import get_logger
+from utils.reference_ranges import REFERENCE_RANGES
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+INDEX_PATH_ENV = "DIAGNOVA_RETRIEVAL_INDEX"
+
+_STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its itself just me more
+most my no nor not now of off on once only or other our out over own same she should so some
+such than that the their them then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your yours
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+log = get_logger(__name__)
+
+_index = None
+_lock = threading.Lock()
+
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens without stopwords, plural "s" stripped."""
+    tokens = []
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _passage_terms(passage: dict) -> list:
+    """
+    Indexed terms of a passage: its text, plus the analyte id, its aliases and
+    the topic, so "Hb", "SGPT" or "low" find the right passages.
+    """
+    expansion = [passage.get("topic", "").replace("_", " ")]
+    analyte = passage.get("analyte")
+    if analyte:
+        expansion.append(analyte.replace("_", " "))
+        expansion.extend(REFERENCE_RANGES.get(analyte, {}).get("aliases", []))
+    return tokenize(passage["text"] + " " + " ".join(expansion))
+
+
+def corpus_hash(passages: list) -> str:
+    """Fingerprint of a corpus, used to reject stale prebuilt index files."""
+    payload = json.dumps(passages, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def build_index(passages: list = None, k1: float = BM25_K1, b: float = BM25_B) -> dict:
+    """
+    Build a BM25 inverted index.
+
+    Args:
+        passages: Passage dicts {"id", "analyte", "topic", "text"}
+                  (defaults to CLINICAL_PASSAGES)
+        k1: Term-frequency saturation
+        b: Document length normalization
+
+    Returns:
+        dict: {
+            "passages": passages,
+            "postings": {term: [[doc, bm25 weight], ...]},
+            "by_analyte": {analyte: [doc, ...]},
+            "corpus_hash": str,
+        }
+    """
+    passages = CLINICAL_PASSAGES if passages is None else passages
+    docs = [Counter(_passage_terms(p)) for p in passages]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = (sum(lengths) / len(lengths)) if lengths else 1.0
+
+    doc_freq = Counter(term for doc in docs for term in doc)
+    n = len(docs)
+    idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    postings = defaultdict(list)
+    by_analyte = defaultdict(list)
+    for i, (doc, length) in enumerate(zip(docs, lengths)):
+        norm = k1 * (1 - b + b * length / avg_length)
+        for term, tf in doc.items():
+            postings[term].append([i, idf[term] * tf * (k1 + 1) / (tf + norm)])
+        if passages[i].get("analyte"):
+            by_analyte[passages[i]["analyte"]].append(i)
+
+    return {
+        "passages": passages,
+        "postings": dict(postings),
+        "by_analyte": dict(by_analyte),
+        "corpus_hash": corpus_hash(passages),
+    }
+
+
+def save_index(path: str, index: dict = None):
+    """Write an index (default: the shared one) as a prebuilt JSON file."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index or get_index(), f)
+
+
+def load_index(path: str, passages: list = None) -> dict:
+    """
+    Load a prebuilt index, rebuilding it if the file is missing, unreadable
+    or was built from a different corpus.
+    """
+    passages = CLINICAL_PASSAGES if passages is None else passages
+    try:
+        with open(path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("corpus_hash") == corpus_hash(passages):
+            return index
+        log.warning("Retrieval index %s is stale, rebuilding", path)
+    except (OSError, ValueError) as e:
+        log.warning("Could not load retrieval index %s: %s", path, e)
+    return build_index(passages)
+
+
+def get_index() -> dict:
+    """The shared index: loaded from DIAGNOVA_RETRIEVAL_INDEX if set, else built once."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                path = os.environ.get(INDEX_PATH_ENV)
+                _index = load_index(path) if path else build_index()
+    return _index
+
+
+def search(query: str, k: int = 3, analyte: str = None, index: dict = None) -> list:
+    """
+    Top-k passages for a query by BM25 score.
+
+    Args:
+        query: Free text (a question, or test name + "low"/"high" + topic words)
+        k: Number of passages to return
+        analyte: Only consider this analyte's passages (canonical id)
+        index: Index to search (defaults to the shared one)
+
+    Returns:
+        list: Passage dicts with an added "score", best first (only passages
+              sharing at least one term with the query)
+    """
+    index = index or get_index()
+    postings = index["postings"]
+    allowed = set(index["by_analyte"].get(analyte, ())) if analyte else None
+
+    scores = defaultdict(float)
+    for term in tokenize(query):
+        for doc, weight in postings.get(term, ()):
+            if allowed is None or doc in allowed:
+                scores[doc] += weight
+
+    top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+    return [dict(index["passages"][doc], score=round(score, 4)) for doc, score in top]
+
+
+# ── Sparse TF-IDF matrix (chat grounding over an analysis + the corpus) ─────
+
+def build_tfidf(texts: list) -> dict:
+    """
+    Precompute a sparse, L2-normalized TF-IDF matrix in CSC layout.
+
+    Column j holds the documents containing term j, so scoring a query only
+    touches the columns of its terms, however many documents there are.
+
+    Args:
+        texts: Document strings
+
+    Returns:
+        dict: {
+            "vocabulary": {term: column},
+            "indptr": int array, column j spans indices/data[indptr[j]:indptr[j + 1]],
+            "indices": int array of document ids,
+            "data": float array of normalized tf-idf weights,
+            "idf": float array per column,
+            "n_docs": int,
+        }
+    """
+    counts = [Counter(tokenize(text)) for text in texts]
+    vocabulary = {}
+    for doc in counts:
+        for term in doc:
+            vocabulary.setdefault(term, len(vocabulary))
+
+    n_docs = len(texts)
+    rows, cols, tfs = [], [], []
+    for i, doc in enumerate(counts):
+        for term, tf in doc.items():
+            rows.append(i)
+            cols.append(vocabulary[term])
+            tfs.append(tf)
+    rows = np.array(rows, dtype=np.int32)
+    cols = np.array(cols, dtype=np.int32)
+
+    doc_freq = np.bincount(cols, minlength=len(vocabulary))
+    idf = np.log((1 + n_docs) / (1 + doc_freq)) + 1.0
+    weights = (1.0 + np.log(np.array(tfs, dtype=float))) * idf[cols]   # Sublinear tf
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n_docs))
+    weights = weights / np.where(norms > 0, norms, 1.0)[rows]
+
+    order = np.argsort(cols, kind="stable")
+    indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(doc_freq, out=indptr[1:])
+    return {
+        "vocabulary": vocabulary,
+        "indptr": indptr,
+        "indices": rows[order],
+        "data": weights[order],
+        "idf": idf,
+        "n_docs": n_docs,
+    }
+
+
+def tfidf_search(matrix: dict, query: str, k: int = 8) -> list:
+    """
+    Top-k documents of a build_tfidf matrix by cosine similarity to a query.
+
+    Returns:
+        list: (document index, score) pairs, best first, score > 0 only
+    """
+    terms = Counter(t for t in tokenize(query) if t in matrix["vocabulary"])
+    if not terms or not matrix["n_docs"]:
+        return []
+
+    scores = np.zeros(matrix["n_docs"])
+    indptr, indices, data = matrix["indptr"], matrix["indices"], matrix["data"]
+    for term, tf in terms.items():
+        col = matrix["vocabulary"][term]
+        start, end = indptr[col], indptr[col + 1]
+        scores[indices[start:end]] += data[start:end] * (1.0 + math.log(tf)) * matrix["idf"][col]
+
+    k = min(k, int(np.count_nonzero(scores)))
+    if k == 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(int(i), float(scores[i])) for i in top]
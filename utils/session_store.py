@@ -0,0 +1,294 @@
+# utils/session_store.py
+
+"""
+Shared, size-bounded store for heavy per-session payloads.
+
+Session state keeps only references: a key ending in "_ref" holds a store
+key, and the payload it points to (the analysis package with its
+explanations and health plan, the chat history) lives here, in one LRU
+shared by every session in the process. The store is capped in bytes
+(DIAGNOVA_SESSION_STORE_MB, default 256), so memory per replica stays flat
+however many sessions are open; idle sessions' payloads go first.
+
+Entries pushed out of memory are pickled to DIAGNOVA_SESSION_SPILL_DIR when
+that is set (capped by DIAGNOVA_SESSION_SPILL_MB, default 2048) and come
+back on the next get_payload(). Without a spill directory they are dropped
+and get_payload() returns the default, which the app treats as an expired
+session. Spill files are written, read and deleted outside the store's lock,
+so one session's disk I/O never stalls the others. Payloads are stored as
+given, not copied: replace a payload with store_payload() rather than
+mutating what get_payload() returned.
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from itertools import count
+
+from utils.log import get_logger
+
+STORE_MB_ENV = "DIAGNOVA_SESSION_STORE_MB"
+SPILL_DIR_ENV = "DIAGNOVA_SESSION_SPILL_DIR"
+SPILL_MB_ENV = "DIAGNOVA_SESSION_SPILL_MB"
+DEFAULT_STORE_MB = 256
+DEFAULT_SPILL_MB = 2048
+REF_SUFFIX = "_ref"    # Session state keys that hold a store key
+
+log = get_logger(__name__)
+
+_memory = OrderedDict()   # key -> (payload, size)
+_disk = OrderedDict()     # key -> (path, size)
+_spilling = {}            # key -> (payload, size) evicted, being written to disk
+_spill_seq = count()      # Unique spill file names, so a late delete never hits a newer file
+_totals = {"memory": 0, "disk": 0}
+_stats = {"hits": 0, "misses": 0, "spill_reads": 0, "evictions": 0, "spills": 0}
+_lock = threading.Lock()
+
+
+def _megabytes(env: str, default: int) -> int:
+    try:
+        return max(0, int(float(os.environ.get(env, default)) * 1024 * 1024))
+    except ValueError:
+        return default * 1024 * 1024
+
+
+def payload_size(value) -> int:
+    """
+    Approximate size of a payload in bytes: the length of bytes/str, else
+    of its pickle (sys.getsizeof for objects that can't be pickled).
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def _remove_spilled(key: str, removals: list):
+    """Forget a spilled payload; its file is queued on removals (caller holds _lock)."""
+    path, size = _disk.pop(key)
+    _totals["disk"] -= size
+    removals.append(path)
+
+
+def _drop(key: str, removals: list):
+    """Remove a key from memory, the spill queue and disk (caller holds _lock)."""
+    entry = _memory.pop(key, None)
+    if entry is not None:
+        _totals["memory"] -= entry[1]
+    _spilling.pop(key, None)
+    if key in _disk:
+        _remove_spilled(key, removals)
+
+
+def _insert(key: str, payload, size: int, spills: list, removals: list):
+    """
+    Add a payload and evict the least recently used beyond capacity; evicted
+    payloads are queued on spills when spilling is on (caller holds _lock).
+    """
+    _drop(key, removals)
+    _memory[key] = (payload, size)
+    _totals["memory"] += size
+    capacity = _megabytes(STORE_MB_ENV, DEFAULT_STORE_MB)
+    spill_dir = os.environ.get(SPILL_DIR_ENV)
+    # The newest payload always stays, even if it alone exceeds the cap
+    while _totals["memory"] > capacity and len(_memory) > 1:
+        old_key, entry = _memory.popitem(last=False)
+        _totals["memory"] -= entry[1]
+        _stats["evictions"] += 1
+        if spill_dir:
+            _spilling[old_key] = entry
+            spills.append((old_key, entry, spill_dir))
+
+
+def _flush(spills: list, removals: list):
+    """
+    Write queued spills and delete queued files, without holding _lock.
+
+    A spill is registered on disk only if its entry is still the one queued;
+    if the key was re-stored, reloaded or dropped meanwhile, the file is
+    deleted again.
+    """
+    for key, entry, spill_dir in spills:
+        name = f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}-{next(_spill_seq)}.pkl"
+        path = os.path.join(spill_dir, name)
+        try:
+            os.makedirs(spill_dir, exist_ok=True)
+            with open(path, "wb") as f:
+                pickle.dump(entry[0], f, protocol=pickle.HIGHEST_PROTOCOL)
+            written = True
+        except Exception as e:
+            log.warning("Could not spill session payload to %s: %s", path, e)
+            written = False
+        with _lock:
+            if _spilling.get(key) is not entry:
+                if written:
+                    removals.append(path)
+                continue
+            del _spilling[key]
+            if not written:
+                continue
+            _disk[key] = (path, entry[1])
+            _totals["disk"] += entry[1]
+            _stats["spills"] += 1
+            capacity = _megabytes(SPILL_MB_ENV, DEFAULT_SPILL_MB)
+            while _totals["disk"] > capacity and _disk:
+                _remove_spilled(next(iter(_disk)), removals)
+    for path in removals:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def store_payload(key: str, payload, size: int = None) -> str:
+    """
+    Store (or replace) a payload.
+
+    Args:
+        key: Store key, e.g. "analysis:<session id>"
+        payload: Any picklable value
+        size: Size in bytes if already known (default: payload_size())
+
+    Returns:
+        str: The key, to keep in session state
+    """
+    size = payload_size(payload) if size is None else size
+    spills, removals = [], []
+    with _lock:
+        _insert(key, payload, size, spills, removals)
+    _flush(spills, removals)
+    return key
+
+
+def _reload(key: str, spilled: tuple, default):
+    """Read a spilled payload outside _lock, then move it back into memory."""
+    path, size = spilled
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        loaded = True
+    except Exception as e:
+        log.warning("Could not reload spilled session payload %s: %s", path, e)
+        loaded = False
+    spills, removals = [], []
+    with _lock:
+        if _disk.get(key) is spilled:
+            _remove_spilled(key, removals)
+            if loaded:
+                _stats["spill_reads"] += 1
+                _insert(key, payload, size, spills, removals)
+            else:
+                _stats["misses"] += 1
+        else:
+            # Reloaded, re-stored or dropped by another thread while we read
+            entry = _memory.get(key) or _spilling.get(key)
+            loaded, payload = entry is not None, entry[0] if entry is not None else None
+    _flush(spills, removals)
+    return payload if loaded else default
+
+
+def get_payload(key: str, default=None):
+    """Payload for a key, reloading it from the spill directory if needed; default if gone."""
+    if not key:
+        return default
+    spills, removals = [], []
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            _memory.move_to_end(key)
+            _stats["hits"] += 1
+            return entry[0]
+        entry = _spilling.get(key)
+        if entry is not None:
+            # Evicted but not written out yet: take it back (the writer discards its file)
+            _stats["hits"] += 1
+            _insert(key, entry[0], entry[1], spills, removals)
+        elif key not in _disk:
+            _stats["misses"] += 1
+            return default
+        else:
+            spilled = _disk[key]
+    if entry is None:
+        return _reload(key, spilled, default)
+    _flush(spills, removals)
+    return entry[0]
+
+
+def drop_payload(key: str):
+    """Forget a payload (no-op for unknown keys)."""
+    if key:
+        removals = []
+        with _lock:
+            _drop(key, removals)
+        _flush([], removals)
+
+
+def store_stats() -> dict:
+    """
+    Store occupancy and counters for this process.
+
+    Returns:
+        dict: {"entries", "bytes", "capacity_bytes", "spilled_entries",
+               "spilled_bytes", "hits", "misses", "spill_reads", "evictions", "spills"}
+    """
+    with _lock:
+        stats = {
+            "entries": len(_memory),
+            "bytes": _totals["memory"],
+            "capacity_bytes": _megabytes(STORE_MB_ENV, DEFAULT_STORE_MB),
+            "spilled_entries": len(_disk),
+            "spilled_bytes": _totals["disk"],
+        }
+        stats.update(_stats)
+    return stats
+
+
+def session_footprint(state: dict) -> dict:
+    """
+    Approximate memory held for one session.
+
+    Args:
+        state: The session's state as a plain dict (st.session_state.to_dict())
+
+    Returns:
+        dict: {"state": {key: bytes}, "state_bytes",
+               "stored": {store key: bytes}, "stored_bytes", "spilled_bytes", "total_bytes"}
+               "stored" covers the payloads the session's *_ref keys point to
+               that are in memory; "spilled_bytes" those on disk.
+    """
+    sizes = {key: payload_size(value) for key, value in state.items()}
+    refs = [value for key, value in state.items()
+            if str(key).endswith(REF_SUFFIX) and isinstance(value, str)]
+    stored, spilled = {}, 0
+    with _lock:
+        for ref in refs:
+            if ref in _memory:
+                stored[ref] = _memory[ref][1]
+            elif ref in _disk:
+                spilled += _disk[ref][1]
+    return {
+        "state": dict(sorted(sizes.items(), key=lambda item: -item[1])),
+        "state_bytes": sum(sizes.values()),
+        "stored": stored,
+        "stored_bytes": sum(stored.values()),
+        "spilled_bytes": spilled,
+        "total_bytes": sum(sizes.values()) + sum(stored.values()),
+    }
+
+
+def clear_store():
+    """Drop every stored and spilled payload and reset the counters."""
+    removals = []
+    with _lock:
+        for key in list(_disk):
+            _remove_spilled(key, removals)
+        _memory.clear()
+        _spilling.clear()
+        _totals.update(memory=0, disk=0)
+        _stats.update({name: 0 for name in _stats})
+    _flush([], removals)
@@ -0,0 +1,195 @@
+# utils/tracing.py
+
+"""
+Lightweight per-request tracing for the analysis pipeline.
+
+trace() opens a root span for one request; span() (or the @traced
+decorator) times a stage inside it. Spans nest through a context variable,
+so a stage called from inside another stage becomes its child without any
+span being passed around. Outside a trace, span() and @traced cost one
+context-variable lookup and record nothing, so the core can stay
+instrumented in batch jobs and tests.
+
+A trace is a plain dict tree ({"name", "start_ms", "duration_ms", "attrs",
+"children"}) that can be attached to an analysis package and rendered with
+format_trace(). trace(profile=True) (or DIAGNOVA_PROFILE=1) also runs
+cProfile for the request and writes a .prof dump for snakeviz/pstats.
+"""
+
+import functools
+import io
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from utils.log import get_logger
+
+PROFILE_ENV = "DIAGNOVA_PROFILE"
+PROFILE_DIR_ENV = "DIAGNOVA_PROFILE_DIR"
+PROFILE_TOP = 25    # Functions listed in the profile summary
+
+log = get_logger(__name__)
+
+_current = ContextVar("diagnova_span", default=None)
+
+
+def _new_span(name: str, origin: float, attrs: dict) -> dict:
+    return {
+        "name": name,
+        "start_ms": round((time.perf_counter() - origin) * 1000, 3),
+        "duration_ms": None,
+        "attrs": attrs,
+        "children": [],
+        "_origin": origin,
+    }
+
+
+def _close(node: dict, started: float):
+    node["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    node.pop("_origin", None)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a stage as a child of the current span.
+
+    Yields the span dict (attrs can be added inside the block), or None when
+    no trace is active.
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    node = _new_span(name, parent["_origin"], attrs)
+    parent["children"].append(node)
+    token = _current.set(node)
+    started = time.perf_counter()
+    try:
+        yield node
+    except Exception as e:
+        node["attrs"]["error"] = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        _current.reset(token)
+        _close(node, started)
+
+
+def traced(name: str = None):
+    """Decorator: run the function inside span(name or its qualified name)."""
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _profile_dir() -> str:
+    return os.environ.get(PROFILE_DIR_ENV) or tempfile.gettempdir()
+
+
+@contextmanager
+def trace(name: str, profile: bool = None, **attrs):
+    """
+    Start a trace (the root span of one request).
+
+    Args:
+        name: Request name, e.g. "analysis"
+        profile: Also capture a cProfile dump (default: DIAGNOVA_PROFILE env var)
+        **attrs: Stored on the root span
+
+    Yields:
+        dict: The root span; complete once the block exits. With profiling,
+              root["profile"] = {"path": .prof file, "top": summary text}
+    """
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+
+    root = _new_span(name, time.perf_counter(), attrs)
+    root["started_at"] = datetime.now().isoformat(timespec="seconds")
+    token = _current.set(root)
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:   # Another profiler is already active in this thread
+            profiler = None
+            root["attrs"]["profile_error"] = "another profiler is active"
+    started = root["_origin"]
+    try:
+        yield root
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _current.reset(token)
+        _close(root, started)
+        if profiler is not None:
+            root["profile"] = _save_profile(profiler, name)
+
+
+def _save_profile(profiler, name: str) -> dict:
+    """Dump a profile to DIAGNOVA_PROFILE_DIR (default: temp dir) with a text summary."""
+    import pstats
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(_profile_dir(), f"diagnova-{name}-{stamp}.prof")
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+    try:
+        stats.dump_stats(path)
+    except OSError as e:
+        log.warning("Could not write profile %s: %s", path, e)
+        path = None
+    return {"path": path, "top": summary.getvalue()}
+
+
+def current_span():
+    """The innermost open span, or None outside a trace."""
+    return _current.get()
+
+
+def flatten_trace(root: dict) -> list:
+    """
+    Spans in start order with their depth and self time (time not spent in
+    child spans): [{"depth", "name", "start_ms", "duration_ms", "self_ms", "attrs"}].
+    """
+    rows = []
+
+    def walk(node, depth):
+        duration = node.get("duration_ms") or 0.0
+        children = sum(child.get("duration_ms") or 0.0 for child in node["children"])
+        rows.append({
+            "depth": depth,
+            "name": node["name"],
+            "start_ms": node["start_ms"],
+            "duration_ms": duration,
+            "self_ms": round(max(duration - children, 0.0), 3),
+            "attrs": node["attrs"],
+        })
+        for child in node["children"]:
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return rows
+
+
+def format_trace(root: dict) -> str:
+    """Indented text view of a trace, one span per line."""
+    lines = [f"{'start ms':>9} {'total ms':>9} {'self ms':>9}  span"]
+    for row in flatten_trace(root):
+        attrs = " ".join(f"{k}={v}" for k, v in row["attrs"].items())
+        lines.append(f"{row['start_ms']:9.1f} {row['duration_ms']:9.1f} {row['self_ms']:9.1f}  "
+                     f"{'  ' * row['depth']}{row['name']}{'  ' + attrs if attrs else ''}")
+    return "\n".join(lines)